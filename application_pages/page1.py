@@ -1,65 +1,20 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-
-def load_and_validate_data(filepath=None, num_days=5):
-    """Loads and validates financial data.
-
-    Args:
-        filepath (str, optional): Path to the CSV file. If None, a synthetic dataset is used.
-        num_days (int, optional): Number of days for synthetic dataset. Default is 5.
-
-    Returns:
-        pd.DataFrame: Loaded and validated financial data.
-
-    Raises:
-        FileNotFoundError: If the specified file does not exist.
-        KeyError: If required columns are missing.
-        ValueError: If duplicate dates are found.
-    """
-    if filepath is None:
-        # Generate synthetic dataset with specified number of days
-        
-        # Generate dates starting from 2024-01-01
-        start_date = pd.Timestamp('2024-01-01')
-        dates = pd.date_range(start=start_date, periods=num_days, freq='D')
-        
-        # Generate revenue data with some realistic variation (base around 100-120)
-        np.random.seed(42)  # For reproducible results
-        base_revenue = 100
-        revenue_variation = np.random.normal(10, 5, num_days)  # Mean=10, std=5
-        revenues = base_revenue + revenue_variation
-        revenues = np.maximum(revenues, 50)  # Ensure minimum revenue of 50
-        
-        # Generate cost data (typically 50-70% of revenue)
-        cost_ratio = np.random.uniform(0.5, 0.7, num_days)
-        costs = revenues * cost_ratio
-        
-        data = {
-            'Date': dates.strftime('%Y-%m-%d').tolist(),
-            'Base_Revenue': revenues.round(2).tolist(),
-            'Base_Costs': costs.round(2).tolist()
-        }
-        df = pd.DataFrame(data)
-        df['Date'] = pd.to_datetime(df['Date'])
-    else:
-        try:
-            df = pd.read_csv(filepath)
-        except FileNotFoundError:
-            raise FileNotFoundError("File not found at specified path.")
-    
-    required_columns = ['Date', 'Base_Revenue', 'Base_Costs']
-    for col in required_columns:
-        if col not in df.columns:
-            raise KeyError(f"Required column '{col}' is missing.")
 
-    if df['Date'].duplicated().any():
-        raise ValueError("Duplicate dates found in the data.")
-    
-    df['Date'] = pd.to_datetime(df['Date']) # Ensure Date column is datetime
-    return df
+# Computation lives in the Streamlit-free risk_engine package; names are re-exported here for existing imports
+from risk_engine.data import (
+    ARROW_CACHE_DIR,
+    STREAMING_CHUNKSIZE,
+    STREAMING_THRESHOLD_BYTES,
+    dataset_fingerprint,
+    load_and_validate_data,
+)
+from risk_engine.profiling import session_id, session_profiler
+from risk_engine.store import get_dataset_store, load_shared_dataset
+
+__all__ = ['load_and_validate_data', 'run_page1']
 
 def run_page1():
+    profiler = session_profiler(st.session_state, 'Data Loading')
     st.markdown(r"""
     # Step 1. Data Loading & Selection
     
@@ -100,27 +55,32 @@ def run_page1():
         st.markdown("""
         ### Custom Data Upload
 
-        Upload your financial dataset in CSV format. Ensure your file contains the following columns:
+        Upload your financial dataset in CSV, Parquet or Feather/Arrow format. Ensure your file contains the following columns:
         - `Date`: Timeline for your financial data (YYYY-MM-DD format recommended)
         - `Base_Revenue`: Revenue figures under normal conditions
         - `Base_Costs`: Cost figures under normal conditions
+        - `Entity` *(optional)*: Business line or legal entity, for multi-entity portfolios
         
         **Data Validation Checks:**
         - Required columns presence verification
-        - Duplicate date detection
+        - Duplicate date detection (per entity for multi-entity data)
         - Data type validation
         """)
         
         uploaded_file = st.file_uploader(
-            "Choose your CSV file", 
-            type=["csv"], 
-            help="Maximum file size: 200MB. Supported format: CSV with UTF-8 encoding."
+            "Choose your data file", 
+            type=["csv", "parquet", "feather", "arrow"], 
+            help="Maximum file size: 200MB. Supported formats: CSV with UTF-8 encoding, Parquet, Feather/Arrow IPC. "
+                 "Validated CSVs are cached in columnar form, so re-uploading the same file loads instantly."
         )
         
         if uploaded_file is not None:
             try:
                 with st.spinner("Loading and validating your data..."):
-                    base_data = load_and_validate_data(uploaded_file)
+                    chunksize = STREAMING_CHUNKSIZE if uploaded_file.size > STREAMING_THRESHOLD_BYTES else None
+                    # Shared with every session that loads the same file; the session only keeps its key
+                    _, base_data = load_shared_dataset(uploaded_file, chunksize=chunksize, cache_dir=ARROW_CACHE_DIR,
+                                                       profiler=profiler, owner=session_id(st.session_state))
                     
                 st.success("Data loaded and validated successfully!")
                 
@@ -137,7 +97,7 @@ def run_page1():
                 st.dataframe(base_data, use_container_width=True)
                 
                 # Store in session state
-                st.session_state['base_data'] = base_data
+                st.session_state['base_fingerprint'] = dataset_fingerprint(base_data)
                 
                 st.info("**Data Saved**: Your data has been stored for use in stress testing simulations.")
                 
@@ -192,11 +152,23 @@ def run_page1():
             help="Select how many days of synthetic financial data you want to generate. More days provide better insights for stress testing analysis."
         )
         
-        st.info(f"**Selected**: {num_days} days of data will be generated starting from 2024-01-01")
+        num_entities = st.number_input(
+            "Number of entities (business lines / legal entities):",
+            min_value=1,
+            max_value=1000,
+            value=1,
+            help="With more than one entity a panel is generated: every entity gets its own revenue and cost history, "
+                 "and stress results are rolled up to the firm level."
+        )
+        num_entities = None if num_entities == 1 else int(num_entities)
+        
+        st.info(f"**Selected**: {num_days} days of data will be generated starting from 2024-01-01"
+                + (f" for each of {num_entities} entities" if num_entities else ""))
         
         try:
             with st.spinner(f"Generating {num_days} days of synthetic dataset..."):
-                base_data = load_and_validate_data(num_days=num_days)
+                _, base_data = load_shared_dataset(num_days=num_days, num_entities=num_entities, profiler=profiler,
+                                                   owner=session_id(st.session_state))
                 
             st.success("Synthetic data generated successfully!")
             
@@ -219,13 +191,31 @@ def run_page1():
                 st.dataframe(base_data, use_container_width=True)
             
             # Store in session state
-            st.session_state['base_data'] = base_data
+            st.session_state['base_fingerprint'] = dataset_fingerprint(base_data)
 
             st.info("**Data Ready**: Proceed to the Stress Test Simulation page to apply various stress scenarios.")
 
         except Exception as e:
             st.error(f"Error generating synthetic data: {e}")
 
+    with st.expander("**Dataset Store**: One shared copy of each dataset across reruns and sessions", expanded=False):
+        store_stats = get_dataset_store().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Active Sessions", f"{store_stats['Active_Sessions']} / {store_stats['Sessions']}")
+        with col2:
+            st.metric("Shared Frames", store_stats['Entries'])
+        with col3:
+            budget = store_stats['Budget_Bytes']
+            st.metric("Memory Used", f"{store_stats['Bytes'] / 1024 ** 2:,.1f} MB",
+                      delta=f"of {budget / 1024 ** 2:,.0f} MB budget" if budget else None, delta_color="off")
+        with col4:
+            st.metric("Regenerated", store_stats['Regenerations'])
+        st.caption(f"{store_stats['Hits']} lookups served from shared frames, {store_stats['Misses']} built; "
+                   f"{store_stats['Evictions']} idle frames evicted under memory pressure and rebuilt on demand.")
+
+    profiler.flush(st.session_state.setdefault('stage_profile', []))
+
     st.markdown("""
     ---
     ### Next Steps
@@ -1,51 +1,98 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 
-def simulate_stress_impact(data, stress_type, parameters):
-    """Applies stress test methodology to data.
+# Computation lives in the Streamlit-free risk_engine package; names are re-exported here for existing imports
+from risk_engine.stress import (
+    simulate_correlated_shocks,
+    simulate_stress_grid,
+    simulate_stress_impact,
+    simulate_stress_monte_carlo,
+    stress_factors,
+    stress_value,
+    stressed_view,
+)
+from risk_engine.jobs import get_job_runner
+from risk_engine.reverse import STRESS_PARAMETER_RANGES, solve_reverse_stress
+from risk_engine.schedules import (
+    compose_schedules,
+    decay_schedule,
+    load_schedule,
+    ramp_schedule,
+    schedule_periods,
+    step_schedule,
+)
+from risk_engine.profiling import session_id, session_profiler
+from risk_engine.store import get_dataset_store, stress_shared_dataset
+from risk_engine.workspace import ScenarioWorkspace, summarize_run
 
-    Args:
-        data (pd.DataFrame): The base financial data.
-        stress_type (str): Type of stress test ('Sensitivity', 'Scenario', 'Firm-Wide').
-        parameters (dict): Dictionary of parameters specific to the stress type.
+__all__ = ['simulate_stress_impact', 'run_page2']
 
-    Returns:
-        pd.DataFrame: DataFrame with stressed financial data.
+JOB_POLL_SECONDS = 1.0
+SWEEP_CHUNK_POINTS = 1000
 
-    Raises:
-        KeyError: If a required parameter or column is missing for the specified stress type.
-        Exception: If an invalid stress type is provided.
+def _stress_job(base_key, stress_type, parameters, owner, fingerprint, profiler, progress):
+    """Stresses the stored base data, binding the result to the owner's pending slot until it is picked up.
+
+    The run is also summarized for the scenario workspace, so comparing it later never
+    needs the stressed frame.
     """
-    stressed_data = data.copy() # Work on a copy to avoid modifying original data
-
-    # Always initialize Adjusted columns with base values first
-    if 'Base_Revenue' in stressed_data.columns:
-        stressed_data['Adjusted_Revenue'] = stressed_data['Base_Revenue']
-    if 'Base_Costs' in stressed_data.columns:
-        stressed_data['Adjusted_Costs'] = stressed_data['Base_Costs']
-
-    if stress_type == 'Sensitivity':
-        parameter_to_shock = parameters.get('parameter_to_shock')
-        shock_magnitude = parameters.get('shock_magnitude')
-        if parameter_to_shock not in stressed_data.columns:
-            raise KeyError(f"Parameter '{parameter_to_shock}' not found in data for Sensitivity stress test.")
-        # Apply shock only to the selected parameter
-        adjusted_col_name = f'Adjusted_{parameter_to_shock.replace("Base_", "")}'
-        stressed_data[adjusted_col_name] = stressed_data[parameter_to_shock] * (1 - shock_magnitude/100)
-    elif stress_type == 'Scenario':
-        scenario_severity_factor = parameters.get('scenario_severity_factor')
-        for col in stressed_data.columns:
-            if 'Base' in col:
-                stressed_data[col.replace('Base', 'Adjusted')] = stressed_data[col] * (1 - scenario_severity_factor)
-    elif stress_type == 'Firm-Wide':
-        systemic_crisis_scale = parameters.get('systemic_crisis_scale')
-        for col in stressed_data.columns:
-            if 'Base' in col:
-                stressed_data[col.replace('Base', 'Adjusted')] = stressed_data[col] * (1 - systemic_crisis_scale)
-    else:
-        raise Exception("Invalid stress type.")
-
-    return stressed_data
+    progress(0.0, f"Running {stress_type} stress test simulation...")
+    with profiler.stage('stress', stress_type=stress_type):
+        key, adjustments = stress_shared_dataset(base_key, stress_type, parameters, owner=owner, slot='stress_pending')
+    progress(0.5, "Summarizing the run for the scenario workspace...")
+    base_data = get_dataset_store().get(base_key)
+    with profiler.stage('metrics', rows=len(base_data)):
+        metrics, series = summarize_run(base_data, adjustments)
+    return {'key': key, 'stress_type': stress_type, 'parameters': parameters,
+            'fingerprint': fingerprint, 'profiler': profiler, 'metrics': metrics, 'series': series}
+
+def _sweep_job(base_data, stress_type, sweep_values, parameter_to_shock, progress):
+    """Total net earnings across `sweep_values`, a chunk of severities at a time."""
+    net_earnings = []
+    for start in range(0, len(sweep_values), SWEEP_CHUNK_POINTS):
+        adjusted, adjusted_columns = simulate_stress_grid(
+            base_data, stress_type, sweep_values[start:start + SWEEP_CHUNK_POINTS], parameter_to_shock
+        )
+        totals = adjusted.sum(axis=1)
+        net_earnings.append(totals[:, adjusted_columns.index('Adjusted_Revenue')] -
+                            totals[:, adjusted_columns.index('Adjusted_Costs')])
+        done = min(start + SWEEP_CHUNK_POINTS, len(sweep_values))
+        progress(done / len(sweep_values), f"{done:,} of {len(sweep_values):,} stress levels")
+    sweep_label = "Shock Magnitude (%)" if stress_type == "Sensitivity" else "Stress Level"
+    return pd.DataFrame({sweep_label: sweep_values, 'Total Net Earnings': np.concatenate(net_earnings)})
+
+def _submit_job(kind, fn, *args, label=None, **kwargs):
+    """Runs `fn` in the background as this session's `kind` job, cancelling the one it replaces."""
+    runner = get_job_runner()
+    jobs = st.session_state.setdefault('jobs', {})
+    if kind in jobs:
+        runner.cancel(jobs[kind])
+    jobs[kind] = runner.submit(fn, *args, label=label, owner=session_id(st.session_state), **kwargs).id
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None or job.done:
+        st.rerun()  # Let the full page pick up the outcome
+    st.progress(job.progress, text=f"{job.label}: {job.message or job.status.capitalize()} "
+                                   f"({job.elapsed():.0f}s)")
+    if st.button("Cancel", key=f"cancel_{job_id}"):
+        job.cancel()
+
+def _job_outcome(kind):
+    """Shows this session's `kind` job while it runs; returns the job once it has finished or failed."""
+    job_id = st.session_state.get('jobs', {}).get(kind)
+    job = None if job_id is None else get_job_runner().get(job_id)
+    if job is None:
+        return None
+    if not job.done:
+        _job_progress(job.id)
+        return None
+    if job.status == 'cancelled':
+        st.warning(f"{job.label} was cancelled.")
+        return None
+    return job
 
 def run_page2():
     st.markdown(r"""
@@ -58,7 +105,12 @@ def run_page2():
     methodologies, each serving different analytical purposes in understanding risk exposure.
     """)
 
-    if 'base_data' not in st.session_state:
+    store, owner = get_dataset_store(), session_id(st.session_state)
+    try:
+        base_data = store.fetch(owner, 'base')
+    except (KeyError, FileNotFoundError):
+        base_data = None  # Evicted and no longer reproducible; the user has to load it again
+    if base_data is None:
         st.error("**No Base Data Found**")
         st.markdown("""
         Please complete the following steps:
@@ -67,8 +119,6 @@ def run_page2():
         3. Return to this page to run stress simulations
         """)
         st.stop()
-
-    base_data = st.session_state['base_data']
     
     # Display current data summary
     st.success("**Base Data Loaded Successfully**")
@@ -232,16 +282,42 @@ def run_page2():
     
     # Execute stress test
     if st.button("**Execute Stress Test**", type="primary", use_container_width=True):
+        # Memory tracing is process-wide, so background stages record wall time only
+        profiler = session_profiler(st.session_state, 'Stress Test Simulation', trace_memory=False)
+        _submit_job('stress', _stress_job, store.key_of(owner, 'base'), stress_type, parameters, owner,
+                    st.session_state.get('base_fingerprint'), profiler, label=f"{stress_type} stress test")
+
+    stress_job = _job_outcome('stress')
+    if stress_job is not None and stress_job.error is None:
+        result = stress_job.result
+        if store.key_of(owner, 'stress_pending') == result['key']:
+            # First rerun after the job finished: publish its result to the other pages
+            store.bind(owner, 'stress', result['key'])
+            store.unbind(owner, 'stress_pending')
+            st.session_state['stress_fingerprint'] = result['fingerprint']
+            st.session_state['stress_type'] = result['stress_type']
+            st.session_state['stress_parameters'] = result['parameters']
+            # Earlier runs stay comparable on Page 3 after this one replaces them here
+            st.session_state.setdefault('workspace', ScenarioWorkspace()).add(
+                result['fingerprint'], result['stress_type'], result['parameters'], result['metrics'], result['series']
+            )
+        result['profiler'].flush(st.session_state.setdefault('stage_profile', []))
+        if result['fingerprint'] != st.session_state.get('base_fingerprint'):
+            st.info("The base data changed since the last stress test. Execute the stress test again.")
+            stress_job = None
+    if stress_job is not None:
         try:
-            with st.spinner(f"Running {stress_type} stress test simulation..."):
-                stressed_data = simulate_stress_impact(base_data, stress_type, parameters)
-                
-            # Store results in session state
-            st.session_state['stressed_data'] = stressed_data
-            st.session_state['stress_type'] = stress_type
-            st.session_state['stress_parameters'] = parameters
-            
-            st.success(f"**{stress_type} Stress Test Completed Successfully!**")
+            if stress_job.error is not None:
+                raise stress_job.error
+            # Shares its columns with base_data and the stored adjustments, so it is rebuilt rather than stored
+            stressed_data = stressed_view(base_data, store.fetch(owner, 'stress'))
+
+            st.success(f"**{stress_job.result['stress_type']} Stress Test Completed Successfully!** "
+                       f"({stress_job.elapsed():.1f}s)")
+            workspace = st.session_state.get('workspace')
+            if workspace is not None and len(workspace) > 1:
+                st.caption(f"{len(workspace)} completed runs are kept in the scenario workspace; "
+                           "compare them on Page 3.")
             
             # Results summary
             st.subheader("Stress Test Results Summary")
@@ -285,6 +361,10 @@ def run_page2():
                         delta="Time to recover" if recovery_time > 0 else "No recovery needed"
                     )
             
+            store_stats = store.stats()
+            st.caption(f"Shared store: {store_stats['Hits']} hits, {store_stats['Misses']} builds, "
+                       f"{store_stats['Bytes'] / 1024 ** 2:,.1f} MB held for {store_stats['Sessions']} sessions")
+
             # Display stressed data
             with st.expander("Detailed Stressed Data", expanded=False):
                 st.dataframe(stressed_data, use_container_width=True)
@@ -314,5 +394,191 @@ def run_page2():
             - Contact support if error persists
             """)
 
+    with st.expander("**Shock Schedules**: Let the shock build up, persist and fade over time", expanded=False):
+        st.markdown(r"""
+        Instead of one constant factor, a schedule sets the shock for every date and applies it to all
+        base components: $\text{Adjusted} = \text{Base} \times (1 - \text{Shock}_t)$. Combine several
+        shapes to build a scenario; their reductions compound.
+        """)
+        n_periods = schedule_periods(base_data)[1]
+        shapes = st.multiselect("Schedule shapes:", ["Step", "Linear Ramp", "Exponential Decay", "Piecewise Curve"],
+                                default=["Exponential Decay"])
+        components = []
+        try:
+            for shape in shapes:
+                sc_col1, sc_col2, sc_col3 = st.columns(3)
+                with sc_col1:
+                    if shape == "Piecewise Curve":
+                        curve_file = st.file_uploader("Curve file (Period or Date, Shock):", type=["csv", "json"],
+                                                      key="schedule_curve")
+                    else:
+                        shock = st.slider(f"{shape} shock (%):", min_value=0, max_value=100, value=30,
+                                          key=f"schedule_{shape}_shock") / 100
+                with sc_col2:
+                    if shape != "Piecewise Curve":
+                        start = st.number_input(f"{shape} start period:", min_value=0,
+                                                max_value=max(n_periods - 1, 0), value=0, key=f"schedule_{shape}_start")
+                with sc_col3:
+                    if shape == "Step":
+                        length = st.number_input("Step length (periods, 0 = to the end):", min_value=0, value=0,
+                                                 key="schedule_step_length")
+                        components.append(step_schedule(shock, start, start + length if length else None))
+                    elif shape == "Linear Ramp":
+                        ramp_periods = st.number_input("Ramp length (periods):", min_value=1, value=30,
+                                                       key="schedule_ramp_periods")
+                        components.append(ramp_schedule(shock, start, ramp_periods))
+                    elif shape == "Exponential Decay":
+                        half_life = st.number_input("Half-life (periods):", min_value=1, value=30,
+                                                    key="schedule_decay_half_life")
+                        components.append(decay_schedule(shock, half_life, start))
+                    elif curve_file is not None:
+                        components.append(load_schedule(curve_file))
+        except (KeyError, ValueError) as e:
+            st.error(f"**Schedule Error**: {e}")
+            components = []
+        if components:
+            schedule = compose_schedules(*components)
+            st.line_chart(pd.DataFrame({'Period': np.arange(n_periods), 'Shock (%)': schedule.shocks(n_periods) * 100}),
+                          x='Period', y='Shock (%)')
+            if st.button("Apply Schedule as Stress Test", use_container_width=True):
+                profiler = session_profiler(st.session_state, 'Stress Test Simulation', trace_memory=False)
+                _submit_job('stress', _stress_job, store.key_of(owner, 'base'), 'Schedule', {'schedule': schedule},
+                            owner, st.session_state.get('base_fingerprint'), profiler, label="Schedule stress test")
+                st.rerun()  # The result is shown with the stress test results above
+
+    with st.expander("**Severity Sweep**: Evaluate the full range of stress levels at once", expanded=False):
+        st.markdown("""
+        Runs the selected methodology across an entire grid of stress levels in a single vectorized pass,
+        showing how total net earnings deteriorate as the shock intensifies.
+        """)
+        sweep_points = st.number_input(
+            "Number of sweep points:",
+            min_value=10,
+            max_value=100000,
+            value=1001,
+            step=10,
+            help="Stress levels are spaced evenly from no impact to the maximum shock."
+        )
+        if st.button("Run Severity Sweep", use_container_width=True):
+            upper = 100 if stress_type == "Sensitivity" else 1.0
+            _submit_job('sweep', _sweep_job, base_data, stress_type, np.linspace(0, upper, int(sweep_points)),
+                        parameters.get('parameter_to_shock'), label=f"{stress_type} severity sweep")
+        sweep_job = _job_outcome('sweep')
+        if sweep_job is not None:
+            if sweep_job.error is not None:
+                st.error(f"**Sweep Error**: {sweep_job.error}")
+            else:
+                sweep_frame = sweep_job.result
+                st.line_chart(sweep_frame, x=sweep_frame.columns[0], y='Total Net Earnings')
+
+    with st.expander("**Reverse Stress Test**: Find the smallest shock that breaches a limit", expanded=False):
+        parameter_name = STRESS_PARAMETER_RANGES[stress_type][0]
+        st.markdown(f"""
+        Instead of choosing a shock and reading off the damage, fix the damage and solve for the shock:
+        for every selected breach condition (and, for multi-entity data, every entity and the firm as a
+        whole) this finds the minimal `{parameter_name}` at which the breach occurs.
+        """)
+        rv_col1, rv_col2, rv_col3 = st.columns(3)
+        with rv_col1:
+            drawdown_limit = st.number_input("Capital drawdown limit (%):", min_value=0.0, max_value=1000.0,
+                                             value=25.0, step=5.0)
+        with rv_col2:
+            solve_capital = st.checkbox("Capital exhausted (< 0)", value=True)
+        with rv_col3:
+            solve_liquidity = st.checkbox("Any liquidity shortfall", value=True)
+        if st.button("Solve Breach Thresholds", use_container_width=True):
+            breach_targets = [('Capital_Drawdown_Percentage', '>=', drawdown_limit)]
+            if solve_capital:
+                breach_targets.append(('Minimum_Capital_Remaining', '<', 0.0))
+            if solve_liquidity:
+                breach_targets.append(('Liquidity_Shortfall', '>', 0.0))
+            _submit_job('reverse', solve_reverse_stress, base_data, stress_type, breach_targets,
+                        parameter_to_shock=parameters.get('parameter_to_shock'),
+                        label=f"{stress_type} reverse stress test")
+        reverse_job = _job_outcome('reverse')
+        if reverse_job is not None:
+            if reverse_job.error is not None:
+                st.error(f"**Reverse Stress Error**: {reverse_job.error}")
+            else:
+                breaches = reverse_job.result
+                breaches = breaches.assign(Target=breaches['Metric'] + ' ' + breaches['Operator'] + ' ' +
+                                                  breaches['Threshold'].map('{:g}'.format))
+                solved = breaches.pivot(index='Entity', columns='Target', values='Breach_Value')
+                solved_type = breaches['Stress_Type'].iloc[0]
+                solved_parameter, _, solved_upper = STRESS_PARAMETER_RANGES[solved_type]
+                st.markdown(f"**Minimal `{solved_parameter}` per breach** "
+                            f"({solved_type}; blank = not breached even at {solved_upper:g})")
+                st.dataframe(solved.reindex(breaches['Entity'].unique()), use_container_width=True)
+                if (breaches['Status'] == 'Breached Unstressed').any():
+                    st.warning("Some limits are already breached without any stress; their threshold is 0.")
+
+    with st.expander("**Monte Carlo Stress**: Simulate the stress over resampled historical paths", expanded=False):
+        st.markdown("""
+        Resamples the loaded revenue and cost history in contiguous blocks (preserving day-to-day
+        autocorrelation), applies the selected stress to every simulated path and reports the
+        distribution of the resulting risk capacity metrics.
+        """)
+        mc_col1, mc_col2, mc_col3 = st.columns(3)
+        with mc_col1:
+            n_paths = st.number_input("Simulated paths:", min_value=100, max_value=100000, value=5000, step=100)
+        with mc_col2:
+            n_dates = max(1, base_data['Date'].nunique())  # Panels repeat each date once per entity
+            block_size = st.number_input("Block size (days):", min_value=1, max_value=n_dates, value=min(5, n_dates))
+        with mc_col3:
+            mc_seed = st.number_input("Random seed:", min_value=0, value=42)
+        if st.button("Run Monte Carlo Simulation", use_container_width=True):
+            _submit_job('monte_carlo', simulate_stress_monte_carlo, base_data, stress_type, parameters,
+                        n_paths=int(n_paths), block_size=int(block_size), seed=int(mc_seed),
+                        label=f"Monte Carlo over {int(n_paths):,} paths")
+        mc_job = _job_outcome('monte_carlo')
+        if mc_job is not None:
+            if mc_job.error is not None:
+                st.error(f"**Monte Carlo Error**: {mc_job.error}")
+            else:
+                path_metrics = mc_job.result
+                mc_col1, mc_col2 = st.columns(2)
+                with mc_col1:
+                    st.metric("Median Capital Drawdown",
+                              f"{path_metrics['Capital_Drawdown_Percentage'].median():.2f}%")
+                with mc_col2:
+                    st.metric("Probability of Liquidity Shortfall",
+                              f"{(path_metrics['Liquidity_Shortfall'] > 0).mean() * 100:.1f}%")
+                st.dataframe(path_metrics.quantile([0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]),
+                             use_container_width=True)
+
+    with st.expander("**Correlated Factor Shocks**: Draw jointly distributed shocks for every component", expanded=False):
+        st.markdown("""
+        Treats each base component as a risk factor. Shocks are drawn from a multivariate normal
+        distribution centred on the selected stress, with the volatilities and correlations below,
+        so revenue and cost shocks are no longer forced to move in lockstep.
+        """)
+        factor_columns = [col for col in base_data.columns if 'Base' in col]
+        default_correlation = pd.DataFrame(
+            np.full((len(factor_columns), len(factor_columns)), 0.5) + 0.5 * np.eye(len(factor_columns)),
+            index=factor_columns, columns=factor_columns
+        )
+        correlation_input = st.data_editor(default_correlation, key="factor_correlation")
+        volatility_input = st.data_editor(
+            pd.DataFrame({'Volatility': 0.1}, index=factor_columns), key="factor_volatility"
+        )
+        factor_paths = st.number_input("Simulated paths:", min_value=1000, max_value=200000, value=50000,
+                                       step=1000, key="factor_paths")
+        if st.button("Run Correlated Shock Simulation", use_container_width=True):
+            try:
+                mean_shocks = 1 - stress_factors(stress_type, stress_value(stress_type, parameters),
+                                                  factor_columns, parameters.get('parameter_to_shock'))[0]
+                _submit_job('factor_shocks', simulate_correlated_shocks, base_data, correlation_input.to_numpy(),
+                            volatility_input['Volatility'].to_numpy(), mean_shocks=mean_shocks,
+                            n_paths=int(factor_paths), seed=42,
+                            label=f"Correlated shocks over {int(factor_paths):,} paths")
+            except Exception as e:
+                st.error(f"**Factor Simulation Error**: {e}")
+        factor_job = _job_outcome('factor_shocks')
+        if factor_job is not None:
+            if factor_job.error is not None:
+                st.error(f"**Factor Simulation Error**: {factor_job.error}")
+            else:
+                st.dataframe(factor_job.result, use_container_width=True)
+
 if __name__ == "__main__":
     run_page2()
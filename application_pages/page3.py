@@ -1,89 +1,61 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
 
-def calculate_risk_capacity_metrics(projected_data):
-    """
-    Computes key metrics to assess the firm's risk capacity under stress.
-
-    Args:
-        projected_data (pd.DataFrame): DataFrame with projected financial data,
-                                       including 'Adjusted_Revenue', 'Adjusted_Costs'.
-
-    Returns:
-        dict: Dictionary of calculated risk capacity metrics.
-
-    Raises:
-        Exception: If the input DataFrame is empty.
-    """
-    if projected_data.empty:
-        raise Exception("Input DataFrame cannot be empty.")
-
-    if 'Adjusted_Revenue' not in projected_data.columns or 'Adjusted_Costs' not in projected_data.columns:
-        # Check if 'Base_Revenue' and 'Base_Costs' exist for initial adjustment if not already done
-        if 'Base_Revenue' in projected_data.columns and 'Base_Costs' in projected_data.columns:
-            # If Adjusted_Revenue/Costs are not created (e.g., if page2 was skipped),
-            # assume no stress applied and use base values
-            missing_cols = []
-            if 'Adjusted_Revenue' not in projected_data.columns:
-                missing_cols.append('Adjusted_Revenue')
-                projected_data['Adjusted_Revenue'] = projected_data['Base_Revenue']
-            if 'Adjusted_Costs' not in projected_data.columns:
-                missing_cols.append('Adjusted_Costs')
-                projected_data['Adjusted_Costs'] = projected_data['Base_Costs']
-            
-            st.info(f"**Stress Test Data Completed**: {', '.join(missing_cols)} were missing but have been filled with base values. This usually happens when:\n"
-                   "- You haven't run the stress test simulation on Page 2 yet\n"
-                   "- The stress test was applied but only to one parameter\n\n"
-                   "**Solution**: The missing columns have been automatically filled with base values (no stress applied to those parameters).")
-        else:
-            raise KeyError("Missing 'Adjusted_Revenue'/'Adjusted_Costs' and 'Base_Revenue'/'Base_Costs' for metric derivation. Please ensure you load data on Page 1 and apply stress test on Page 2.")
-
-    projected_data['Net_Earnings_Under_Stress'] = projected_data['Adjusted_Revenue'] - projected_data['Adjusted_Costs']
-
-    initial_capital_value = 1000
-    initial_liquidity_value = 500
-
-    # These impacts are illustrative as per the prompt's reference
-    if 'Base_Revenue' in projected_data.columns and 'Base_Costs' in projected_data.columns:
-        projected_data['Capital_Impact'] = (projected_data['Base_Revenue'] - projected_data['Adjusted_Revenue']) + \
-                                          (projected_data['Adjusted_Costs'] - projected_data['Base_Costs'])
-        projected_data['Capital_Remaining'] = initial_capital_value - projected_data['Capital_Impact'].cumsum()
-        projected_data['Liquidity_Impact'] = (projected_data['Base_Revenue'] - projected_data['Adjusted_Revenue']) * 0.5
-        projected_data['Liquidity_Position'] = initial_liquidity_value - projected_data['Liquidity_Impact'].cumsum()
-    else:
-        st.warning("Base_Revenue or Base_Costs not available for full impact calculation. Capital and Liquidity impacts might be inaccurate or estimated.")
-        # Fallback if base columns are missing (though page1 should ensure them)
-        projected_data['Capital_Impact'] = 0 # Or some default impact
-        projected_data['Capital_Remaining'] = initial_capital_value - projected_data['Net_Earnings_Under_Stress'].cumsum() # Simplified fallback
-        projected_data['Liquidity_Impact'] = 0 # Or some default
-        projected_data['Liquidity_Position'] = initial_liquidity_value - projected_data['Net_Earnings_Under_Stress'].cumsum() * 0.5 # Simplified fallback
-
-    capital_remaining = projected_data['Capital_Remaining']
-    liquidity_position = projected_data['Liquidity_Position']
-
-    initial_capital = initial_capital_value # Use the defined initial value
-    min_capital = capital_remaining.min()
-    capital_drawdown = initial_capital - min_capital
-    capital_drawdown_percentage = (capital_drawdown / initial_capital) * 100 if initial_capital != 0 else 0
-
-    min_liquidity = liquidity_position.min()
-    liquidity_shortfall = abs(min_liquidity) if min_liquidity < 0 else 0
-
-    metrics = {
-        'Initial_Capital': initial_capital,
-        'Minimum_Capital_Remaining': min_capital,
-        'Capital_Drawdown': capital_drawdown,
-        'Capital_Drawdown_Percentage': capital_drawdown_percentage,
-        'Minimum_Liquidity_Position': min_liquidity,
-        'Liquidity_Shortfall': liquidity_shortfall
-    }
-    return metrics, projected_data # Also return the augmented data for plotting
+# Computation lives in the Streamlit-free risk_engine package; names are re-exported here for existing imports
+from risk_engine.analytics import (
+    AGGREGATION_FUNCTIONS,
+    AGGREGATION_PERIODS,
+    COMPARISON_BAR_BUDGET,
+    HEATMAP_ANNOTATION_LIMIT,
+    SCATTER_DENSITY_THRESHOLD,
+    TOP_CORRELATION_PAIRS,
+    TREND_POINT_BUDGET,
+    aggregate_by_period,
+    choose_aggregation_period,
+    correlation_from_stats,
+    correlation_stats_for,
+    downsample_minmax,
+    regression_from_stats,
+    scatter_density,
+    spectral_order,
+    top_correlated_pairs,
+)
+from risk_engine.metrics import (
+    calculate_portfolio_risk_metrics,
+    calculate_risk_capacity_metrics,
+    calculate_risk_capacity_metrics_lean,
+    risk_capacity_columns,
+)
+from risk_engine.sensitivities import risk_metric_sensitivities, sensitivity_tornado
+from risk_engine.stress import stressed_view
+from risk_engine.profiling import profile_stage, session_id, session_profiler, summarize_profile
+from risk_engine.store import get_dataset_store
+from risk_engine.workspace import WORKSPACE_METRICS, WORKSPACE_SERIES_COLUMNS
+
+__all__ = ['calculate_risk_capacity_metrics', 'generate_visualizations', 'run_page3']
+
+def _render_chart(fig, profiler=None):
+    """Hands a figure to Streamlit, timing its JSON serialization as a stage of its own."""
+    with profile_stage(profiler, 'serialization'):
+        st.plotly_chart(fig, use_container_width=True)
 
 def generate_visualizations(data, plot_type, config={}):
-    """Generates and displays visualizations based on plot_type using Plotly."""
+    """Generates and displays visualizations based on plot_type using Plotly.
+
+    Supported `config` keys:
+        max_points (int): Per-trace point budget of trend plots before min/max
+                          downsampling and WebGL rendering switch on. Default is 4000.
+        max_bars (int): Bucket budget used to pick the automatic comparison period. Default is 120.
+        dataset_key (hashable): Identifies `data` for the aggregate and correlation caches.
+                                Defaults to a content hash.
+        top_k_pairs (int): Pairs listed under large correlation heatmaps. Default is 10.
+        density_threshold (int): Rows above which scatter plots switch to a binned density layer.
+                                 Default is 20000.
+        profiler (StageProfiler): Records the 'serialization' stage of every chart.
+    """
+    profiler = config.get('profiler')
     if data.empty:
         st.warning("Dataframe is empty, cannot generate visualizations.")
         return
@@ -112,32 +84,46 @@ def generate_visualizations(data, plot_type, config={}):
             selected_y = st.sidebar.selectbox("Select Y-axis", options=[col for col in numeric_columns if col != selected_x])
 
             if selected_x and selected_y:
+                dataset_key = config.get('dataset_key')
+                correlation_stats = correlation_stats_for(data, numeric_columns, dataset_key)
+                regression = regression_from_stats(correlation_stats, selected_x, selected_y)
+
                 # Create scatter plot
                 fig = go.Figure()
                 
-                # Add scatter points
-                fig.add_trace(go.Scatter(
-                    x=data[selected_x],
-                    y=data[selected_y],
-                    mode='markers',
-                    name='Data Points',
-                    marker=dict(
-                        color='#1f77b4',
-                        size=8,
-                        opacity=0.7
-                    )
-                ))
+                if len(data) > config.get('density_threshold', SCATTER_DENSITY_THRESHOLD):
+                    # Too many points to ship individually: show binned density instead
+                    counts, x_centres, y_centres = scatter_density(data, selected_x, selected_y, dataset_key=dataset_key)
+                    fig.add_trace(go.Heatmap(
+                        x=x_centres,
+                        y=y_centres,
+                        z=np.where(counts > 0, counts, np.nan),
+                        colorscale='Blues',
+                        colorbar=dict(title='Points'),
+                        name='Point Density'
+                    ))
+                else:
+                    # Add scatter points
+                    fig.add_trace(go.Scatter(
+                        x=data[selected_x],
+                        y=data[selected_y],
+                        mode='markers',
+                        name='Data Points',
+                        marker=dict(
+                            color='#1f77b4',
+                            size=8,
+                            opacity=0.7
+                        )
+                    ))
                 
-                # Calculate and add trend line
-                x_values = data[selected_x].values
-                y_values = data[selected_y].values
-                coefficients = np.polyfit(x_values, y_values, 1)
-                trend_line = np.poly1d(coefficients)
+                # Trend line from the closed-form least-squares fit; a straight line needs only its endpoints
+                x_index = correlation_stats['Columns'].index(selected_x)
+                x_range = np.array([correlation_stats['Minimum'][x_index], correlation_stats['Maximum'][x_index]])
                 
                 # Add trend line trace
                 fig.add_trace(go.Scatter(
-                    x=data[selected_x],
-                    y=trend_line(x_values),
+                    x=x_range,
+                    y=regression['Intercept'] + regression['Slope'] * x_range,
                     mode='lines',
                     name='Trend Line',
                     line=dict(color='#d62728', width=2)
@@ -157,41 +143,44 @@ def generate_visualizations(data, plot_type, config={}):
                     showlegend=True
                 )
                 
-                st.plotly_chart(fig, use_container_width=True)
+                _render_chart(fig, profiler)
                 
-                # Calculate correlation coefficient
-                correlation = data[selected_x].corr(data[selected_y])
-                st.info(f"**Correlation Coefficient**: {correlation:.3f}")
+                st.info(f"**Correlation Coefficient**: {regression['Correlation']:.3f}")
                 
             else:
                 st.info("Select two numeric columns to display the relationship analysis.")
                 
         elif plot_type == "Correlation Heatmap":
-            # Create correlation matrix
-            correlation_matrix = data[numeric_columns].corr()
+            # Correlation matrix from cached one-pass statistics
+            correlation_stats = correlation_stats_for(data, numeric_columns, config.get('dataset_key'))
+            correlation_matrix = correlation_from_stats(correlation_stats)
+            annotate = len(numeric_columns) <= HEATMAP_ANNOTATION_LIMIT
+            if not annotate:
+                ordered_columns = spectral_order(correlation_matrix)
+                correlation_matrix = correlation_matrix.loc[ordered_columns, ordered_columns]
             
             # Create heatmap
             fig = go.Figure(data=go.Heatmap(
                 z=correlation_matrix,
-                x=numeric_columns,
-                y=numeric_columns,
+                x=correlation_matrix.columns.tolist(),
+                y=correlation_matrix.columns.tolist(),
                 colorscale='RdBu',  # Red-Blue diverging colorscale
                 zmid=0,  # Center the colorscale at 0
-                text=correlation_matrix.round(2),
-                texttemplate='%{text}',
+                text=correlation_matrix.round(2) if annotate else None,
+                texttemplate='%{text}' if annotate else None,
                 textfont={"size": 10},
                 hoverongaps=False
             ))
             
             fig.update_layout(
-                title='Correlation Heatmap of All Metrics',
+                title='Correlation Heatmap of All Metrics' + ('' if annotate else ' (clustered order)'),
                 title_x=0.5,
                 width=700,
                 height=700,
                 xaxis_tickangle=-45
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            _render_chart(fig, profiler)
             
             st.markdown("""
             **Interpreting the Heatmap:**
@@ -200,6 +189,11 @@ def generate_visualizations(data, plot_type, config={}):
             - Values close to 0 (white) indicate little to no correlation
             """)
 
+            if not annotate:
+                st.markdown("**Strongest Correlations**")
+                st.dataframe(top_correlated_pairs(correlation_matrix, config.get('top_k_pairs', TOP_CORRELATION_PAIRS)),
+                             use_container_width=True, hide_index=True)
+
     elif plot_type == 'trend':
         st.subheader("Trend Plots (Line Charts)")
         numeric_columns = data.select_dtypes(include=['number']).columns.tolist()
@@ -213,11 +207,18 @@ def generate_visualizations(data, plot_type, config={}):
         )
         
         if selected_metrics:
+            max_points = config.get('max_points', TREND_POINT_BUDGET)
+            downsample = len(data) > max_points
+            # WebGL traces keep long series responsive in the browser
+            trace_type = go.Scattergl if downsample else go.Scatter
+            dates = data['Date'].to_numpy()
             fig = go.Figure()
             for metric in selected_metrics:
-                fig.add_trace(go.Scatter(
-                    x=data['Date'],
-                    y=data[metric],
+                values = data[metric].to_numpy()
+                positions = downsample_minmax(values, max_points) if downsample else slice(None)
+                fig.add_trace(trace_type(
+                    x=dates[positions],
+                    y=values[positions],
                     name=metric,
                     mode='lines'
                 ))
@@ -228,7 +229,10 @@ def generate_visualizations(data, plot_type, config={}):
                 yaxis_title='Value',
                 legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
             )
-            st.plotly_chart(fig, use_container_width=True)
+            _render_chart(fig, profiler)
+            if downsample:
+                st.caption(f"Showing about {max_points:,} of {len(data):,} points per metric "
+                           "(min/max downsampled, so peaks and troughs are preserved).")
         else:
             st.info("Please select at least one metric to display the trend plot.")
 
@@ -245,14 +249,33 @@ def generate_visualizations(data, plot_type, config={}):
         col1_name = st.sidebar.selectbox("Select First Column for Comparison", options=numeric_columns)
         col2_name = st.sidebar.selectbox("Select Second Column for Comparison", options=[col for col in numeric_columns if col != col1_name])
 
+        auto_period = choose_aggregation_period(data['Date'], config.get('max_bars', COMPARISON_BAR_BUDGET))
+        period = st.sidebar.selectbox(
+            "Aggregation Period",
+            options=[f"Auto ({auto_period})", "Daily"] + list(AGGREGATION_PERIODS),
+            help="Long histories are bucketed so the chart stays readable. Auto picks the finest period that fits."
+        )
+        period = auto_period if period.startswith("Auto") else period
+        aggregation = 'sum'
+        if period != 'Daily':
+            aggregation = st.sidebar.selectbox("Aggregation", options=AGGREGATION_FUNCTIONS)
+
         if col1_name and col2_name:
+            if period == 'Daily':
+                x_values, y1_values, y2_values = data['Date'], data[col1_name], data[col2_name]
+            else:
+                aggregated = aggregate_by_period(data, period, config.get('dataset_key'))
+                x_values = aggregated.index
+                y1_values = aggregated[(col1_name, aggregation)]
+                y2_values = aggregated[(col2_name, aggregation)]
             fig = go.Figure(data=[
-                go.Bar(name=col1_name, x=data['Date'], y=data[col1_name], marker_color='#1f77b4'),  # Deep blue
-                go.Bar(name=col2_name, x=data['Date'], y=data[col2_name], marker_color='#d62728')   # Deep red
+                go.Bar(name=col1_name, x=x_values, y=y1_values, marker_color='#1f77b4'),  # Deep blue
+                go.Bar(name=col2_name, x=x_values, y=y2_values, marker_color='#d62728')   # Deep red
             ])
+            title_suffix = '' if period == 'Daily' else f' ({period} {aggregation})'
             fig.update_layout(
                 barmode='group', 
-                title=f'Comparison: {col1_name} vs {col2_name}', 
+                title=f'Comparison: {col1_name} vs {col2_name}{title_suffix}', 
                 title_x=0.5,
                 legend=dict(
                     orientation="h",
@@ -262,7 +285,7 @@ def generate_visualizations(data, plot_type, config={}):
                     x=1
                 )
             )
-            st.plotly_chart(fig, use_container_width=True)
+            _render_chart(fig, profiler)
         else:
             st.info("Select two numeric columns to display a comparison plot.")
 
@@ -283,14 +306,26 @@ def run_page3():
       $$ \text{Liquidity Shortfall} = \begin{cases} |\text{Minimum Liquidity Position}| & \text{if } \text{Minimum Liquidity Position} < 0 \\ 0 & \text{otherwise} \end{cases} $$
     """)
 
-    if 'stressed_data' not in st.session_state:
+    store, owner = get_dataset_store(), session_id(st.session_state)
+    try:
+        base_data = store.fetch(owner, 'base')
+        stress_adjustments = store.fetch(owner, 'stress')
+    except (KeyError, FileNotFoundError):
+        base_data = stress_adjustments = None  # Evicted and no longer reproducible
+    if base_data is None or stress_adjustments is None:
         st.error("No stressed data available. Please go to Page 1 to load data and Page 2 to apply stress.")
         st.stop()
+    if st.session_state.get('stress_fingerprint') != st.session_state.get('base_fingerprint'):
+        st.error("The base data has changed since the last stress test. Please re-run it on Page 2.")
+        st.stop()
 
-    stressed_data = st.session_state['stressed_data']
+    # The base data and adjusted columns are shared through the dataset store; this view shares their memory
+    stressed_data = stressed_view(base_data, stress_adjustments)
+    profiler = session_profiler(st.session_state, 'Visualizations')
     
-    # Debug information to help understand what's in the data
-    with st.expander("**Debug Info**: Available Data Columns"):
+    # Debug information to help understand what's in the data; stage timings are added at the end of the run
+    debug_panel = st.expander("**Debug Info**: Available Data Columns")
+    with debug_panel:
         st.write("**Columns in stressed_data:**", list(stressed_data.columns))
         st.write("**Session state keys:**", list(st.session_state.keys()))
         if 'stress_type' in st.session_state:
@@ -300,15 +335,34 @@ def run_page3():
         else:
             st.write("**Last stress test applied:** None")
         st.write("**Data shape:**", stressed_data.shape)
+        st.write("**Session data memory:**",
+                 f"{base_data.memory_usage(deep=True).sum() / 1024 ** 2:,.1f} MB base + "
+                 f"{stress_adjustments.memory_usage(deep=True).sum() / 1024 ** 2:,.1f} MB adjusted columns")
         if len(stressed_data) > 0:
             st.write("**Sample data:**")
             st.dataframe(stressed_data.head(3))
 
-    risk_metrics, augmented_data = {}, pd.DataFrame()
+    missing_adjusted = [col for col in ['Adjusted_Revenue', 'Adjusted_Costs'] if col not in stressed_data.columns]
+    if not {'Base_Revenue', 'Base_Costs'}.issubset(stressed_data.columns):
+        st.warning("Base_Revenue or Base_Costs not available for full impact calculation. Capital and Liquidity impacts might be inaccurate or estimated.")
+    elif missing_adjusted:
+        st.info(f"**Stress Test Data Completed**: {', '.join(missing_adjusted)} were missing but have been filled with base values. This usually happens when:\n"
+               "- You haven't run the stress test simulation on Page 2 yet\n"
+               "- The stress test was applied but only to one parameter\n\n"
+               "**Solution**: The missing columns have been automatically filled with base values (no stress applied to those parameters).")
+
+    risk_metrics, augmented_data, entity_metrics = {}, pd.DataFrame(), None
     err = None
     with st.spinner("Calculating risk metrics..."):
         try:
-            risk_metrics, augmented_data = calculate_risk_capacity_metrics(stressed_data.copy())
+            with profiler.stage('metrics', rows=len(stressed_data)):
+                if 'Entity' in stressed_data.columns:
+                    # Plots use the firm-level roll-up; per-entity results are tabulated below
+                    risk_metrics, entity_metrics, _, augmented_data = calculate_portfolio_risk_metrics(stressed_data)
+                else:
+                    # Metric columns are derived on request for the charts and never stored
+                    risk_metrics = calculate_risk_capacity_metrics_lean(base_data, stress_adjustments)
+                    augmented_data = pd.concat([stressed_data, risk_capacity_columns(base_data, stress_adjustments)], axis=1)
             st.success("Risk metrics calculated.")
         except Exception as e:
             err = str(e)
@@ -331,6 +385,83 @@ def run_page3():
     for i, (label, value) in enumerate(metrics_display.items()):
         cols[i % 3].metric(label=label, value=f"{value:.2f}" if isinstance(value, (int, float)) else value)
 
+    if entity_metrics is not None:
+        st.caption(f"Firm-level metrics rolled up from {len(entity_metrics):,} entities.")
+        with st.expander("**Entity Breakdown**: Risk capacity metrics per entity", expanded=False):
+            st.dataframe(entity_metrics.sort_values('Capital_Drawdown_Percentage', ascending=False),
+                         use_container_width=True)
+
+    with st.expander("**Sensitivities**: Which parameters move the metrics most", expanded=False):
+        st.markdown("""
+        Exact derivatives of every metric with respect to each component shock, the stress setting and the
+        starting buffers, obtained analytically from the stressed paths in a single pass. The tornado chart
+        shows the first-order change of the selected metric when each parameter moves down or up.
+        """)
+        try:
+            with profiler.stage('sensitivities', rows=len(base_data)):
+                _, gradients = risk_metric_sensitivities(base_data, stress_adjustments,
+                                                         st.session_state.get('stress_type'),
+                                                         st.session_state.get('stress_parameters'))
+            tornado_metric = st.selectbox("Metric to explain:", list(gradients.index),
+                                          index=list(gradients.index).index('Capital_Drawdown_Percentage'))
+            tornado = sensitivity_tornado(gradients, tornado_metric)
+            tornado_labels = tornado['Parameter'] + ' ± ' + tornado['Bump'].map('{:g}'.format)
+            fig = go.Figure([
+                go.Bar(y=tornado_labels, x=tornado['Low'], orientation='h', name='Parameter down'),
+                go.Bar(y=tornado_labels, x=tornado['High'], orientation='h', name='Parameter up'),
+            ])
+            fig.update_layout(barmode='overlay', title=f"Sensitivity of {tornado_metric}",
+                              xaxis_title=f"Change in {tornado_metric}", yaxis=dict(autorange='reversed'))
+            _render_chart(fig, profiler)
+            st.dataframe(gradients, use_container_width=True)
+        except Exception as e:
+            st.error(f"**Sensitivity Error**: {e}")
+
+    with st.expander("**Scenario Comparison**: Rank and overlay completed runs", expanded=False):
+        st.markdown("""
+        Every stress test completed on Page 2 is kept here with its metrics and a compact copy of its paths,
+        so runs on the current base data can be ranked, filtered and overlaid without recomputing them.
+        """)
+        workspace = st.session_state.get('workspace')
+        scenarios = None if workspace is None else workspace.index(st.session_state.get('base_fingerprint'))
+        if scenarios is None or scenarios.empty:
+            st.info("No completed runs on the current base data yet. Execute stress tests on Page 2 to collect them.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                rank_metric = st.selectbox("Rank by:", WORKSPACE_METRICS,
+                                           index=WORKSPACE_METRICS.index('Capital_Drawdown_Percentage'))
+            with col2:
+                descending = st.checkbox("Largest first", value=True)
+            with col3:
+                top_n = st.number_input("Runs to show:", min_value=1, max_value=len(scenarios),
+                                        value=min(10, len(scenarios)), step=1)
+            low, high = float(scenarios[rank_metric].min()), float(scenarios[rank_metric].max())
+            bounds = (low, high)
+            if low < high:
+                bounds = st.slider(f"Keep runs with {rank_metric} between:", low, high, (low, high))
+            ranked = workspace.query(filters={rank_metric: bounds}, sort_by=rank_metric, ascending=not descending,
+                                     limit=int(top_n), base_fingerprint=st.session_state.get('base_fingerprint'))
+            st.dataframe(ranked.drop(columns=['Base_Fingerprint']), use_container_width=True)
+
+            if not ranked.empty:
+                fig = go.Figure(go.Bar(x=ranked['Label'], y=ranked[rank_metric], name=rank_metric))
+                fig.update_layout(title=f"Runs Ranked by {rank_metric}", xaxis_title='Run', yaxis_title=rank_metric)
+                _render_chart(fig, profiler)
+
+                overlay_column = st.selectbox("Path to overlay:", WORKSPACE_SERIES_COLUMNS,
+                                              index=WORKSPACE_SERIES_COLUMNS.index('Capital_Remaining'))
+                fig = go.Figure()
+                for key, (dates, values) in workspace.series(list(ranked.index), overlay_column).items():
+                    fig.add_trace(go.Scattergl(x=dates, y=values, name=ranked.loc[key, 'Label'], mode='lines'))
+                fig.update_layout(title=f"{overlay_column} Across Runs", xaxis_title='Date', yaxis_title=overlay_column)
+                _render_chart(fig, profiler)
+                st.caption("Paths are firm-level and min/max downsampled, so peaks and troughs are preserved.")
+
+            if st.button("Clear Scenario Workspace"):
+                workspace.clear()
+                st.rerun()
+
     st.markdown("---")
 
     st.sidebar.markdown("#### Visualization Settings")
@@ -342,14 +473,23 @@ def run_page3():
     # Create two columns for visualization and definitions
     viz_col, def_col = st.columns([2, 1])
 
+    # Identify the augmented data by its inputs so cached aggregates survive reruns without rehashing it
+    visualization_config = {'profiler': profiler}
+    if 'base_fingerprint' in st.session_state and 'stress_type' in st.session_state:
+        visualization_config['dataset_key'] = (
+            st.session_state['base_fingerprint'],
+            st.session_state['stress_type'],
+            tuple(sorted(st.session_state.get('stress_parameters', {}).items()))
+        )
+
     with viz_col:
-        with st.spinner("Generating visualizations..."):
+        with st.spinner("Generating visualizations..."), profiler.stage('figure_build', rows=len(augmented_data)):
             if plot_selection == "Trend":
-                generate_visualizations(augmented_data, 'trend')
+                generate_visualizations(augmented_data, 'trend', visualization_config)
             elif plot_selection == "Relationship":
-                generate_visualizations(augmented_data, 'relationship')
+                generate_visualizations(augmented_data, 'relationship', visualization_config)
             elif plot_selection == "Comparison":
-                generate_visualizations(augmented_data, 'comparison')
+                generate_visualizations(augmented_data, 'comparison', visualization_config)
 
     with def_col:
         st.markdown("#### **Visualization Definitions**")
@@ -387,4 +527,23 @@ def run_page3():
               - Relative performance patterns
             - **Business Value**: Quantify stress test impact and identify most vulnerable periods
             """)
+
+    run_records = profiler.flush(st.session_state.setdefault('stage_profile', []))
+    with debug_panel:
+        run_columns, session_summary = ['stage', 'wall_seconds'], summarize_profile(st.session_state['stage_profile'])
+        if profiler.trace_memory:
+            run_columns.append('peak_memory_bytes')
+        else:
+            session_summary = session_summary.drop(columns='Max Peak (MiB)')
+        st.write("**Stage timings of this run:**")
+        st.dataframe(pd.DataFrame(run_records)[run_columns], use_container_width=True)
+        st.write("**Stage timings of this session:**")
+        st.dataframe(session_summary, use_container_width=True)
+        if profiler.trace_memory:
+            st.caption("Wall times exclude nested stages (figure build excludes serialization); peaks include them. "
+                       "Set QULAB_PROFILE_LOG to append every record to a JSONL file.")
+        else:
+            st.caption("Wall times exclude nested stages (figure build excludes serialization). Memory tracing is "
+                       "disabled; set QULAB_PROFILE_MEMORY=1 to record peak memory per stage. "
+                       "Set QULAB_PROFILE_LOG to append every record to a JSONL file.")
     
@@ -0,0 +1,282 @@
+"""Reproducible benchmarks for the ingest, stress, metrics and plotting stages.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--preset quick|default|full] [--rows 1000,100000]
+                                        [--entities 1,50] [--stages ingest_csv,stress,...]
+                                        [--repeat 3] [--output results.json]
+                                        [--baseline baseline.json] [--save-baseline]
+
+Each (rows, entities) case builds a seeded synthetic dataset with `generate_synthetic_data`,
+so runs on the same machine are comparable. Every stage is timed `--repeat` times with its
+caches cleared in between, then run once more under `tracemalloc` for its peak memory
+(NumPy and pandas report their buffers to tracemalloc). Results are written as JSON; with
+`--baseline`, stages slower or hungrier than the baseline by more than `--threshold` are
+reported as regressions and the script exits with status 1. Wall times are compared on
+the best of the timed runs, and stages under 10 ms are only checked for memory.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from risk_engine.analytics import get_visualization_cache  # noqa: E402
+from risk_engine.data import STREAMING_CHUNKSIZE, STREAMING_THRESHOLD_BYTES, generate_synthetic_data, load_and_validate_data  # noqa: E402
+from risk_engine.metrics import (  # noqa: E402
+    calculate_portfolio_risk_metrics,
+    calculate_risk_capacity_metrics,
+    calculate_risk_capacity_metrics_lean,
+)
+from risk_engine.stress import simulate_stress_impact  # noqa: E402
+
+PRESETS = {
+    'quick': {'rows': [1_000, 100_000], 'entities': [1, 10]},
+    'default': {'rows': [1_000, 100_000, 1_000_000], 'entities': [1, 50]},
+    'full': {'rows': [1_000, 100_000, 1_000_000, 10_000_000], 'entities': [1, 50, 500]},
+}
+STAGES = ['ingest_csv', 'ingest_parquet', 'stress', 'stress_lean', 'metrics', 'metrics_lean', 'plot_trend', 'plot_relationship', 'plot_comparison']
+STRESS_PARAMETERS = ('Scenario', {'scenario_severity_factor': 0.2})
+REGRESSION_THRESHOLD = 0.20
+MIN_COMPARABLE_SECONDS = 0.01  # Faster stages are dominated by timer noise
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_revision': _git_revision(),
+    }
+
+def _clear_caches():
+    get_visualization_cache().clear()
+    gc.collect()
+
+def _plot(plot_type):
+    # Imported lazily: plotting is the only stage that needs Streamlit
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    from application_pages.page3 import generate_visualizations
+
+    # Load the config first (it resets the log level), then silence the bare-mode warnings
+    config.get_option('logger.level')
+    set_log_level('error')
+
+    def run(inputs):
+        generate_visualizations(inputs['plot_data'], plot_type, {})
+    return run
+
+def _ingest(fmt):
+    def run(inputs):
+        path = inputs[f'{fmt}_path']
+        chunksize = STREAMING_CHUNKSIZE if os.path.getsize(path) > STREAMING_THRESHOLD_BYTES else None
+        return load_and_validate_data(path, chunksize=chunksize)
+    return run
+
+def _stress(inputs):
+    return simulate_stress_impact(inputs['data'], *STRESS_PARAMETERS)
+
+def _stress_lean(inputs):
+    return simulate_stress_impact(inputs['data'], *STRESS_PARAMETERS, lean=True)
+
+def _metrics(inputs):
+    if 'Entity' in inputs['stressed'].columns:
+        return calculate_portfolio_risk_metrics(inputs['stressed'])
+    # Copied as on page 3, since the metric columns are added to the input
+    return calculate_risk_capacity_metrics(inputs['stressed'].copy())
+
+def _metrics_lean(inputs):
+    return calculate_risk_capacity_metrics_lean(inputs['data'], inputs['adjustments'])
+
+STAGE_FUNCTIONS = {
+    'ingest_csv': _ingest('csv'),
+    'ingest_parquet': _ingest('parquet'),
+    'stress': _stress,
+    'stress_lean': _stress_lean,
+    'metrics': _metrics,
+    'metrics_lean': _metrics_lean,
+    'plot_trend': _plot('trend'),
+    'plot_relationship': _plot('relationship'),
+    'plot_comparison': _plot('comparison'),
+}
+
+def _prepare_inputs(n_rows, n_entities, stages, work_dir):
+    """Builds the dataset of one case and the intermediate inputs of every requested stage."""
+    num_entities = n_entities if n_entities > 1 else None
+    data = generate_synthetic_data(max(n_rows // n_entities, 1), num_entities)
+    inputs = {'data': data}
+    if 'ingest_csv' in stages:
+        inputs['csv_path'] = os.path.join(work_dir, f'bench_{n_rows}_{n_entities}.csv')
+        data.to_csv(inputs['csv_path'], index=False)
+    if 'ingest_parquet' in stages:
+        inputs['parquet_path'] = os.path.join(work_dir, f'bench_{n_rows}_{n_entities}.parquet')
+        data.to_parquet(inputs['parquet_path'], index=False)
+    inputs['stressed'] = _stress(inputs)
+    inputs['adjustments'] = _stress_lean(inputs)
+    if any(stage.startswith('plot_') for stage in stages):
+        result = _metrics(inputs)
+        # Page 3 plots the firm-level roll-up of panels
+        inputs['plot_data'] = result[3] if num_entities else result[1]
+    return inputs
+
+def _measure(stage_function, inputs, repeat):
+    """Times `stage_function` `repeat` times, then measures its tracemalloc peak in one extra run."""
+    wall_times = []
+    for _ in range(repeat):
+        _clear_caches()
+        start = time.perf_counter()
+        stage_function(inputs)
+        wall_times.append(time.perf_counter() - start)
+
+    _clear_caches()
+    tracemalloc.start()
+    try:
+        stage_function(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return wall_times, peak
+
+def run_benchmarks(rows, entities, stages=STAGES, repeat=3, work_dir=None):
+    """Runs every stage for every (rows, entities) case.
+
+    Args:
+        rows (list): Total row counts of the generated datasets.
+        entities (list): Entity counts; 1 builds a single series, more build a panel.
+        stages (list, optional): Stage names from `STAGES`. Default is all stages.
+        repeat (int, optional): Timed runs per stage. Default is 3.
+        work_dir (str, optional): Directory for the ingest files. Defaults to a temporary directory.
+
+    Returns:
+        dict: 'environment' details and a 'results' list with one record per case and stage.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        for n_rows in rows:
+            for n_entities in entities:
+                if n_entities > n_rows:
+                    continue
+                inputs = _prepare_inputs(n_rows, n_entities, stages, tmp_dir)
+                actual_rows = len(inputs['data'])
+                for stage in stages:
+                    wall_times, peak = _measure(STAGE_FUNCTIONS[stage], inputs, repeat)
+                    median = statistics.median(wall_times)
+                    record = {
+                        'stage': stage,
+                        'rows': actual_rows,
+                        'entities': n_entities,
+                        'wall_seconds_median': median,
+                        'wall_seconds_min': min(wall_times),
+                        'peak_memory_bytes': peak,
+                        'rows_per_second': actual_rows / median if median > 0 else None,
+                    }
+                    results.append(record)
+                    print(f"{stage:<18} rows={actual_rows:>10,} entities={n_entities:>4} "
+                          f"median={median:9.4f}s peak={peak / 1024 ** 2:9.1f}MiB "
+                          f"throughput={record['rows_per_second'] or 0:14,.0f} rows/s", flush=True)
+                del inputs
+                for path in os.listdir(tmp_dir):
+                    os.remove(os.path.join(tmp_dir, path))
+    return {'environment': _environment(), 'results': results}
+
+def compare_to_baseline(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Compares a report against a saved baseline.
+
+    Args:
+        report (dict): Output of `run_benchmarks`.
+        baseline (dict): A previously saved report.
+        threshold (float, optional): Relative slowdown or memory growth tolerated. Default is 0.20.
+
+    Returns:
+        list: One dict per case present in both reports, with the best wall time and peak memory
+              ratios (current / baseline) and a 'regression' flag.
+    """
+    baseline_results = {(r['stage'], r['rows'], r['entities']): r for r in baseline['results']}
+    comparisons = []
+    for record in report['results']:
+        reference = baseline_results.get((record['stage'], record['rows'], record['entities']))
+        if reference is None:
+            continue
+        wall_ratio = record['wall_seconds_min'] / reference['wall_seconds_min'] if reference['wall_seconds_min'] else None
+        memory_ratio = record['peak_memory_bytes'] / reference['peak_memory_bytes'] if reference['peak_memory_bytes'] else None
+        wall_regression = (wall_ratio is not None and wall_ratio > 1 + threshold
+                           and max(record['wall_seconds_min'], reference['wall_seconds_min']) >= MIN_COMPARABLE_SECONDS)
+        comparisons.append({
+            'stage': record['stage'],
+            'rows': record['rows'],
+            'entities': record['entities'],
+            'wall_ratio': wall_ratio,
+            'memory_ratio': memory_ratio,
+            'regression': wall_regression or (memory_ratio is not None and memory_ratio > 1 + threshold),
+        })
+    return comparisons
+
+def _parse_sizes(value):
+    return [int(float(item)) for item in value.split(',') if item]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingest, stress, metrics and plotting at scale.")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='default', help="Size grid to run (default: default).")
+    parser.add_argument('--rows', type=_parse_sizes, help="Comma-separated row counts, overriding the preset.")
+    parser.add_argument('--entities', type=_parse_sizes, help="Comma-separated entity counts, overriding the preset.")
+    parser.add_argument('--stages', type=lambda value: value.split(','), default=STAGES,
+                        help=f"Comma-separated stages (default: {','.join(STAGES)}).")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (default: 3).")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON report.")
+    parser.add_argument('--baseline', help="Saved report to compare against.")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the report to --baseline.")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative slowdown or memory growth reported as a regression (default: 0.20).")
+    parser.add_argument('--work-dir', help="Directory for temporary ingest files (default: system temp).")
+    args = parser.parse_args(argv)
+
+    unknown = [stage for stage in args.stages if stage not in STAGE_FUNCTIONS]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}")
+
+    preset = PRESETS[args.preset]
+    report = run_benchmarks(args.rows or preset['rows'], args.entities or preset['entities'],
+                            args.stages, args.repeat, args.work_dir)
+
+    exit_code = 0
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            comparisons = compare_to_baseline(report, json.load(f), args.threshold)
+        report['baseline_comparison'] = comparisons
+        print(f"\nComparison with {args.baseline} (ratios are current / baseline):")
+        for comparison in comparisons:
+            flag = 'REGRESSION' if comparison['regression'] else 'ok'
+            print(f"{comparison['stage']:<18} rows={comparison['rows']:>10,} entities={comparison['entities']:>4} "
+                  f"wall x{comparison['wall_ratio'] or 0:6.2f} memory x{comparison['memory_ratio'] or 0:6.2f}  {flag}")
+        if any(comparison['regression'] for comparison in comparisons):
+            exit_code = 1
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline and args.baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
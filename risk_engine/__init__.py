@@ -0,0 +1,75 @@
+"""Streamlit-free stress testing engine behind the QuLab pages and the batch CLI."""
+from risk_engine.caching import LRUCache
+from risk_engine.data import (
+    dataset_fingerprint,
+    generate_synthetic_data,
+    load_and_validate_data,
+)
+from risk_engine.metrics import (
+    calculate_portfolio_risk_metrics,
+    calculate_risk_capacity_metrics,
+    calculate_risk_capacity_metrics_batch,
+    calculate_risk_capacity_metrics_lean,
+    init_risk_capacity_state,
+    risk_capacity_columns,
+    update_risk_capacity_metrics,
+)
+from risk_engine.reverse import solve_reverse_stress
+from risk_engine.schedules import (
+    ShockSchedule,
+    apply_schedules,
+    compose_schedules,
+    decay_schedule,
+    load_schedule,
+    piecewise_schedule,
+    ramp_schedule,
+    schedule_library_metrics,
+    step_schedule,
+)
+from risk_engine.sensitivities import risk_metric_sensitivities, sensitivity_tornado
+from risk_engine.stress import (
+    run_scenario_batch,
+    simulate_correlated_shocks,
+    simulate_stress_grid,
+    simulate_stress_impact,
+    simulate_stress_monte_carlo,
+    stress_grid_to_frame,
+    stressed_view,
+)
+from risk_engine.workspace import ScenarioWorkspace, scenario_hash, summarize_run
+
+__all__ = [
+    'LRUCache',
+    'dataset_fingerprint',
+    'generate_synthetic_data',
+    'load_and_validate_data',
+    'calculate_portfolio_risk_metrics',
+    'calculate_risk_capacity_metrics',
+    'calculate_risk_capacity_metrics_batch',
+    'calculate_risk_capacity_metrics_lean',
+    'init_risk_capacity_state',
+    'risk_capacity_columns',
+    'update_risk_capacity_metrics',
+    'solve_reverse_stress',
+    'ShockSchedule',
+    'apply_schedules',
+    'compose_schedules',
+    'decay_schedule',
+    'load_schedule',
+    'piecewise_schedule',
+    'ramp_schedule',
+    'schedule_library_metrics',
+    'step_schedule',
+    'risk_metric_sensitivities',
+    'sensitivity_tornado',
+    'run_scenario_batch',
+    'simulate_correlated_shocks',
+    'simulate_stress_grid',
+    'simulate_stress_impact',
+    'simulate_stress_monte_carlo',
+    'stress_grid_to_frame',
+    'stressed_view',
+    'ScenarioWorkspace',
+    'scenario_hash',
+    'summarize_run',
+]
@@ -0,0 +1,264 @@
+"""Plot-ready analytics: downsampling, period aggregation, correlation statistics and density binning."""
+import pandas as pd
+import numpy as np
+
+from risk_engine.caching import LRUCache
+from risk_engine.data import dataset_fingerprint
+
+TREND_POINT_BUDGET = 4000
+COMPARISON_BAR_BUDGET = 120
+VISUALIZATION_CACHE_MAX_BYTES = 256 * 1024 ** 2
+AGGREGATION_PERIODS = {'Weekly': ('W', 7), 'Monthly': ('ME', 30.44), 'Quarterly': ('QE', 91.31), 'Yearly': ('YE', 365.25)}
+AGGREGATION_FUNCTIONS = ['sum', 'mean', 'min', 'max']
+HEATMAP_ANNOTATION_LIMIT = 25
+TOP_CORRELATION_PAIRS = 10
+SCATTER_DENSITY_THRESHOLD = 20000
+SCATTER_DENSITY_BINS = 100
+CORRELATION_BLOCK_ROWS = 65536  # Rows merged per `update_correlation_stats` call when building statistics
+
+def downsample_minmax(values, max_points):
+    """Selects row positions that preserve the shape of a long series within a point budget.
+
+    The series is split into `max_points // 2` equal buckets and the positions of each
+    bucket's minimum and maximum are kept (plus the first and last point), so peaks and
+    troughs survive downsampling. All buckets are processed in one vectorized pass.
+
+    Args:
+        values (array-like): The y-values of the series, in x order.
+        max_points (int): Approximate maximum number of points to keep.
+
+    Returns:
+        np.ndarray: Sorted integer positions into `values`.
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.size
+    n_buckets = max(1, max_points // 2)
+    if n <= max_points:
+        return np.arange(n)
+
+    bucket_size = -(-n // n_buckets)
+    padded = np.full(n_buckets * bucket_size, np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    lowest = np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1) + offsets
+    highest = np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1) + offsets
+    positions = np.unique(np.concatenate([[0, n - 1], lowest, highest]))
+    return positions[positions < n]
+
+_visualization_cache = LRUCache(max_bytes=VISUALIZATION_CACHE_MAX_BYTES)
+
+def get_visualization_cache():
+    """Returns the process-wide cache of plot-ready aggregates, shared by every session."""
+    return _visualization_cache
+
+def choose_aggregation_period(dates, max_bars=COMPARISON_BAR_BUDGET):
+    """Picks the finest period label from `AGGREGATION_PERIODS` that fits within `max_bars` buckets.
+
+    Args:
+        dates (pd.Series): The datetime column of the data.
+        max_bars (int, optional): Maximum number of buckets. Default is 120.
+
+    Returns:
+        str: 'Daily' when the raw rows already fit, otherwise a key of `AGGREGATION_PERIODS`.
+    """
+    if len(dates) <= max_bars:
+        return 'Daily'
+    span_days = (dates.max() - dates.min()) / pd.Timedelta(days=1)
+    for label, (_, period_days) in AGGREGATION_PERIODS.items():
+        if span_days / period_days <= max_bars:
+            return label
+    return 'Yearly'
+
+def aggregate_by_period(data, period, dataset_key=None, cache=None):
+    """Resamples every numeric column to a calendar period with each of `AGGREGATION_FUNCTIONS`.
+
+    All columns and aggregations are computed together and cached per (dataset, period),
+    so switching the compared columns or the aggregation only selects from the result.
+
+    Args:
+        data (pd.DataFrame): Data with a datetime 'Date' column.
+        period (str): A key of `AGGREGATION_PERIODS`.
+        dataset_key (hashable, optional): Identifies `data`. Computed with `dataset_fingerprint` if omitted.
+        cache (LRUCache, optional): Cache to use. Defaults to `get_visualization_cache()`.
+
+    Returns:
+        pd.DataFrame: Indexed by period end, with (column, aggregation) MultiIndex columns.
+    """
+    cache = get_visualization_cache() if cache is None else cache
+    dataset_key = dataset_fingerprint(data) if dataset_key is None else dataset_key
+    numeric_columns = data.select_dtypes(include=['number']).columns.tolist()
+    return cache.get_or_compute(
+        ('aggregate', dataset_key, period),
+        lambda: data.set_index('Date')[numeric_columns].resample(AGGREGATION_PERIODS[period][0]).agg(AGGREGATION_FUNCTIONS)
+    )
+
+def init_correlation_stats(columns):
+    """Creates empty one-pass sufficient statistics for the correlations of `columns`.
+
+    Args:
+        columns (list): Names of the numeric columns tracked.
+
+    Returns:
+        dict: Row count, mean vector, co-moment matrix and per-column extremes of an empty sample.
+    """
+    return {
+        'Columns': list(columns),
+        'Count': 0,
+        'Mean': np.zeros(len(columns)),
+        'Comoment': np.zeros((len(columns), len(columns))),
+        'Minimum': np.full(len(columns), np.inf),
+        'Maximum': np.full(len(columns), -np.inf)
+    }
+
+def update_correlation_stats(stats, appended_data):
+    """Merges appended rows into correlation statistics (Chan et al. parallel Welford update).
+
+    The appended block is summarised by its own mean and centred co-moment matrix and then
+    combined with the running statistics, so each update costs O(k x c^2) for k rows and c
+    columns, independent of the history already seen. Rows with missing values are skipped.
+
+    Args:
+        stats (dict): Statistics from `init_correlation_stats` or a previous update. Not modified.
+        appended_data (pd.DataFrame): New rows containing every column in `stats['Columns']`.
+
+    Returns:
+        dict: Updated statistics.
+    """
+    block = appended_data[stats['Columns']].to_numpy(dtype=float)
+    block = block[~np.isnan(block).any(axis=1)]
+    n_block = len(block)
+    if n_block == 0:
+        return stats
+
+    block_mean = block.mean(axis=0)
+    centred = block - block_mean
+    block_comoment = centred.T @ centred
+
+    n_total = stats['Count'] + n_block
+    delta = block_mean - stats['Mean']
+    return {
+        'Columns': stats['Columns'],
+        'Count': n_total,
+        'Mean': stats['Mean'] + delta * (n_block / n_total),
+        'Comoment': stats['Comoment'] + block_comoment + np.outer(delta, delta) * (stats['Count'] * n_block / n_total),
+        'Minimum': np.minimum(stats['Minimum'], block.min(axis=0)),
+        'Maximum': np.maximum(stats['Maximum'], block.max(axis=0))
+    }
+
+def correlation_from_stats(stats):
+    """Returns the Pearson correlation matrix described by correlation statistics.
+
+    Args:
+        stats (dict): Statistics from `update_correlation_stats`.
+
+    Returns:
+        pd.DataFrame: Correlation matrix; constant columns yield NaN, as in `DataFrame.corr`.
+    """
+    scale = np.sqrt(np.diag(stats['Comoment']))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = stats['Comoment'] / np.outer(scale, scale)
+    np.fill_diagonal(correlation, np.where(scale > 0, 1.0, np.nan))
+    return pd.DataFrame(correlation, index=stats['Columns'], columns=stats['Columns'])
+
+def correlation_stats_for(data, columns, dataset_key=None, cache=None):
+    """Returns cached correlation statistics of `columns` in `data`, computing them once per dataset.
+
+    The statistics are built by merging blocks of `CORRELATION_BLOCK_ROWS` rows, so the
+    float copy made for the co-moments never exceeds one block, however long the data is.
+
+    Args:
+        data (pd.DataFrame): The data to summarise.
+        columns (list): Numeric columns to include.
+        dataset_key (hashable, optional): Identifies `data`. Computed with `dataset_fingerprint` if omitted.
+        cache (LRUCache, optional): Cache to use. Defaults to `get_visualization_cache()`.
+
+    Returns:
+        dict: Correlation statistics as produced by `update_correlation_stats`.
+    """
+    cache = get_visualization_cache() if cache is None else cache
+    dataset_key = dataset_fingerprint(data) if dataset_key is None else dataset_key
+
+    def compute():
+        stats = init_correlation_stats(columns)
+        for start in range(0, len(data), CORRELATION_BLOCK_ROWS):
+            stats = update_correlation_stats(stats, data.iloc[start:start + CORRELATION_BLOCK_ROWS])
+        return stats
+
+    return cache.get_or_compute(('correlation', dataset_key, tuple(columns)), compute)
+
+def regression_from_stats(stats, x_column, y_column):
+    """Returns the least-squares line and correlation of two columns in O(1) from correlation statistics.
+
+    Args:
+        stats (dict): Statistics from `update_correlation_stats` covering both columns.
+        x_column (str): Regressor column.
+        y_column (str): Response column.
+
+    Returns:
+        dict: 'Slope', 'Intercept' and 'Correlation' (NaN when either column is constant).
+    """
+    i, j = stats['Columns'].index(x_column), stats['Columns'].index(y_column)
+    sxx, syy, sxy = stats['Comoment'][i, i], stats['Comoment'][j, j], stats['Comoment'][i, j]
+    slope = sxy / sxx if sxx > 0 else np.nan
+    return {
+        'Slope': slope,
+        'Intercept': stats['Mean'][j] - slope * stats['Mean'][i],
+        'Correlation': sxy / np.sqrt(sxx * syy) if sxx > 0 and syy > 0 else np.nan
+    }
+
+def scatter_density(data, x_column, y_column, bins=SCATTER_DENSITY_BINS, dataset_key=None, cache=None):
+    """Bins two columns into a 2D histogram so dense scatter plots ship counts instead of points.
+
+    Args:
+        data (pd.DataFrame): The data to bin.
+        x_column (str): Column on the x-axis.
+        y_column (str): Column on the y-axis.
+        bins (int, optional): Bins per axis. Default is 100.
+        dataset_key (hashable, optional): Identifies `data`. Computed with `dataset_fingerprint` if omitted.
+        cache (LRUCache, optional): Cache to use. Defaults to `get_visualization_cache()`.
+
+    Returns:
+        tuple: (counts of shape (bins, bins) indexed [y, x], x bin centres, y bin centres).
+    """
+    cache = get_visualization_cache() if cache is None else cache
+    dataset_key = dataset_fingerprint(data) if dataset_key is None else dataset_key
+
+    def compute():
+        pairs = data[[x_column, y_column]].dropna().to_numpy(dtype=float)
+        counts, x_edges, y_edges = np.histogram2d(pairs[:, 0], pairs[:, 1], bins=bins)
+        return counts.T, (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
+
+    return cache.get_or_compute(('density', dataset_key, x_column, y_column, bins), compute)
+
+def spectral_order(correlation):
+    """Orders columns by the leading eigenvector of the |correlation| matrix so related columns sit together.
+
+    Args:
+        correlation (pd.DataFrame): Square correlation matrix.
+
+    Returns:
+        list: Column names in clustered order.
+    """
+    _, eigenvectors = np.linalg.eigh(np.nan_to_num(correlation.abs().to_numpy()))
+    return correlation.columns[np.argsort(eigenvectors[:, -1])].tolist()
+
+def top_correlated_pairs(correlation, k=TOP_CORRELATION_PAIRS):
+    """Returns the `k` column pairs with the largest absolute correlation.
+
+    Args:
+        correlation (pd.DataFrame): Square correlation matrix.
+        k (int, optional): Number of pairs. Default is 10.
+
+    Returns:
+        pd.DataFrame: Columns 'Metric_A', 'Metric_B', 'Correlation', strongest first.
+    """
+    values = correlation.to_numpy()
+    rows, cols = np.triu_indices(len(values), k=1)
+    pair_values = values[rows, cols]
+    strongest = np.argsort(-np.nan_to_num(np.abs(pair_values), nan=-1))[:k]
+    return pd.DataFrame({
+        'Metric_A': correlation.columns[rows[strongest]],
+        'Metric_B': correlation.columns[cols[strongest]],
+        'Correlation': pair_values[strongest]
+    })
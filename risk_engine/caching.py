@@ -0,0 +1,128 @@
+"""Bounded, thread-safe LRU cache and the size estimates its byte budget relies on."""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+
+def estimate_size(value):
+    """Estimates the in-memory size of a cached value in bytes.
+
+    Args:
+        value: DataFrame, Series, ndarray, or a (possibly nested) tuple/list/dict of them.
+
+    Returns:
+        int: Approximate number of bytes held by the value.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by entry count, total bytes and age.
+
+    Values are returned by reference, so callers must treat them as read-only. One
+    instance can be shared by every Streamlit session in the process.
+
+    Args:
+        max_entries (int, optional): Maximum number of entries. None means unbounded.
+        max_bytes (int, optional): Maximum total estimated size of all values. None means unbounded.
+        ttl (float, optional): Seconds after insertion at which an entry expires. None means never.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, inserted_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, inserted_at):
+        return self.ttl is not None and time.monotonic() - inserted_at > self.ttl
+
+    def _discard(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        for key in [key for key, (_, _, inserted_at) in self._entries.items() if self._expired(inserted_at)]:
+            self._discard(key)
+            self.evictions += 1
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key`, or `default` if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[2]):
+                if entry is not None:
+                    self._discard(key)
+                    self.evictions += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Stores `value` under `key`, evicting expired and least recently used entries as needed.
+
+        A value larger than `max_bytes` on its own is not stored.
+        """
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            self._evict()
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, calling `compute()` and caching its result on a miss.
+
+        `compute` runs outside the lock, so concurrent misses on the same key may both compute.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Removes every entry; the hit/miss counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns a dict of hit/miss/eviction counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'Hits': self.hits,
+                'Misses': self.misses,
+                'Hit_Rate': self.hits / lookups if lookups else 0.0,
+                'Evictions': self.evictions,
+                'Entries': len(self._entries),
+                'Bytes': self._bytes
+            }
@@ -0,0 +1,127 @@
+"""Headless batch runner for stress scenario libraries.
+
+Usage:
+    python -m risk_engine.cli DATA_FILE SCENARIO_FILE --output-dir OUT [--workers N] [--series]
+
+DATA_FILE is anything `load_and_validate_data` accepts (CSV, Parquet, Feather/Arrow IPC).
+SCENARIO_FILE is either a JSON list of {"name", "stress_type", "parameters"} objects or a CSV
+with 'name', 'stress_type' and one column per stress parameter (blank cells are ignored).
+JSON scenarios with stress type 'Schedule' give their shock schedule as a
+`ShockSchedule.to_dict` description under parameters["schedule"].
+Metrics for every scenario are written to OUT/metrics.csv; with --series, each scenario's
+stressed and augmented series is also written to OUT/series/ as Parquet.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from risk_engine.data import STREAMING_CHUNKSIZE, STREAMING_THRESHOLD_BYTES, load_and_validate_data
+from risk_engine.schedules import ShockSchedule, schedule_from_dict
+from risk_engine.stress import batch_series_filename, run_scenario_batch
+
+SCENARIO_PARAMETERS = ['parameter_to_shock', 'shock_magnitude', 'scenario_severity_factor', 'systemic_crisis_scale']
+
+def load_scenarios(filepath):
+    """Reads a scenario library from a JSON or CSV file.
+
+    Args:
+        filepath (str): Path to the scenario file.
+
+    Returns:
+        list: (name, stress_type, parameters) tuples in file order. Unnamed scenarios are
+              called 'scenario_<n>'.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+        KeyError: If a scenario has no stress type.
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError("File not found at specified path.")
+
+    if filepath.lower().endswith('.json'):
+        with open(filepath) as f:
+            entries = json.load(f)
+        records = [(entry.get('name'), entry.get('stress_type'), dict(entry.get('parameters', {}))) for entry in entries]
+    else:
+        frame = pd.read_csv(filepath)
+        records = []
+        for row in frame.to_dict(orient='records'):
+            parameters = {name: row[name] for name in SCENARIO_PARAMETERS if name in row and pd.notna(row[name])}
+            records.append((row.get('name'), row.get('stress_type'), parameters))
+
+    scenarios = []
+    for index, (name, stress_type, parameters) in enumerate(records):
+        if not isinstance(stress_type, str):
+            raise KeyError(f"Scenario {index} has no 'stress_type'.")
+        if isinstance(parameters.get('schedule'), dict):
+            parameters['schedule'] = schedule_from_dict(parameters['schedule'])
+        name = name if isinstance(name, str) and name else f"scenario_{index}"
+        scenarios.append((name, stress_type, parameters))
+    return scenarios
+
+def _json_default(value):
+    """Serialises schedules as their `to_dict` description so the Parameters column can be reloaded."""
+    return value.to_dict() if isinstance(value, ShockSchedule) else str(value)
+
+def run_batch(data_path, scenarios_path, output_dir, max_workers=None, write_series=False):
+    """Runs a scenario library against a data file and writes the results to `output_dir`.
+
+    Args:
+        data_path (str): Path to the base data file.
+        scenarios_path (str): Path to the scenario file (see `load_scenarios`).
+        output_dir (str): Directory receiving 'metrics.csv' (and 'series/' with `write_series`).
+        max_workers (int, optional): Worker processes for `run_scenario_batch`. Defaults to the CPU count.
+        write_series (bool, optional): Also write each scenario's series as Parquet. Default is False.
+
+    Returns:
+        pd.DataFrame: One row of metrics per scenario, as written to 'metrics.csv'.
+
+    Raises:
+        FileNotFoundError: If an input file does not exist.
+        KeyError: If required columns or parameters are missing.
+        ValueError: If duplicate dates are found in the data.
+    """
+    chunksize = STREAMING_CHUNKSIZE if os.path.getsize(data_path) > STREAMING_THRESHOLD_BYTES else None
+    data = load_and_validate_data(data_path, chunksize=chunksize)
+    scenarios = load_scenarios(scenarios_path)
+
+    os.makedirs(output_dir, exist_ok=True)
+    series_dir = os.path.join(output_dir, 'series') if write_series else None
+    metrics = run_scenario_batch(data, [(stress_type, parameters) for _, stress_type, parameters in scenarios],
+                                 max_workers=max_workers, series_dir=series_dir)
+
+    results = pd.DataFrame(metrics)
+    results.insert(0, 'Scenario', [name for name, _, _ in scenarios])
+    results.insert(1, 'Stress_Type', [stress_type for _, stress_type, _ in scenarios])
+    results.insert(2, 'Parameters', [json.dumps(parameters, sort_keys=True, default=_json_default) for _, _, parameters in scenarios])
+    if write_series:
+        results['Series_File'] = [os.path.join('series', batch_series_filename(i)) for i in range(len(scenarios))]
+    results.to_csv(os.path.join(output_dir, 'metrics.csv'), index=False)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m risk_engine.cli',
+                                     description="Run a library of stress scenarios against a dataset without the UI.")
+    parser.add_argument('data', help="Base data file (CSV, Parquet or Feather/Arrow IPC).")
+    parser.add_argument('scenarios', help="Scenario library (JSON or CSV).")
+    parser.add_argument('--output-dir', '-o', required=True, help="Directory for metrics.csv and series files.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('--series', action='store_true', help="Also write each scenario's stressed series as Parquet.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        results = run_batch(args.data, args.scenarios, args.output_dir, args.workers, args.series)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Ran {len(results)} scenarios in {time.perf_counter() - start:.2f}s; "
+          f"metrics written to {os.path.join(args.output_dir, 'metrics.csv')}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""Data ingestion: synthetic generation, file loading, validation and dataset caching."""
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather
+
+from risk_engine.caching import LRUCache
+from risk_engine.profiling import profile_stage
+
+REQUIRED_COLUMNS = ['Date', 'Base_Revenue', 'Base_Costs']
+STREAMING_THRESHOLD_BYTES = 50 * 1024 * 1024
+STREAMING_CHUNKSIZE = 250_000
+ARROW_CACHE_DIR = os.environ.get('QULAB_ARROW_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'qulab_arrow_cache'))
+SYNTHETIC_SEED = 42
+CONTENT_HASH_CACHE_ENTRIES = 256
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+
+def _file_format(filepath):
+    """Returns 'parquet', 'feather' or 'csv' from a path's or uploaded file's extension."""
+    name = str(getattr(filepath, 'name', filepath)).lower()
+    if name.endswith(PARQUET_EXTENSIONS):
+        return 'parquet'
+    if name.endswith(FEATHER_EXTENSIONS):
+        return 'feather'
+    return 'csv'
+
+def _hash_file(filepath, block_size):
+    """Returns the SHA-256 hex digest of a file's bytes, leaving buffers at their original position."""
+    digest = hashlib.sha256()
+    try:
+        if hasattr(filepath, 'seek'):
+            position = filepath.tell()
+            for block in iter(lambda: filepath.read(block_size), b''):
+                digest.update(block)
+            filepath.seek(position)
+        else:
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(block_size), b''):
+                    digest.update(block)
+    except FileNotFoundError:
+        raise FileNotFoundError("File not found at specified path.")
+    return digest.hexdigest()
+
+_content_hash_cache = LRUCache(max_entries=CONTENT_HASH_CACHE_ENTRIES)
+
+def _content_hash(filepath, block_size=8 * 1024 * 1024):
+    """Returns the SHA-256 hex digest of a file's bytes, hashing each upload or file version once.
+
+    Streamlit uploads are identified by their `file_id` and size, paths by their size and
+    modification time, so reruns reuse the digest instead of rescanning the file. Other
+    buffers are hashed on every call.
+    """
+    if hasattr(filepath, 'file_id'):
+        key = ('upload', filepath.file_id, getattr(filepath, 'size', None))
+    elif not hasattr(filepath, 'seek'):
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            raise FileNotFoundError("File not found at specified path.")
+        key = ('path', os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    else:
+        return _hash_file(filepath, block_size)
+    return _content_hash_cache.get_or_compute(key, lambda: _hash_file(filepath, block_size))
+
+def _arrow_cache_name(content_hash, float_dtype='float64', chunksize=None):
+    """Returns the Arrow cache file name of a CSV loaded with these settings.
+
+    Only streamed loads cast the `Base*` columns to `float_dtype`, so the name records the
+    dtype the load actually produces.
+    """
+    return f"{content_hash}-{float_dtype if chunksize else 'float64'}.arrow"
+
+def _read_arrow_cache(cache_path):
+    """Memory-maps a cached Arrow IPC file; numeric columns are read without copying."""
+    with pa.memory_map(cache_path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+def _write_arrow_cache(df, cache_path):
+    """Writes a validated frame as an uncompressed Arrow IPC file so it can be memory-mapped."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+
+def _load_csv_in_chunks(filepath, chunksize, float_dtype='float64'):
+    """Streams a CSV into compact columnar arrays, validating it chunk by chunk.
+
+    The header is checked for the required columns before any rows are parsed, `Base*`
+    columns are read with an explicit float dtype, and dates are parsed per chunk. Duplicate
+    dates are detected across chunks by one sorted pass over the int64 date keys.
+
+    Args:
+        filepath (str or file-like): Path to, or buffer of, the CSV file.
+        chunksize (int): Number of rows parsed per chunk.
+        float_dtype (str, optional): dtype for the `Base*` columns. Default is 'float64'.
+
+    Returns:
+        pd.DataFrame: Loaded and validated financial data.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+        KeyError: If required columns are missing.
+        ValueError: If duplicate dates are found.
+    """
+    try:
+        position = filepath.tell() if hasattr(filepath, 'seek') else None
+        header = pd.read_csv(filepath, nrows=0).columns
+        if position is not None:
+            filepath.seek(position)
+    except FileNotFoundError:
+        raise FileNotFoundError("File not found at specified path.")
+
+    for col in REQUIRED_COLUMNS:
+        if col not in header:
+            raise KeyError(f"Required column '{col}' is missing.")
+
+    dtypes = {col: float_dtype for col in header if 'Base' in col}
+    columns = {col: [] for col in header}
+    for chunk in pd.read_csv(filepath, chunksize=chunksize, dtype=dtypes):
+        chunk['Date'] = pd.to_datetime(chunk['Date'])
+        for col in header:
+            columns[col].append(chunk[col].to_numpy())
+
+    columns = {col: np.concatenate(parts) if parts else np.array([]) for col, parts in columns.items()}
+    date_keys = columns['Date'].astype('datetime64[ns]').view('int64')
+    if 'Entity' in columns:
+        # Panels: (Entity, Date) must be unique, compared through a 64-bit hash of the pair
+        date_keys = pd.util.hash_pandas_object(
+            pd.DataFrame({'Entity': columns['Entity'], 'Date': date_keys}), index=False
+        ).to_numpy()
+    sorted_keys = np.sort(date_keys)
+    if (sorted_keys[1:] == sorted_keys[:-1]).any():
+        raise ValueError("Duplicate dates found in the data.")
+
+    df = pd.DataFrame(columns, copy=False)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def _generate_synthetic_chunk(seed_sequence, n_rows, dtype):
+    """Draws one chunk of synthetic revenues and costs from its own generator."""
+    rng = np.random.default_rng(seed_sequence)
+    revenues = np.maximum(100 + rng.normal(10, 5, n_rows), 50)
+    costs = revenues * rng.uniform(0.5, 0.7, n_rows)
+    return revenues.round(2).astype(dtype, copy=False), costs.round(2).astype(dtype, copy=False)
+
+def generate_synthetic_data(num_periods, num_entities=None, freq='D', start_date='2024-01-01',
+                            seed=SYNTHETIC_SEED, dtype='float64', chunk_rows=1_000_000, max_workers=None):
+    """Generates a large synthetic dataset directly as typed NumPy arrays.
+
+    Revenues and costs follow the same distributions as the synthetic data in
+    `load_and_validate_data`, but are drawn from local `np.random.Generator`s, one per
+    chunk of `chunk_rows` rows, seeded from a single `SeedSequence`. Chunks can
+    therefore be filled in parallel threads while the output depends only on `seed`
+    and `chunk_rows`, never on the number of workers.
+
+    Args:
+        num_periods (int): Number of dates per entity.
+        num_entities (int, optional): If given, build a panel with an 'Entity' column and
+                                      `num_periods` rows per entity. Default is a single series.
+        freq (str, optional): Date frequency, e.g. 'D' or 'h' for intraday data. Default is 'D'.
+        start_date (str, optional): First date. Default is '2024-01-01'.
+        seed (int, optional): Seed of the generator. Default is 42.
+        dtype (str, optional): 'float64' or 'float32' for the revenue and cost columns. Default is 'float64'.
+        chunk_rows (int, optional): Rows drawn per generator. Default is 1,000,000.
+        max_workers (int, optional): Threads used to fill chunks. Defaults to the CPU count.
+
+    Returns:
+        pd.DataFrame: Columns 'Date', 'Base_Revenue', 'Base_Costs' (and 'Entity' first for panels),
+                      sorted by entity and then date.
+    """
+    n_entities = 1 if num_entities is None else num_entities
+    n_rows = num_periods * n_entities
+    dates = pd.date_range(start=start_date, periods=num_periods, freq=freq).to_numpy()
+
+    chunk_sizes = [min(chunk_rows, n_rows - start) for start in range(0, n_rows, chunk_rows)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunks = list(executor.map(_generate_synthetic_chunk, seed_sequences, chunk_sizes,
+                                   [dtype] * len(chunk_sizes)))
+
+    columns = {}
+    if num_entities is not None:
+        entity_names = [f'Entity_{i + 1:0{len(str(n_entities))}d}' for i in range(n_entities)]
+        columns['Entity'] = pd.Categorical.from_codes(np.repeat(np.arange(n_entities), num_periods), entity_names)
+    columns['Date'] = np.tile(dates, n_entities)
+    columns['Base_Revenue'] = np.concatenate([revenues for revenues, _ in chunks]) if chunks else np.array([], dtype=dtype)
+    columns['Base_Costs'] = np.concatenate([costs for _, costs in chunks]) if chunks else np.array([], dtype=dtype)
+    return pd.DataFrame(columns, copy=False)
+
+def load_and_validate_data(filepath=None, num_days=5, chunksize=None, float_dtype='float64', cache_dir=None,
+                           num_entities=None, profiler=None):
+    """Loads and validates financial data.
+
+    Args:
+        filepath (str, optional): Path to the CSV, Parquet or Feather/Arrow IPC file.
+                                  If None, a synthetic dataset is used.
+        num_days (int, optional): Number of days for synthetic dataset. Default is 5.
+        chunksize (int, optional): If given, stream the CSV in chunks of this many rows to
+                                   bound peak memory on very large files.
+        float_dtype (str, optional): dtype of the `Base*` columns when streaming. Default is 'float64'.
+        cache_dir (str, optional): If given, validated CSVs are stored here as Arrow files keyed
+                                   by content hash and float dtype and memory-mapped on later loads.
+        num_entities (int, optional): If given, the synthetic dataset is a panel of this many entities
+                                      built with `generate_synthetic_data`.
+        profiler (StageProfiler, optional): Records the 'load', 'validate' and 'cache_write' stages.
+
+    Returns:
+        pd.DataFrame: Loaded and validated financial data. Files with an 'Entity' column are
+                      panels, where dates must be unique within each entity.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+        KeyError: If required columns are missing.
+        ValueError: If duplicate dates are found.
+    """
+    cache_path = None
+    with profile_stage(profiler, 'load'):
+        if filepath is None and num_entities is not None:
+            df = generate_synthetic_data(num_days, num_entities)
+        elif filepath is None:
+            # Generate synthetic dataset with specified number of days
+        
+            # Generate dates starting from 2024-01-01
+            start_date = pd.Timestamp('2024-01-01')
+            dates = pd.date_range(start=start_date, periods=num_days, freq='D')
+        
+            # Generate revenue data with some realistic variation (base around 100-120)
+            rng = np.random.RandomState(SYNTHETIC_SEED)  # Local generator: reproducible without reseeding np.random
+            base_revenue = 100
+            revenue_variation = rng.normal(10, 5, num_days)  # Mean=10, std=5
+            revenues = base_revenue + revenue_variation
+            revenues = np.maximum(revenues, 50)  # Ensure minimum revenue of 50
+        
+            # Generate cost data (typically 50-70% of revenue)
+            cost_ratio = rng.uniform(0.5, 0.7, num_days)
+            costs = revenues * cost_ratio
+        
+            df = pd.DataFrame({
+                'Date': dates,
+                'Base_Revenue': revenues.round(2),
+                'Base_Costs': costs.round(2)
+            })
+        else:
+            file_format = _file_format(filepath)
+            if cache_dir is not None and file_format == 'csv':
+                cache_path = os.path.join(cache_dir, _arrow_cache_name(_content_hash(filepath), float_dtype, chunksize))
+                if os.path.exists(cache_path):
+                    return _read_arrow_cache(cache_path)
+            try:
+                if file_format == 'parquet':
+                    df = pd.read_parquet(filepath)
+                elif file_format == 'feather':
+                    df = pyarrow.feather.read_table(filepath, memory_map=isinstance(filepath, str)).to_pandas(split_blocks=True)
+                elif chunksize:
+                    df = None
+                else:
+                    df = pd.read_csv(filepath)
+            except FileNotFoundError:
+                raise FileNotFoundError("File not found at specified path.")
+
+    if df is None:
+        # Streamed CSVs are validated chunk by chunk while loading
+        with profile_stage(profiler, 'load'):
+            df = _load_csv_in_chunks(filepath, chunksize, float_dtype)
+    else:
+        with profile_stage(profiler, 'validate', rows=len(df)):
+            for col in REQUIRED_COLUMNS:
+                if col not in df.columns:
+                    raise KeyError(f"Required column '{col}' is missing.")
+
+            df['Date'] = pd.to_datetime(df['Date']) # Ensure Date column is datetime
+
+            # Panel data may repeat dates across entities, but not within one. Checked on the parsed
+            # dates, as in streamed loads, so '2024-01-01' and '2024-1-1' are duplicates
+            if df.duplicated(['Entity', 'Date'] if 'Entity' in df.columns else 'Date').any():
+                raise ValueError("Duplicate dates found in the data.")
+
+    if cache_path is not None:
+        with profile_stage(profiler, 'cache_write'):
+            _write_arrow_cache(df, cache_path)
+    return df
+
+def dataset_cache_key(filepath=None, num_days=5, float_dtype='float64', num_entities=None, chunksize=None):
+    """Returns the key identifying the dataset `load_and_validate_data` would produce.
+
+    Files are identified by format, content hash and the dtype of their `Base*` columns,
+    synthetic data by its size and the generator seed. Only streamed CSVs are cast to
+    `float_dtype`, so any other load is keyed as float64 whatever `float_dtype` says.
+    """
+    if filepath is None:
+        return ('synthetic', num_days, num_entities, SYNTHETIC_SEED)
+    file_format = _file_format(filepath)
+    return (file_format, _content_hash(filepath), float_dtype if chunksize and file_format == 'csv' else 'float64')
+
+def dataset_fingerprint(data):
+    """Returns a hex digest identifying a dataset's contents.
+
+    Frames returned by `load_shared_dataset` carry the digest of their store key in
+    `attrs['fingerprint']`; any other frame is hashed row by row.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    fingerprint = data.attrs.get('fingerprint')
+    if fingerprint is None:
+        digest = hashlib.sha256(repr(list(data.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        fingerprint = digest.hexdigest()
+    return fingerprint
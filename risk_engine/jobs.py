@@ -0,0 +1,183 @@
+"""Background execution of long stress runs with progress reporting and cancellation."""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.environ.get('QULAB_JOB_WORKERS', 2))
+JOB_RETENTION_SECONDS = float(os.environ.get('QULAB_JOB_RETENTION_SECONDS', 3600))
+JOB_STATUSES = ['queued', 'running', 'done', 'failed', 'cancelled']
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once cancellation has been requested."""
+
+class Job:
+    """Handle of one submitted run.
+
+    The handle is shared between the worker thread, which updates it, and any number of
+    reruns, which read it. Cancellation is cooperative: the running function sees it the
+    next time it reports progress.
+
+    Args:
+        label (str, optional): Human readable description shown while the job runs.
+        owner (str, optional): Id of the session that submitted the job.
+    """
+
+    def __init__(self, label=None, owner=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.owner = owner
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_requested = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        """True once the job has finished, failed or been cancelled."""
+        return self.status in ('done', 'failed', 'cancelled')
+
+    @property
+    def cancel_requested(self):
+        """True once `cancel` has been called."""
+        return self._cancel_requested.is_set()
+
+    def cancel(self):
+        """Requests cancellation. A queued job never starts; a running one stops at its next report."""
+        with self._lock:
+            self._cancel_requested.set()
+            if self.status == 'queued':
+                self.status, self.finished_at = 'cancelled', time.time()
+
+    def report(self, fraction, message=None):
+        """Progress callback handed to the job function.
+
+        Args:
+            fraction (float): Share of the work completed, clipped to [0, 1].
+            message (str, optional): Short description of the current step.
+
+        Raises:
+            JobCancelled: If cancellation was requested.
+        """
+        if self._cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def elapsed(self):
+        """Returns the seconds spent running so far (or in total once finished)."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def _run(self, fn, args, kwargs):
+        with self._lock:
+            if self._cancel_requested.is_set():
+                return
+            self.status, self.started_at = 'running', time.time()
+        try:
+            self.result = fn(*args, progress=self.report, **kwargs)
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            self.error = e
+            status = 'failed'
+        else:
+            self.progress = 1.0
+            status = 'done'
+        # finished_at is set first so a job seen as done always has it
+        self.finished_at = time.time()
+        self.status = status
+
+class JobRunner:
+    """Runs submitted functions on a shared thread pool and keeps their handles for later reruns.
+
+    Threads rather than processes are used so jobs can read frames from the in-process
+    dataset store without copying them; the NumPy kernels release the GIL, so the script
+    thread stays responsive. Finished jobs are kept for `retention_seconds` so a later
+    rerun can still pick up their result.
+
+    Args:
+        max_workers (int, optional): Concurrent jobs. Defaults to env `QULAB_JOB_WORKERS` (2).
+        retention_seconds (float, optional): How long finished jobs are kept. Defaults to env
+                                             `QULAB_JOB_RETENTION_SECONDS` (3600).
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, retention_seconds=JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='qulab-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, label=None, owner=None, **kwargs):
+        """Queues `fn(*args, progress=job.report, **kwargs)` and returns its handle.
+
+        Args:
+            fn (callable): Function to run. It must accept a `progress(fraction, message=None)`
+                           keyword and let `JobCancelled` propagate.
+            label (str, optional): Description shown while the job runs.
+            owner (str, optional): Id of the submitting session.
+
+        Returns:
+            Job: Handle whose `result` holds the return value once `status` is 'done'.
+        """
+        job = Job(label=label, owner=owner)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(job._run, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """Returns the job with `job_id`, or None if it is unknown or was pruned."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, owner):
+        """Returns the jobs submitted by `owner`, oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.owner == owner]
+
+    def cancel(self, job_id):
+        """Requests cancellation of `job_id`. Returns False if the job is unknown."""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def stats(self):
+        """Returns the number of kept jobs per status."""
+        with self._lock:
+            counts = {status: 0 for status in JOB_STATUSES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def shutdown(self, cancel=True):
+        """Stops the pool, cancelling outstanding jobs unless `cancel` is False."""
+        if cancel:
+            with self._lock:
+                for job in self._jobs.values():
+                    job.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+_job_runner = JobRunner()
+
+def get_job_runner():
+    """Returns the process-wide job runner shared by every session."""
+    return _job_runner
@@ -0,0 +1,400 @@
+"""Risk capacity metrics: single series, multi-entity panels, batched paths and incremental updates."""
+import pandas as pd
+import numpy as np
+
+INITIAL_CAPITAL_VALUE = 1000
+INITIAL_LIQUIDITY_VALUE = 500
+RISK_CAPACITY_COLUMNS = ['Net_Earnings_Under_Stress', 'Capital_Impact', 'Capital_Remaining',
+                         'Liquidity_Impact', 'Liquidity_Position']
+
+def calculate_risk_capacity_metrics(projected_data):
+    """
+    Computes key metrics to assess the firm's risk capacity under stress.
+
+    Args:
+        projected_data (pd.DataFrame): DataFrame with projected financial data,
+                                       including 'Adjusted_Revenue', 'Adjusted_Costs'.
+
+    Returns:
+        dict: Dictionary of calculated risk capacity metrics.
+
+    Raises:
+        Exception: If the input DataFrame is empty.
+    """
+    if projected_data.empty:
+        raise Exception("Input DataFrame cannot be empty.")
+
+    if 'Adjusted_Revenue' not in projected_data.columns or 'Adjusted_Costs' not in projected_data.columns:
+        # Check if 'Base_Revenue' and 'Base_Costs' exist for initial adjustment if not already done
+        if 'Base_Revenue' in projected_data.columns and 'Base_Costs' in projected_data.columns:
+            # If Adjusted_Revenue/Costs are not created (e.g., if page2 was skipped),
+            # assume no stress applied and use base values
+            if 'Adjusted_Revenue' not in projected_data.columns:
+                projected_data['Adjusted_Revenue'] = projected_data['Base_Revenue']
+            if 'Adjusted_Costs' not in projected_data.columns:
+                projected_data['Adjusted_Costs'] = projected_data['Base_Costs']
+        else:
+            raise KeyError("Missing 'Adjusted_Revenue'/'Adjusted_Costs' and 'Base_Revenue'/'Base_Costs' for metric derivation. Please ensure you load data on Page 1 and apply stress test on Page 2.")
+
+    if 'Entity' in projected_data.columns:
+        # Panel data: per-entity paths with firm-level metrics rolled up from them
+        metrics, _, augmented_data, _ = calculate_portfolio_risk_metrics(projected_data)
+        return metrics, augmented_data
+
+    projected_data['Net_Earnings_Under_Stress'] = projected_data['Adjusted_Revenue'] - projected_data['Adjusted_Costs']
+
+    initial_capital_value = INITIAL_CAPITAL_VALUE
+    initial_liquidity_value = INITIAL_LIQUIDITY_VALUE
+
+    # These impacts are illustrative as per the prompt's reference
+    if 'Base_Revenue' in projected_data.columns and 'Base_Costs' in projected_data.columns:
+        projected_data['Capital_Impact'] = (projected_data['Base_Revenue'] - projected_data['Adjusted_Revenue']) + \
+                                          (projected_data['Adjusted_Costs'] - projected_data['Base_Costs'])
+        projected_data['Capital_Remaining'] = initial_capital_value - projected_data['Capital_Impact'].cumsum()
+        projected_data['Liquidity_Impact'] = (projected_data['Base_Revenue'] - projected_data['Adjusted_Revenue']) * 0.5
+        projected_data['Liquidity_Position'] = initial_liquidity_value - projected_data['Liquidity_Impact'].cumsum()
+    else:
+        # Fallback if base columns are missing (though page1 should ensure them)
+        projected_data['Capital_Impact'] = 0 # Or some default impact
+        projected_data['Capital_Remaining'] = initial_capital_value - projected_data['Net_Earnings_Under_Stress'].cumsum() # Simplified fallback
+        projected_data['Liquidity_Impact'] = 0 # Or some default
+        projected_data['Liquidity_Position'] = initial_liquidity_value - projected_data['Net_Earnings_Under_Stress'].cumsum() * 0.5 # Simplified fallback
+
+    capital_remaining = projected_data['Capital_Remaining']
+    liquidity_position = projected_data['Liquidity_Position']
+
+    initial_capital = initial_capital_value # Use the defined initial value
+    min_capital = capital_remaining.min()
+    capital_drawdown = initial_capital - min_capital
+    capital_drawdown_percentage = (capital_drawdown / initial_capital) * 100 if initial_capital != 0 else 0
+
+    min_liquidity = liquidity_position.min()
+    liquidity_shortfall = abs(min_liquidity) if min_liquidity < 0 else 0
+
+    metrics = {
+        'Initial_Capital': initial_capital,
+        'Minimum_Capital_Remaining': min_capital,
+        'Capital_Drawdown': capital_drawdown,
+        'Capital_Drawdown_Percentage': capital_drawdown_percentage,
+        'Minimum_Liquidity_Position': min_liquidity,
+        'Liquidity_Shortfall': liquidity_shortfall
+    }
+    return metrics, projected_data # Also return the augmented data for plotting
+
+def calculate_portfolio_risk_metrics(projected_data, initial_capital_value=INITIAL_CAPITAL_VALUE,
+                                     initial_liquidity_value=INITIAL_LIQUIDITY_VALUE):
+    """Computes risk capacity metrics for every entity of a panel and for the firm as a whole.
+
+    Each entity starts with its own capital and liquidity buffers. Capital and liquidity
+    paths are computed for all entities in one grouped pass (a groupby-cumsum over the
+    impacts), and the firm-level path rolls up the summed impacts per date against the
+    summed buffers.
+
+    Args:
+        projected_data (pd.DataFrame): Panel with 'Entity', 'Date', 'Base_Revenue', 'Base_Costs'
+                                       and, if stressed, 'Adjusted_Revenue'/'Adjusted_Costs'. Not modified.
+        initial_capital_value (float, optional): Starting capital per entity. Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity per entity. Default is 500.
+
+    Returns:
+        tuple: (firm-level metrics dict, DataFrame of metrics per entity, augmented panel sorted by
+               entity and date, firm-level DataFrame with one row per date).
+
+    Raises:
+        Exception: If the input DataFrame is empty.
+        KeyError: If 'Entity', 'Date', 'Base_Revenue' or 'Base_Costs' is missing.
+    """
+    if projected_data.empty:
+        raise Exception("Input DataFrame cannot be empty.")
+    for col in ['Entity', 'Date', 'Base_Revenue', 'Base_Costs']:
+        if col not in projected_data.columns:
+            raise KeyError(f"Required column '{col}' is missing.")
+
+    data = projected_data.sort_values(['Entity', 'Date'], kind='stable')
+    if 'Adjusted_Revenue' not in data.columns:
+        data['Adjusted_Revenue'] = data['Base_Revenue']
+    if 'Adjusted_Costs' not in data.columns:
+        data['Adjusted_Costs'] = data['Base_Costs']
+
+    data['Net_Earnings_Under_Stress'] = data['Adjusted_Revenue'] - data['Adjusted_Costs']
+    data['Capital_Impact'] = (data['Base_Revenue'] - data['Adjusted_Revenue']) + \
+                             (data['Adjusted_Costs'] - data['Base_Costs'])
+    data['Liquidity_Impact'] = (data['Base_Revenue'] - data['Adjusted_Revenue']) * 0.5
+    cumulative = data.groupby('Entity', sort=False, observed=True)[['Capital_Impact', 'Liquidity_Impact']].cumsum()
+    data['Capital_Remaining'] = initial_capital_value - cumulative['Capital_Impact']
+    data['Liquidity_Position'] = initial_liquidity_value - cumulative['Liquidity_Impact']
+
+    minima = data.groupby('Entity', observed=True)[['Capital_Remaining', 'Liquidity_Position']].min()
+    entity_metrics = pd.DataFrame({
+        'Initial_Capital': initial_capital_value,
+        'Minimum_Capital_Remaining': minima['Capital_Remaining'],
+        'Capital_Drawdown': initial_capital_value - minima['Capital_Remaining']
+    })
+    entity_metrics['Capital_Drawdown_Percentage'] = (
+        entity_metrics['Capital_Drawdown'] / initial_capital_value * 100 if initial_capital_value != 0 else 0
+    )
+    entity_metrics['Minimum_Liquidity_Position'] = minima['Liquidity_Position']
+    entity_metrics['Liquidity_Shortfall'] = (-minima['Liquidity_Position']).clip(lower=0)
+
+    # Firm level: summed impacts per date against the summed buffers of all entities
+    n_entities = len(entity_metrics)
+    summed_columns = [col for col in data.select_dtypes(include=['number']).columns
+                      if col not in ('Capital_Remaining', 'Liquidity_Position')]
+    firm_data = data.groupby('Date', sort=True)[summed_columns].sum().reset_index()
+    firm_capital = initial_capital_value * n_entities
+    firm_liquidity = initial_liquidity_value * n_entities
+    firm_data['Capital_Remaining'] = firm_capital - firm_data['Capital_Impact'].cumsum()
+    firm_data['Liquidity_Position'] = firm_liquidity - firm_data['Liquidity_Impact'].cumsum()
+
+    min_capital = firm_data['Capital_Remaining'].min()
+    capital_drawdown = firm_capital - min_capital
+    min_liquidity = firm_data['Liquidity_Position'].min()
+    firm_metrics = {
+        'Initial_Capital': firm_capital,
+        'Minimum_Capital_Remaining': min_capital,
+        'Capital_Drawdown': capital_drawdown,
+        'Capital_Drawdown_Percentage': (capital_drawdown / firm_capital) * 100 if firm_capital != 0 else 0,
+        'Minimum_Liquidity_Position': min_liquidity,
+        'Liquidity_Shortfall': abs(min_liquidity) if min_liquidity < 0 else 0
+    }
+    return firm_metrics, entity_metrics, data, firm_data
+
+def risk_capacity_columns(base_data, adjustments, columns=None, initial_capital_value=INITIAL_CAPITAL_VALUE,
+                          initial_liquidity_value=INITIAL_LIQUIDITY_VALUE):
+    """Computes metric columns on request from base data and the lean output of `simulate_stress_impact`.
+
+    Only the requested columns, and the impacts they depend on, are computed, so callers
+    can keep just the base data and the `Adjusted_*` columns in memory and derive the
+    rest when a chart or table needs it. Values equal those `calculate_risk_capacity_metrics`
+    adds to its input; panels accumulate per entity in row order.
+
+    Args:
+        base_data (pd.DataFrame): The base financial data with 'Base_Revenue' and 'Base_Costs'.
+        adjustments (pd.DataFrame): 'Adjusted_Revenue'/'Adjusted_Costs' sharing `base_data`'s index.
+                                    A missing column means that component was not stressed.
+        columns (list, optional): Names from `RISK_CAPACITY_COLUMNS`. Default is all of them.
+        initial_capital_value (float, optional): Starting capital. Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity. Default is 500.
+
+    Returns:
+        pd.DataFrame: The requested columns, indexed like `base_data`.
+
+    Raises:
+        KeyError: If a column name is unknown or 'Base_Revenue'/'Base_Costs' is missing.
+    """
+    columns = RISK_CAPACITY_COLUMNS if columns is None else list(columns)
+    unknown = [col for col in columns if col not in RISK_CAPACITY_COLUMNS]
+    if unknown:
+        raise KeyError(f"Unknown risk capacity columns: {unknown}")
+    for col in ['Base_Revenue', 'Base_Costs']:
+        if col not in base_data.columns:
+            raise KeyError(f"Required column '{col}' is missing.")
+
+    base_revenue, base_costs = base_data['Base_Revenue'], base_data['Base_Costs']
+    adjusted_revenue = adjustments['Adjusted_Revenue'] if 'Adjusted_Revenue' in adjustments.columns else base_revenue
+    adjusted_costs = adjustments['Adjusted_Costs'] if 'Adjusted_Costs' in adjustments.columns else base_costs
+
+    def cumulative(impact):
+        if 'Entity' in base_data.columns:
+            return impact.groupby(base_data['Entity'], sort=False, observed=True).cumsum()
+        return impact.cumsum()
+
+    computed = {}
+    if 'Net_Earnings_Under_Stress' in columns:
+        computed['Net_Earnings_Under_Stress'] = adjusted_revenue - adjusted_costs
+    if 'Capital_Impact' in columns or 'Capital_Remaining' in columns:
+        capital_impact = (base_revenue - adjusted_revenue) + (adjusted_costs - base_costs)
+        computed['Capital_Impact'] = capital_impact
+        if 'Capital_Remaining' in columns:
+            computed['Capital_Remaining'] = initial_capital_value - cumulative(capital_impact)
+    if 'Liquidity_Impact' in columns or 'Liquidity_Position' in columns:
+        liquidity_impact = (base_revenue - adjusted_revenue) * 0.5
+        computed['Liquidity_Impact'] = liquidity_impact
+        if 'Liquidity_Position' in columns:
+            computed['Liquidity_Position'] = initial_liquidity_value - cumulative(liquidity_impact)
+    return pd.DataFrame({col: computed[col] for col in columns}, index=base_data.index, copy=False)
+
+def calculate_risk_capacity_metrics_lean(base_data, adjustments, initial_capital_value=INITIAL_CAPITAL_VALUE,
+                                         initial_liquidity_value=INITIAL_LIQUIDITY_VALUE):
+    """Computes risk capacity metrics from base data and lean stress output without storing metric columns.
+
+    Only the capital and liquidity paths are built, transiently, to take their minima.
+    Panels are rolled up to the firm level as in `calculate_portfolio_risk_metrics`.
+
+    Args:
+        base_data (pd.DataFrame): The base financial data with 'Base_Revenue' and 'Base_Costs'.
+        adjustments (pd.DataFrame): Output of `simulate_stress_impact(..., lean=True)`.
+        initial_capital_value (float, optional): Starting capital (per entity for panels). Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity (per entity for panels). Default is 500.
+
+    Returns:
+        dict: Dictionary of calculated risk capacity metrics.
+
+    Raises:
+        Exception: If the input DataFrame is empty.
+        KeyError: If 'Base_Revenue' or 'Base_Costs' is missing.
+    """
+    if base_data.empty:
+        raise Exception("Input DataFrame cannot be empty.")
+    if 'Entity' in base_data.columns:
+        # Under copy-on-write the joined frame shares its columns with both inputs
+        firm_metrics, _, _, _ = calculate_portfolio_risk_metrics(
+            base_data.assign(**dict(adjustments.items())), initial_capital_value, initial_liquidity_value
+        )
+        return firm_metrics
+
+    paths = risk_capacity_columns(base_data, adjustments, ['Capital_Remaining', 'Liquidity_Position'],
+                                  initial_capital_value, initial_liquidity_value)
+    min_capital = paths['Capital_Remaining'].min()
+    capital_drawdown = initial_capital_value - min_capital
+    min_liquidity = paths['Liquidity_Position'].min()
+    return {
+        'Initial_Capital': initial_capital_value,
+        'Minimum_Capital_Remaining': min_capital,
+        'Capital_Drawdown': capital_drawdown,
+        'Capital_Drawdown_Percentage': (capital_drawdown / initial_capital_value) * 100 if initial_capital_value != 0 else 0,
+        'Minimum_Liquidity_Position': min_liquidity,
+        'Liquidity_Shortfall': abs(min_liquidity) if min_liquidity < 0 else 0
+    }
+
+def calculate_risk_capacity_metrics_batch(base_revenue, base_costs, adjusted_revenue, adjusted_costs,
+                                          initial_capital_value=INITIAL_CAPITAL_VALUE,
+                                          initial_liquidity_value=INITIAL_LIQUIDITY_VALUE):
+    """Computes risk capacity metrics for many paths at once.
+
+    Applies the same capital and liquidity logic as `calculate_risk_capacity_metrics`
+    to arrays whose last axis is time, so thousands of simulated paths are evaluated
+    without building a DataFrame per path.
+
+    Args:
+        base_revenue (np.ndarray): Base revenue, shape (..., n_days).
+        base_costs (np.ndarray): Base costs, broadcastable to `base_revenue`.
+        adjusted_revenue (np.ndarray): Stressed revenue, broadcastable to `base_revenue`.
+        adjusted_costs (np.ndarray): Stressed costs, broadcastable to `base_revenue`.
+        initial_capital_value (float, optional): Starting capital. Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity. Default is 500.
+
+    Returns:
+        dict: Metric name to np.ndarray of shape (...), keyed like `calculate_risk_capacity_metrics`.
+    """
+    revenue_loss = np.asarray(base_revenue) - np.asarray(adjusted_revenue)
+    capital_impact = revenue_loss + (np.asarray(adjusted_costs) - np.asarray(base_costs))
+    min_capital = initial_capital_value - np.cumsum(capital_impact, axis=-1).max(axis=-1)
+    min_liquidity = initial_liquidity_value - np.cumsum(revenue_loss * 0.5, axis=-1).max(axis=-1)
+
+    capital_drawdown = initial_capital_value - min_capital
+    if initial_capital_value != 0:
+        capital_drawdown_percentage = capital_drawdown / initial_capital_value * 100
+    else:
+        capital_drawdown_percentage = np.zeros_like(capital_drawdown)
+
+    return {
+        'Initial_Capital': np.full_like(min_capital, initial_capital_value),
+        'Minimum_Capital_Remaining': min_capital,
+        'Capital_Drawdown': capital_drawdown,
+        'Capital_Drawdown_Percentage': capital_drawdown_percentage,
+        'Minimum_Liquidity_Position': min_liquidity,
+        'Liquidity_Shortfall': np.maximum(-min_liquidity, 0)
+    }
+
+def init_risk_capacity_state(initial_capital_value=INITIAL_CAPITAL_VALUE,
+                             initial_liquidity_value=INITIAL_LIQUIDITY_VALUE):
+    """Creates the running state consumed by `update_risk_capacity_metrics`.
+
+    The state is a plain dict of Python numbers, so it can be stored (e.g. as JSON)
+    and later resumed without any loss of precision.
+
+    Args:
+        initial_capital_value (float, optional): Starting capital. Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity. Default is 500.
+
+    Returns:
+        dict: Running state for an empty history.
+    """
+    return {
+        'Rows': 0,
+        'Initial_Capital': initial_capital_value,
+        'Initial_Liquidity': initial_liquidity_value,
+        'Cumulative_Capital_Impact': 0.0,
+        'Cumulative_Liquidity_Impact': 0.0,
+        'Minimum_Capital_Remaining': float('inf'),
+        'Minimum_Liquidity_Position': float('inf')
+    }
+
+def update_risk_capacity_metrics(state, appended_data):
+    """Updates risk capacity metrics for rows appended to an already processed history.
+
+    Only the appended rows are touched, so each update costs O(k) for k new rows. The
+    running sums continue the same left-to-right accumulation as the full `cumsum`, so
+    results are bit-identical to `calculate_risk_capacity_metrics` on the whole history.
+
+    Args:
+        state (dict): State from `init_risk_capacity_state` or a previous update. Not modified.
+        appended_data (pd.DataFrame): New rows with 'Base_Revenue' and 'Base_Costs', plus
+                                      'Adjusted_Revenue'/'Adjusted_Costs' if stressed.
+
+    Returns:
+        tuple: (metrics dict, DataFrame of the appended rows with metric columns, new state dict).
+
+    Raises:
+        Exception: If no rows have been processed yet.
+        KeyError: If 'Base_Revenue' or 'Base_Costs' is missing.
+        ValueError: If `appended_data` is a panel; the state tracks a single series.
+    """
+    for col in ['Base_Revenue', 'Base_Costs']:
+        if col not in appended_data.columns:
+            raise KeyError(f"Required column '{col}' is missing.")
+    if 'Entity' in appended_data.columns:
+        # One running buffer cannot stand in for per-entity buffers rolled up to the firm
+        raise ValueError("Incremental updates support a single series only; "
+                         "use calculate_portfolio_risk_metrics for panels with an 'Entity' column.")
+    appended_data = appended_data.copy()
+    if 'Adjusted_Revenue' not in appended_data.columns:
+        appended_data['Adjusted_Revenue'] = appended_data['Base_Revenue']
+    if 'Adjusted_Costs' not in appended_data.columns:
+        appended_data['Adjusted_Costs'] = appended_data['Base_Costs']
+
+    base_revenue = appended_data['Base_Revenue'].to_numpy(dtype=float)
+    base_costs = appended_data['Base_Costs'].to_numpy(dtype=float)
+    adjusted_revenue = appended_data['Adjusted_Revenue'].to_numpy(dtype=float)
+    adjusted_costs = appended_data['Adjusted_Costs'].to_numpy(dtype=float)
+
+    capital_impact = (base_revenue - adjusted_revenue) + (adjusted_costs - base_costs)
+    liquidity_impact = (base_revenue - adjusted_revenue) * 0.5
+    # Seeding cumsum with the previous total keeps the exact summation order of a full recompute
+    cumulative_capital = np.cumsum(np.concatenate([[state['Cumulative_Capital_Impact']], capital_impact]))[1:]
+    cumulative_liquidity = np.cumsum(np.concatenate([[state['Cumulative_Liquidity_Impact']], liquidity_impact]))[1:]
+    capital_remaining = state['Initial_Capital'] - cumulative_capital
+    liquidity_position = state['Initial_Liquidity'] - cumulative_liquidity
+
+    new_state = dict(state)
+    if len(appended_data):
+        new_state.update({
+            'Rows': state['Rows'] + len(appended_data),
+            'Cumulative_Capital_Impact': float(cumulative_capital[-1]),
+            'Cumulative_Liquidity_Impact': float(cumulative_liquidity[-1]),
+            'Minimum_Capital_Remaining': min(state['Minimum_Capital_Remaining'], float(capital_remaining.min())),
+            'Minimum_Liquidity_Position': min(state['Minimum_Liquidity_Position'], float(liquidity_position.min()))
+        })
+    if new_state['Rows'] == 0:
+        raise Exception("Input DataFrame cannot be empty.")
+
+    appended_data['Net_Earnings_Under_Stress'] = adjusted_revenue - adjusted_costs
+    appended_data['Capital_Impact'] = capital_impact
+    appended_data['Capital_Remaining'] = capital_remaining
+    appended_data['Liquidity_Impact'] = liquidity_impact
+    appended_data['Liquidity_Position'] = liquidity_position
+
+    initial_capital = new_state['Initial_Capital']
+    min_capital = new_state['Minimum_Capital_Remaining']
+    capital_drawdown = initial_capital - min_capital
+    min_liquidity = new_state['Minimum_Liquidity_Position']
+    metrics = {
+        'Initial_Capital': initial_capital,
+        'Minimum_Capital_Remaining': min_capital,
+        'Capital_Drawdown': capital_drawdown,
+        'Capital_Drawdown_Percentage': (capital_drawdown / initial_capital) * 100 if initial_capital != 0 else 0,
+        'Minimum_Liquidity_Position': min_liquidity,
+        'Liquidity_Shortfall': abs(min_liquidity) if min_liquidity < 0 else 0
+    }
+    return metrics, appended_data, new_state
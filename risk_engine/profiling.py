@@ -0,0 +1,163 @@
+"""Per-stage wall time and memory instrumentation for the app and the engine."""
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+import pandas as pd
+
+PROFILE_LOG_PATH = os.environ.get('QULAB_PROFILE_LOG')
+PROFILE_MEMORY = os.environ.get('QULAB_PROFILE_MEMORY', '0') != '0'
+PROFILE_HISTORY_LIMIT = 500
+STAGE_ORDER = ['load', 'validate', 'cache_write', 'stress', 'metrics', 'sensitivities', 'figure_build', 'serialization']
+
+# tracemalloc is process-wide, so traced stages of every session and thread share one peak
+_tracing_lock = threading.Lock()
+_traced_stages_open = 0
+
+def _enter_traced_stage():
+    """Starts tracing on first use and resets the peak only when no traced stage is open anywhere."""
+    global _traced_stages_open
+    with _tracing_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if _traced_stages_open == 0:
+            tracemalloc.reset_peak()
+        _traced_stages_open += 1
+        return tracemalloc.get_traced_memory()[0]
+
+def _exit_traced_stage():
+    """Returns the peak traced memory since the oldest open traced stage began."""
+    global _traced_stages_open
+    with _tracing_lock:
+        _traced_stages_open -= 1
+        return tracemalloc.get_traced_memory()[1]
+
+class StageProfiler:
+    """Records wall time and, optionally, tracemalloc peak for each named stage of one run.
+
+    Stages may nest. A stage's wall time excludes its nested stages, so the times of one
+    run add up, while its peak memory includes them. Memory tracing is opt-in because it
+    slows every allocation. Once a traced stage has run, tracing stays on for the life of
+    the process, and the peak is reset only while no traced stage is open in any thread.
+    A stage's peak is measured above the traced memory at its entry; when stages overlap,
+    whether nested or in concurrent sessions, it is an upper bound that may include memory
+    allocated by the overlapping stages.
+
+    Args:
+        context (dict, optional): Fields copied into every record, e.g. session id and page.
+        trace_memory (bool, optional): Measure peak memory with tracemalloc. Defaults to
+                                       `PROFILE_MEMORY` (env `QULAB_PROFILE_MEMORY`; off by default, '1' turns it on).
+    """
+
+    def __init__(self, context=None, trace_memory=PROFILE_MEMORY):
+        self.context = dict(context or {})
+        self.trace_memory = trace_memory
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name, **details):
+        """Times the enclosed block as stage `name`; `details` (e.g. rows=...) are added to its record."""
+        base = _enter_traced_stage() if self.trace_memory else 0
+        frame = {'child_seconds': 0.0}
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            peak_bytes = None
+            if self.trace_memory:
+                peak_bytes = max(_exit_traced_stage() - base, 0)
+            if self._stack:
+                self._stack[-1]['child_seconds'] += elapsed
+            self.records.append({
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'run_id': self.run_id,
+                **self.context,
+                'stage': name,
+                'wall_seconds': elapsed - frame['child_seconds'],
+                'peak_memory_bytes': peak_bytes,
+                **details,
+            })
+
+    def flush(self, history=None, log_path=PROFILE_LOG_PATH):
+        """Moves the recorded stages into `history` and, if configured, a JSONL log.
+
+        Args:
+            history (list, optional): Per-session record list, e.g. kept in `st.session_state`.
+                                      Trimmed to the newest `PROFILE_HISTORY_LIMIT` records.
+            log_path (str, optional): File the records are appended to, one JSON object per line.
+                                      Defaults to env `QULAB_PROFILE_LOG`; None disables logging.
+
+        Returns:
+            list: The records of this run.
+        """
+        records, self.records = self.records, []
+        if history is not None:
+            history.extend(records)
+            del history[:-PROFILE_HISTORY_LIMIT]
+        if log_path and records:
+            with open(log_path, 'a') as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + '\n')
+        return records
+
+def session_id(state):
+    """Returns the id of the session owning `state` (e.g. `st.session_state`), creating it on first use."""
+    return state.setdefault('session_id', uuid.uuid4().hex[:12])
+
+def session_profiler(state, page, trace_memory=PROFILE_MEMORY):
+    """Returns a profiler for one rerun of `page`, tagged with a session id kept in `state`.
+
+    Args:
+        state (MutableMapping): Per-session storage such as `st.session_state`.
+        page (str): Page name copied into every record.
+        trace_memory (bool, optional): Passed to `StageProfiler`.
+
+    Returns:
+        StageProfiler: A fresh profiler; pass `state.setdefault('stage_profile', [])` to its `flush`.
+    """
+    return StageProfiler(context={'session_id': session_id(state), 'page': page}, trace_memory=trace_memory)
+
+def profile_stage(profiler, name, **details):
+    """Returns `profiler.stage(name, ...)`, or a no-op context when `profiler` is None."""
+    return nullcontext() if profiler is None else profiler.stage(name, **details)
+
+def summarize_profile(records):
+    """Aggregates stage records per stage.
+
+    Args:
+        records (list): Records produced by `StageProfiler`.
+
+    Returns:
+        pd.DataFrame: One row per stage (in pipeline order) with its run count, last, mean and
+                      max wall time in seconds, and max peak memory in MiB.
+    """
+    columns = ['Stage', 'Runs', 'Last (s)', 'Mean (s)', 'Max (s)', 'Max Peak (MiB)']
+    if not records:
+        return pd.DataFrame(columns=columns)
+    frame = pd.DataFrame(records)
+    if 'peak_memory_bytes' not in frame:
+        frame['peak_memory_bytes'] = None
+    # Stages that ran several times in one run (e.g. one serialization per chart) count once
+    per_run = frame.groupby(['run_id', 'stage'], sort=False).agg(
+        wall_seconds=('wall_seconds', 'sum'), peak_memory_bytes=('peak_memory_bytes', 'max')
+    ).reset_index()
+    summary = per_run.groupby('stage', sort=False).agg(
+        Runs=('wall_seconds', 'size'),
+        **{'Last (s)': ('wall_seconds', 'last'), 'Mean (s)': ('wall_seconds', 'mean'), 'Max (s)': ('wall_seconds', 'max')},
+        peak=('peak_memory_bytes', 'max'),
+    )
+    summary['Max Peak (MiB)'] = summary.pop('peak') / 1024 ** 2
+    order = {stage: i for i, stage in enumerate(STAGE_ORDER)}
+    summary = summary.reset_index().rename(columns={'stage': 'Stage'})
+    summary = summary.sort_values('Stage', key=lambda stages: stages.map(lambda s: order.get(s, len(order))), kind='stable')
+    return summary[columns].reset_index(drop=True)
@@ -0,0 +1,353 @@
+"""Time-varying shock schedules: per-period shock paths applied as date-wise multipliers."""
+import json
+import os
+
+import pandas as pd
+import numpy as np
+
+from risk_engine.caching import LRUCache
+from risk_engine.metrics import INITIAL_CAPITAL_VALUE, INITIAL_LIQUIDITY_VALUE, calculate_risk_capacity_metrics_batch
+
+SCHEDULE_CACHE_MAX_BYTES = int(os.environ.get('QULAB_SCHEDULE_CACHE_BYTES', 256 * 1024 ** 2))
+SCHEDULE_KINDS = ['step', 'ramp', 'decay', 'piecewise', 'composite']
+# Parameter names of each kind, in the order they are stored in `ShockSchedule.params`
+SCHEDULE_PARAMETERS = {
+    'step': ('shock', 'start', 'end'),
+    'ramp': ('shock', 'start', 'periods', 'end'),
+    'decay': ('shock', 'start', 'half_life'),
+    'piecewise': ('periods', 'shocks'),
+}
+
+class ShockSchedule:
+    """An immutable shock path over periods, where period 0 is the first date of the data.
+
+    The shock of a period is the fractional reduction applied to every stressed component
+    on that date, `Adjusted = Base x (1 - shock)`, so a constant schedule reproduces the
+    'Scenario' stress. Schedules compare and hash by value, which lets them key caches and
+    travel in stress parameters. `a * b` composes two schedules: both reductions apply, so
+    the multipliers multiply.
+
+    Build schedules with `step_schedule`, `ramp_schedule`, `decay_schedule`,
+    `piecewise_schedule`, `load_schedule` or `schedule_from_dict` rather than directly.
+
+    Args:
+        kind (str): One of `SCHEDULE_KINDS`.
+        params (tuple): Parameters in `SCHEDULE_PARAMETERS[kind]` order; the child schedules for 'composite'.
+    """
+
+    def __init__(self, kind, params):
+        if kind not in SCHEDULE_KINDS:
+            raise ValueError(f"Unknown schedule kind '{kind}'; use one of {SCHEDULE_KINDS}.")
+        self.kind = kind
+        self.params = tuple(params)
+
+    def __eq__(self, other):
+        return isinstance(other, ShockSchedule) and (self.kind, self.params) == (other.kind, other.params)
+
+    def __hash__(self):
+        return hash((self.kind, self.params))
+
+    def __mul__(self, other):
+        return compose_schedules(self, other)
+
+    def __repr__(self):
+        if self.kind == 'composite':
+            return ' * '.join(repr(child) for child in self.params)
+        return f"{self.kind}({json.dumps(self.to_dict()['parameters'])})"
+
+    def shocks(self, n_periods):
+        """Returns the shock of each of the first `n_periods` periods."""
+        return schedule_matrix([self], n_periods)[0]
+
+    def to_dict(self):
+        """Returns a JSON-serialisable description accepted by `schedule_from_dict`."""
+        if self.kind == 'composite':
+            return {'kind': 'composite', 'schedules': [child.to_dict() for child in self.params]}
+        if self.kind == 'piecewise':
+            parameters = {'periods': list(self.params[0]), 'shocks': list(self.params[1])}
+        else:
+            parameters = {name: (None if np.isinf(value) else value)
+                          for name, value in zip(SCHEDULE_PARAMETERS[self.kind], self.params)}
+        return {'kind': self.kind, 'parameters': parameters}
+
+def _end(end):
+    return float('inf') if end is None else float(end)
+
+def step_schedule(shock, start=0, end=None):
+    """A constant `shock` from period `start` until `end` (exclusive; None means to the end of the data)."""
+    return ShockSchedule('step', (float(shock), float(start), _end(end)))
+
+def ramp_schedule(shock, start=0, periods=1, end=None):
+    """A shock rising linearly from 0 at period `start` to `shock` at `start + periods`, held until `end`.
+
+    Raises:
+        ValueError: If `periods` is not positive.
+    """
+    if periods <= 0:
+        raise ValueError("Ramp periods must be positive.")
+    return ShockSchedule('ramp', (float(shock), float(start), float(periods), _end(end)))
+
+def decay_schedule(shock, half_life, start=0):
+    """A `shock` hitting at period `start` and halving every `half_life` periods as the firm recovers.
+
+    Raises:
+        ValueError: If `half_life` is not positive.
+    """
+    if half_life <= 0:
+        raise ValueError("Half-life must be positive.")
+    return ShockSchedule('decay', (float(shock), float(start), float(half_life)))
+
+def piecewise_schedule(periods, shocks):
+    """A shock interpolated linearly between (period, shock) knots and held flat beyond the first and last knot.
+
+    Raises:
+        ValueError: If there are no knots, the lengths differ, or the periods are not increasing.
+    """
+    periods = tuple(float(period) for period in periods)
+    shocks = tuple(float(shock) for shock in shocks)
+    if not periods or len(periods) != len(shocks):
+        raise ValueError("A piecewise schedule needs the same, non-zero number of periods and shocks.")
+    if any(later <= earlier for earlier, later in zip(periods, periods[1:])):
+        raise ValueError("Piecewise schedule periods must be strictly increasing.")
+    return ShockSchedule('piecewise', (periods, shocks))
+
+def compose_schedules(*schedules):
+    """Combines schedules so that all of their reductions apply: the multipliers `1 - shock` multiply."""
+    children = []
+    for schedule in schedules:
+        children.extend(schedule.params if schedule.kind == 'composite' else [schedule])
+    return children[0] if len(children) == 1 else ShockSchedule('composite', children)
+
+def schedule_from_dict(spec):
+    """Builds a schedule from a `ShockSchedule.to_dict` description (parameters may also sit at the top level).
+
+    Raises:
+        KeyError: If the kind or a required parameter is missing.
+        ValueError: If the kind is unknown or a parameter is invalid.
+    """
+    kind = spec['kind']
+    if kind == 'composite':
+        return compose_schedules(*[schedule_from_dict(child) for child in spec['schedules']])
+    parameters = dict(spec.get('parameters', {k: v for k, v in spec.items() if k not in ('kind', 'name')}))
+    builders = {'step': step_schedule, 'ramp': ramp_schedule, 'decay': decay_schedule,
+                'piecewise': piecewise_schedule}
+    if kind not in builders:
+        raise ValueError(f"Unknown schedule kind '{kind}'; use one of {SCHEDULE_KINDS}.")
+    return builders[kind](**parameters)
+
+def load_schedule(filepath, origin=None):
+    """Reads a piecewise shock curve from a CSV or JSON file.
+
+    A CSV needs a 'Shock' column and either a 'Period' column or a 'Date' column; dates
+    become days counted from `origin` (default: the earliest date in the file), so a curve
+    lines up with the first date of the daily data it is applied to. A JSON file holds one
+    `ShockSchedule.to_dict` description.
+
+    Args:
+        filepath (str or file-like): Path to, or buffer of, the schedule file.
+        origin (str or pd.Timestamp, optional): Date treated as period 0 for a 'Date' column.
+
+    Returns:
+        ShockSchedule: The loaded schedule.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+        KeyError: If the required columns are missing.
+        ValueError: If the knots are invalid.
+    """
+    if isinstance(filepath, str) and not os.path.exists(filepath):
+        raise FileNotFoundError("File not found at specified path.")
+    if str(getattr(filepath, 'name', filepath)).lower().endswith('.json'):
+        if isinstance(filepath, str):
+            with open(filepath) as f:
+                return schedule_from_dict(json.load(f))
+        return schedule_from_dict(json.load(filepath))
+
+    curve = pd.read_csv(filepath)
+    if 'Shock' not in curve.columns:
+        raise KeyError("Schedule file must have a 'Shock' column.")
+    if 'Period' in curve.columns:
+        periods = curve['Period'].to_numpy(dtype=float)
+    elif 'Date' in curve.columns:
+        dates = pd.to_datetime(curve['Date'])
+        origin = dates.min() if origin is None else pd.Timestamp(origin)
+        periods = ((dates - origin) / pd.Timedelta(days=1)).to_numpy(dtype=float)
+    else:
+        raise KeyError("Schedule file must have a 'Period' or 'Date' column.")
+    order = np.argsort(periods, kind='stable')
+    return piecewise_schedule(periods[order], curve['Shock'].to_numpy(dtype=float)[order])
+
+def load_schedule_library(filepath):
+    """Reads named schedules from a JSON list of `ShockSchedule.to_dict` descriptions with a 'name' each.
+
+    Returns:
+        list: (name, ShockSchedule) pairs in file order; unnamed schedules are called 'schedule_<n>'.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError("File not found at specified path.")
+    with open(filepath) as f:
+        entries = json.load(f)
+    return [(entry.get('name') or f"schedule_{index}", schedule_from_dict(entry))
+            for index, entry in enumerate(entries)]
+
+def _evaluate_kind(kind, params, t):
+    """Shock matrix (len(params), len(t)) for schedules of one kind, built in one broadcast."""
+    if kind == 'piecewise':
+        # Knot counts differ between curves, so each is interpolated on its own
+        return np.array([np.interp(t, periods, shocks) for periods, shocks in params]).reshape(len(params), len(t))
+    p = np.array(params, dtype=float).T[:, :, None]
+    if kind == 'step':
+        shock, start, end = p
+        return shock * ((t >= start) & (t < end))
+    if kind == 'ramp':
+        shock, start, periods, end = p
+        return shock * np.clip((t - start) / periods, 0, 1) * ((t >= start) & (t < end))
+    shock, start, half_life = p
+    return np.where(t >= start, shock * 0.5 ** (np.maximum(t - start, 0) / half_life), 0.0)
+
+def _schedule_matrix(schedules, n_periods):
+    t = np.arange(n_periods, dtype=float)
+    shocks = np.zeros((len(schedules), n_periods))
+    for kind in SCHEDULE_KINDS:
+        rows = [i for i, schedule in enumerate(schedules) if schedule.kind == kind]
+        if not rows:
+            continue
+        if kind == 'composite':
+            children = [child for i in rows for child in schedules[i].params]
+            child_multipliers = 1 - _schedule_matrix(children, n_periods)
+            offsets = np.cumsum([0] + [len(schedules[i].params) for i in rows[:-1]])
+            shocks[rows] = 1 - np.multiply.reduceat(child_multipliers, offsets, axis=0)
+        else:
+            shocks[rows] = _evaluate_kind(kind, [schedules[i].params for i in rows], t)
+    return shocks
+
+_schedule_cache = LRUCache(max_bytes=SCHEDULE_CACHE_MAX_BYTES)
+
+def get_schedule_cache():
+    """Returns the process-wide cache of evaluated schedule matrices."""
+    return _schedule_cache
+
+def schedule_matrix(schedules, n_periods, cache=None):
+    """Evaluates a library of schedules into a (schedule x period) shock matrix.
+
+    Schedules of the same kind are evaluated together in one broadcast, and the result is
+    cached by (schedules, n_periods), so reruns and other sessions using the same library
+    reuse it. The returned array is shared and must be treated as read-only.
+
+    Args:
+        schedules (list): ShockSchedule objects.
+        n_periods (int): Number of periods (distinct dates) to evaluate.
+        cache (LRUCache, optional): Cache to use. Defaults to `get_schedule_cache()`.
+
+    Returns:
+        np.ndarray: Shocks of shape (len(schedules), n_periods).
+    """
+    cache = get_schedule_cache() if cache is None else cache
+    schedules = tuple(schedules)
+
+    def compute():
+        shocks = _schedule_matrix(schedules, n_periods)
+        shocks.flags.writeable = False
+        return shocks
+
+    return cache.get_or_compute((schedules, int(n_periods)), compute)
+
+def schedule_periods(data):
+    """Returns the period of every row: the rank of its date, or its position if there is no 'Date' column.
+
+    Entities of a panel share the calendar, so the same date gets the same shock everywhere.
+
+    Returns:
+        tuple: (np.ndarray of row periods, number of periods).
+    """
+    if 'Date' not in data.columns:
+        return np.arange(len(data)), len(data)
+    codes, uniques = pd.factorize(data['Date'], sort=True)
+    return codes, len(uniques)
+
+def schedule_multipliers(data, schedule):
+    """Returns the multiplier `1 - shock` of every row of `data` under `schedule`."""
+    periods, n_periods = schedule_periods(data)
+    return 1 - schedule_matrix([schedule], n_periods)[0][periods]
+
+def apply_schedules(data, schedules, columns=None):
+    """Applies a whole library of schedules to the `Base*` columns in a single broadcast.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        schedules (list): ShockSchedule objects.
+        columns (list, optional): `Base*` columns to stress. Default is all of them.
+
+    Returns:
+        tuple: (np.ndarray of shape (schedule, row, component), list of `Adjusted_*` column names),
+               laid out like `simulate_stress_grid`.
+    """
+    columns = [col for col in data.columns if 'Base' in col] if columns is None else list(columns)
+    periods, n_periods = schedule_periods(data)
+    multipliers = 1 - schedule_matrix(schedules, n_periods)[:, periods]
+    adjusted = multipliers[:, :, None] * data[columns].to_numpy(dtype=float)[None, :, :]
+    return adjusted, [col.replace('Base', 'Adjusted') for col in columns]
+
+def schedule_library_metrics(data, schedules, names=None, chunk_size=1000,
+                             initial_capital_value=INITIAL_CAPITAL_VALUE,
+                             initial_liquidity_value=INITIAL_LIQUIDITY_VALUE, progress=None):
+    """Scores a library of schedules with the batched risk capacity metrics.
+
+    Revenue and costs are stressed for `chunk_size` schedules at a time, as
+    (schedule x date) arrays, so memory stays bounded for large libraries. Panels are
+    scored at the firm level: the entities' series are summed per date against the
+    summed buffers, as in `calculate_portfolio_risk_metrics`.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        schedules (list): ShockSchedule objects.
+        names (list, optional): Schedule names for the index. Defaults to 0..n-1.
+        chunk_size (int, optional): Schedules scored per batch. Default is 1000.
+        initial_capital_value (float, optional): Starting capital (per entity for panels). Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity (per entity for panels). Default is 500.
+        progress (callable, optional): Called as `progress(fraction, message)` after each chunk.
+
+    Returns:
+        pd.DataFrame: One row of risk capacity metrics per schedule.
+
+    Raises:
+        KeyError: If 'Base_Revenue' or 'Base_Costs' is missing.
+        ValueError: If the data or the schedule library is empty or `chunk_size` is not positive.
+    """
+    for col in ['Base_Revenue', 'Base_Costs']:
+        if col not in data.columns:
+            raise KeyError(f"Required column '{col}' is missing.")
+    if data.empty:
+        raise ValueError("Input DataFrame cannot be empty.")
+    if len(schedules) == 0:
+        raise ValueError("The schedule library cannot be empty.")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+
+    n_buffers = 1
+    if 'Entity' in data.columns:
+        n_buffers = data['Entity'].nunique()
+        data = data.groupby('Date', sort=True)[['Base_Revenue', 'Base_Costs']].sum().reset_index()
+    periods, n_periods = schedule_periods(data)
+    shocks = schedule_matrix(schedules, n_periods)
+    base_revenue = data['Base_Revenue'].to_numpy(dtype=float)
+    base_costs = data['Base_Costs'].to_numpy(dtype=float)
+
+    results = {}
+    for start in range(0, len(schedules), chunk_size):
+        multipliers = 1 - shocks[start:start + chunk_size, periods]
+        chunk_metrics = calculate_risk_capacity_metrics_batch(
+            base_revenue, base_costs, base_revenue * multipliers, base_costs * multipliers,
+            initial_capital_value * n_buffers, initial_liquidity_value * n_buffers
+        )
+        for name, values in chunk_metrics.items():
+            results.setdefault(name, []).append(values)
+        if progress is not None:
+            done = min(start + chunk_size, len(schedules))
+            progress(done / len(schedules), f"{done:,} of {len(schedules):,} schedules")
+
+    metrics = {name: np.concatenate(values) for name, values in results.items()}
+    return pd.DataFrame(metrics, index=pd.Index(range(len(schedules)) if names is None else names, name='Schedule'))
@@ -0,0 +1,168 @@
+"""Analytic sensitivities of the risk capacity metrics to the stress and buffer parameters."""
+import pandas as pd
+import numpy as np
+
+from risk_engine.metrics import INITIAL_CAPITAL_VALUE, INITIAL_LIQUIDITY_VALUE
+
+SHOCKED_COMPONENTS = ['Base_Revenue', 'Base_Costs']
+METRIC_NAMES = ['Initial_Capital', 'Minimum_Capital_Remaining', 'Capital_Drawdown',
+                'Capital_Drawdown_Percentage', 'Minimum_Liquidity_Position', 'Liquidity_Shortfall']
+STRESS_PARAMETERS = {'Sensitivity': 'shock_magnitude', 'Scenario': 'scenario_severity_factor',
+                     'Firm-Wide': 'systemic_crisis_scale'}
+# Default one-sided bump of each parameter in `sensitivity_tornado`, in the parameter's own units
+TORNADO_BUMPS = {
+    'Shock_Base_Revenue': 0.05,
+    'Shock_Base_Costs': 0.05,
+    'shock_magnitude': 5.0,
+    'scenario_severity_factor': 0.05,
+    'systemic_crisis_scale': 0.05,
+}
+TORNADO_BUFFER_BUMP = 0.10  # Relative bump of initial_capital_value / initial_liquidity_value
+
+def _firm_series(base_data, adjustments):
+    """Returns base and adjusted revenue and costs as arrays, summed per date for panels, and the entity count."""
+    frame = pd.DataFrame({
+        'Base_Revenue': base_data['Base_Revenue'],
+        'Base_Costs': base_data['Base_Costs'],
+        'Adjusted_Revenue': adjustments['Adjusted_Revenue'] if 'Adjusted_Revenue' in adjustments.columns
+                            else base_data['Base_Revenue'],
+        'Adjusted_Costs': adjustments['Adjusted_Costs'] if 'Adjusted_Costs' in adjustments.columns
+                          else base_data['Base_Costs'],
+    }, index=base_data.index, copy=False)
+    n_entities = 1
+    if 'Entity' in base_data.columns:
+        n_entities = base_data['Entity'].nunique()
+        frame = frame.groupby(base_data['Date'], sort=True).sum()
+    return {col: frame[col].to_numpy(dtype=float) for col in frame.columns}, n_entities
+
+def risk_metric_sensitivities(base_data, adjustments, stress_type=None, parameters=None,
+                              initial_capital_value=INITIAL_CAPITAL_VALUE,
+                              initial_liquidity_value=INITIAL_LIQUIDITY_VALUE):
+    """Computes the risk capacity metrics and their gradients in a single pass over the data.
+
+    Capital and liquidity paths are linear in the shocks, so each metric's derivative is a
+    cumulative sum of the base series read at the date where its running minimum is
+    attained; no bumped reruns are needed. Component shocks are additional uniform
+    reductions, `Adjusted -= shock x Base`, so they also apply on top of time-varying
+    schedules. At ties or kinks (e.g. several dates sharing the running minimum, as when
+    a stress leaves a path untouched, or a liquidity shortfall of exactly zero) the
+    gradient is the one-sided derivative for an increase of the parameter.
+
+    Panels are differentiated at the firm level, where the per-entity buffers are summed,
+    so the buffer gradients are per unit of each entity's buffer.
+
+    Args:
+        base_data (pd.DataFrame): The base financial data with 'Base_Revenue' and 'Base_Costs'.
+        adjustments (pd.DataFrame): Output of `simulate_stress_impact(..., lean=True)`.
+        stress_type (str, optional): Stress type that produced `adjustments`; with `parameters`, adds a
+                                     column for the derivative with respect to its shock setting.
+        parameters (dict, optional): Parameters of that stress ('parameter_to_shock' for Sensitivity).
+        initial_capital_value (float, optional): Starting capital (per entity for panels). Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity (per entity for panels). Default is 500.
+
+    Returns:
+        tuple: (metrics dict as returned by `calculate_risk_capacity_metrics_lean`, pd.DataFrame of
+               gradients with one row per metric and one column per parameter: 'Shock_Base_Revenue',
+               'Shock_Base_Costs', the stress type's own parameter if known, 'initial_capital_value'
+               and 'initial_liquidity_value').
+
+    Raises:
+        Exception: If the input DataFrame is empty.
+        KeyError: If 'Base_Revenue' or 'Base_Costs' is missing.
+    """
+    if base_data.empty:
+        raise Exception("Input DataFrame cannot be empty.")
+    for col in SHOCKED_COMPONENTS:
+        if col not in base_data.columns:
+            raise KeyError(f"Required column '{col}' is missing.")
+
+    series, n_entities = _firm_series(base_data, adjustments)
+    revenue_loss = series['Base_Revenue'] - series['Adjusted_Revenue']
+    cumulative_capital = np.cumsum(revenue_loss + (series['Adjusted_Costs'] - series['Base_Costs']))
+    cumulative_liquidity = np.cumsum(revenue_loss * 0.5)
+    # The minima of the capital and liquidity paths sit where these cumulative impacts peak
+    max_capital_impact = cumulative_capital.max()
+    max_liquidity_impact = cumulative_liquidity.max()
+    capital_peaks = cumulative_capital == max_capital_impact
+    liquidity_peaks = cumulative_liquidity == max_liquidity_impact
+
+    capital, liquidity = initial_capital_value * n_entities, initial_liquidity_value * n_entities
+    min_capital = capital - max_capital_impact
+    min_liquidity = liquidity - max_liquidity_impact
+    in_shortfall = min_liquidity < 0 or (min_liquidity == 0 and max_liquidity_impact > 0)
+    metrics = {
+        'Initial_Capital': capital,
+        'Minimum_Capital_Remaining': min_capital,
+        'Capital_Drawdown': capital - min_capital,
+        'Capital_Drawdown_Percentage': (capital - min_capital) / capital * 100 if capital != 0 else 0,
+        'Minimum_Liquidity_Position': min_liquidity,
+        'Liquidity_Shortfall': abs(min_liquidity) if min_liquidity < 0 else 0,
+    }
+
+    # How each component shock moves the cumulative impacts, date by date
+    cumulative_revenue, cumulative_costs = np.cumsum(series['Base_Revenue']), np.cumsum(series['Base_Costs'])
+    capital_paths = {'Shock_Base_Revenue': cumulative_revenue, 'Shock_Base_Costs': -cumulative_costs}
+    liquidity_paths = {'Shock_Base_Revenue': 0.5 * cumulative_revenue,
+                       'Shock_Base_Costs': np.zeros_like(cumulative_costs)}
+    parameter = STRESS_PARAMETERS.get(stress_type)
+    if parameter is not None and parameters is not None:
+        # Chain rule: how much each component shock moves per unit of the stress setting
+        if stress_type == 'Sensitivity':
+            shocked = f"Shock_{parameters.get('parameter_to_shock')}"
+            weights = {shock: (0.01 if shock == shocked else 0.0) for shock in capital_paths}
+        else:
+            weights = {shock: 1.0 for shock in capital_paths}
+        capital_paths[parameter] = sum(capital_paths[shock] * weight for shock, weight in weights.items())
+        liquidity_paths[parameter] = sum(liquidity_paths[shock] * weight for shock, weight in weights.items())
+
+    gradients = pd.DataFrame(0.0, index=pd.Index(METRIC_NAMES, name='Metric'),
+                             columns=list(capital_paths) + ['initial_capital_value', 'initial_liquidity_value'])
+    for shock in capital_paths:
+        # When several dates tie for the peak, raising the shock lifts the peak by the largest rate among them
+        d_capital_impact = capital_paths[shock][capital_peaks].max()
+        d_liquidity_impact = liquidity_paths[shock][liquidity_peaks].max()
+        gradients.loc['Minimum_Capital_Remaining', shock] = -d_capital_impact
+        gradients.loc['Capital_Drawdown', shock] = d_capital_impact
+        gradients.loc['Capital_Drawdown_Percentage', shock] = d_capital_impact / capital * 100 if capital else 0
+        gradients.loc['Minimum_Liquidity_Position', shock] = -d_liquidity_impact
+        gradients.loc['Liquidity_Shortfall', shock] = d_liquidity_impact if in_shortfall else 0.0
+    gradients.loc['Initial_Capital', 'initial_capital_value'] = n_entities
+    gradients.loc['Minimum_Capital_Remaining', 'initial_capital_value'] = n_entities
+    if capital:
+        gradients.loc['Capital_Drawdown_Percentage', 'initial_capital_value'] = \
+            -max_capital_impact / capital ** 2 * 100 * n_entities
+    gradients.loc['Minimum_Liquidity_Position', 'initial_liquidity_value'] = n_entities
+    gradients.loc['Liquidity_Shortfall', 'initial_liquidity_value'] = -n_entities if in_shortfall else 0.0
+    return metrics, gradients
+
+def sensitivity_tornado(gradients, metric, parameter_values=None, bumps=None):
+    """Builds first-order tornado data: the change in `metric` when each parameter moves down or up.
+
+    Args:
+        gradients (pd.DataFrame): Output of `risk_metric_sensitivities`.
+        metric (str): Row of `gradients` to explain.
+        parameter_values (dict, optional): Current 'initial_capital_value' / 'initial_liquidity_value',
+                                           whose bumps are `TORNADO_BUFFER_BUMP` of their value.
+        bumps (dict, optional): Bump per parameter, overriding `TORNADO_BUMPS`.
+
+    Returns:
+        pd.DataFrame: Columns 'Parameter', 'Bump', 'Low' and 'High' (metric change for a bump down and up),
+                      sorted by the width of the swing, widest first.
+
+    Raises:
+        KeyError: If `metric` is not a row of `gradients`.
+    """
+    if metric not in gradients.index:
+        raise KeyError(f"Unknown risk capacity metric '{metric}'.")
+    parameter_values = {'initial_capital_value': INITIAL_CAPITAL_VALUE,
+                        'initial_liquidity_value': INITIAL_LIQUIDITY_VALUE, **(parameter_values or {})}
+    bumps = {**TORNADO_BUMPS,
+             **{name: abs(value) * TORNADO_BUFFER_BUMP for name, value in parameter_values.items()},
+             **(bumps or {})}
+    rows = []
+    for parameter, gradient in gradients.loc[metric].items():
+        bump = bumps.get(parameter, 0.0)
+        rows.append({'Parameter': parameter, 'Bump': bump, 'Low': -gradient * bump, 'High': gradient * bump})
+    tornado = pd.DataFrame(rows)
+    swing = (tornado['High'] - tornado['Low']).abs()
+    return tornado.loc[swing.sort_values(ascending=False, kind='stable').index].reset_index(drop=True)
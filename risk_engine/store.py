@@ -0,0 +1,310 @@
+"""Process-wide, reference-counted store of the datasets and derived frames sessions work on."""
+import hashlib
+import os
+import threading
+import time
+
+from risk_engine.caching import estimate_size
+from risk_engine.data import (
+    ARROW_CACHE_DIR,
+    _arrow_cache_name,
+    _read_arrow_cache,
+    _write_arrow_cache,
+    dataset_cache_key,
+    load_and_validate_data,
+)
+from risk_engine.stress import _normalize_parameters, simulate_stress_impact
+
+DATASET_STORE_MAX_BYTES = int(os.environ.get('QULAB_STORE_BYTES', 4 * 1024 ** 3))
+DATASET_STORE_IDLE_SECONDS = float(os.environ.get('QULAB_STORE_IDLE_SECONDS', 900))
+DATASET_STORE_OWNER_TTL = float(os.environ.get('QULAB_STORE_OWNER_TTL', 24 * 3600))
+
+class DatasetStore:
+    """Thread-safe store sharing identical frames between sessions under one memory budget.
+
+    Frames are keyed by content (a dataset's load key, or a stress result's base key and
+    parameters), so sessions working on the same data hold one read-only copy. Sessions
+    ("owners") never keep frames themselves: they bind named slots such as 'base' to keys
+    and fetch the frame on every rerun. Each binding counts as a reference.
+
+    When the stored frames exceed `max_bytes`, the store first drops unreferenced frames
+    (least recently used first), then derived frames whose owners are all idle, then
+    regenerable datasets whose owners are all idle. An evicted frame keeps its factory and is
+    rebuilt on its next fetch. Frames in use by an active owner are never evicted, so the
+    budget can be exceeded when every frame is in active use.
+
+    Streamlit does not report ended sessions, so owners idle for longer than `owner_ttl`
+    are released automatically.
+
+    Args:
+        max_bytes (int, optional): Memory budget of all stored frames. None means unbounded.
+        idle_seconds (float, optional): Seconds without a fetch after which an owner counts as idle.
+        owner_ttl (float, optional): Seconds without a fetch after which an owner's references are released.
+    """
+
+    def __init__(self, max_bytes=None, idle_seconds=DATASET_STORE_IDLE_SECONDS, owner_ttl=DATASET_STORE_OWNER_TTL):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.owner_ttl = owner_ttl
+        self._entries = {}  # key -> {'value', 'size', 'factory', 'derived', 'last_access', 'holders'}
+        self._slots = {}  # owner -> {slot: key}
+        self._last_seen = {}  # owner -> time of its last fetch
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.regenerations = 0
+        self.evictions = 0
+
+    def _idle(self, owner, now):
+        return now - self._last_seen.get(owner, 0.0) > self.idle_seconds
+
+    def _release_expired(self, now):
+        for owner in [owner for owner, seen in self._last_seen.items() if now - seen > self.owner_ttl]:
+            self.release_owner(owner)
+
+    def _store(self, key, value):
+        """Stores a freshly built value, or returns the one another session stored meanwhile."""
+        entry = self._entries[key]
+        if entry['value'] is not None:
+            return entry['value']
+        entry['value'], entry['size'] = value, estimate_size(value)
+        entry['last_access'] = time.monotonic()
+        self._bytes += entry['size']
+        self._evict(keep=key)
+        return value
+
+    def _evict(self, keep=None):
+        if self.max_bytes is None or self._bytes <= self.max_bytes:
+            return
+        now = time.monotonic()
+        self._release_expired(now)
+        stored = sorted(((entry['last_access'], key) for key, entry in self._entries.items()
+                         if entry['value'] is not None and key != keep), key=lambda item: item[0])
+
+        def all_idle(entry):
+            return all(self._idle(owner, now) for owner, _ in entry['holders'])
+
+        candidates = (
+            [key for _, key in stored if not self._entries[key]['holders']]
+            + [key for _, key in stored if self._entries[key]['holders'] and self._entries[key]['derived']
+               and all_idle(self._entries[key])]
+            + [key for _, key in stored if self._entries[key]['holders'] and not self._entries[key]['derived']
+               and self._entries[key]['factory'] is not None and all_idle(self._entries[key])]
+        )
+        for key in candidates:
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            self._bytes -= entry['size']
+            self.evictions += 1
+            if entry['holders']:
+                entry['value'], entry['size'] = None, 0
+            else:
+                del self._entries[key]
+
+    def get_or_create(self, key, create, factory=None, derived=False, owner=None, slot=None):
+        """Returns the shared frame for `key`, building it with `create()` if the store has none.
+
+        Args:
+            key (hashable): Content key of the frame.
+            create (callable): Builds the frame on first use.
+            factory (callable, optional): Rebuilds the frame after eviction. Without one the frame is
+                                          only evicted once no session references it.
+            derived (bool, optional): Whether the frame is derived from another stored frame, which
+                                      makes it the first to go under memory pressure. Default is False.
+            owner (hashable, optional): If given with `slot`, binds the key to that slot in the same step.
+            slot (str, optional): Slot of `owner` to bind.
+
+        Returns:
+            The stored frame, to be treated as read-only.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['value'] is not None:
+                entry['last_access'] = time.monotonic()
+                self.hits += 1
+                if owner is not None:
+                    self.bind(owner, slot, key)
+                return entry['value']
+            self.misses += 1
+        # Built outside the lock; a concurrent build of the same key keeps the first result
+        value = create()
+        with self._lock:
+            entry = self._entries.setdefault(key, {'value': None, 'size': 0, 'holders': set()})
+            entry.update(factory=factory, derived=derived)
+            if owner is not None:
+                self.bind(owner, slot, key)
+            return self._store(key, value)
+
+    def get(self, key):
+        """Returns the frame for `key`, regenerating it with its factory if it was evicted.
+
+        Raises:
+            KeyError: If the key is unknown, or was evicted without a factory.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                raise KeyError(f"Dataset '{key}' is not in the store.")
+            if entry['value'] is not None:
+                entry['last_access'] = time.monotonic()
+                self.hits += 1
+                return entry['value']
+            if entry['factory'] is None:
+                raise KeyError(f"Dataset '{key}' was evicted and cannot be regenerated.")
+            factory = entry['factory']
+            self.misses += 1
+            self.regenerations += 1
+        value = factory()
+        with self._lock:
+            return self._store(key, value)
+
+    def bind(self, owner, slot, key):
+        """Points `owner`'s `slot` at `key`, releasing the frame it referenced before."""
+        with self._lock:
+            if key not in self._entries:
+                raise KeyError(f"Dataset '{key}' is not in the store.")
+            now = time.monotonic()
+            self._last_seen[owner] = now
+            self._release_expired(now)
+            if self._slots.get(owner, {}).get(slot) == key:
+                return
+            self.unbind(owner, slot)
+            self._slots.setdefault(owner, {})[slot] = key
+            self._entries[key]['holders'].add((owner, slot))
+
+    def unbind(self, owner, slot):
+        """Releases `owner`'s reference in `slot`, if any."""
+        with self._lock:
+            key = self._slots.get(owner, {}).pop(slot, None)
+            if key is not None and key in self._entries:
+                self._entries[key]['holders'].discard((owner, slot))
+                if self._entries[key]['value'] is None and not self._entries[key]['holders']:
+                    del self._entries[key]
+
+    def release_owner(self, owner):
+        """Releases every reference held by `owner`, e.g. when its session ends."""
+        with self._lock:
+            for slot in list(self._slots.get(owner, {})):
+                self.unbind(owner, slot)
+            self._slots.pop(owner, None)
+            self._last_seen.pop(owner, None)
+
+    def key_of(self, owner, slot):
+        """Returns the key bound to `owner`'s `slot`, or None."""
+        with self._lock:
+            return self._slots.get(owner, {}).get(slot)
+
+    def fetch(self, owner, slot, default=None):
+        """Returns the frame bound to `owner`'s `slot` (regenerated if evicted), or `default` if unbound."""
+        with self._lock:
+            self._last_seen[owner] = time.monotonic()
+            key = self._slots.get(owner, {}).get(slot)
+        return default if key is None else self.get(key)
+
+    def clear(self):
+        """Drops every frame and binding; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._slots.clear()
+            self._last_seen.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns a dict of counters, occupancy and the number of active sessions."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'Hits': self.hits,
+                'Misses': self.misses,
+                'Regenerations': self.regenerations,
+                'Evictions': self.evictions,
+                'Entries': sum(entry['value'] is not None for entry in self._entries.values()),
+                'Bytes': self._bytes,
+                'Budget_Bytes': self.max_bytes,
+                'Sessions': len(self._slots),
+                'Active_Sessions': sum(not self._idle(owner, now) for owner in self._slots)
+            }
+
+_dataset_store = DatasetStore(max_bytes=DATASET_STORE_MAX_BYTES)
+
+def get_dataset_store():
+    """Returns the process-wide dataset store, shared by every session."""
+    return _dataset_store
+
+def _fingerprinted(df, key):
+    df.attrs['fingerprint'] = hashlib.sha256(repr(key).encode()).hexdigest()
+    return df
+
+def load_shared_dataset(filepath=None, num_days=5, chunksize=None, float_dtype='float64', cache_dir=None,
+                        num_entities=None, profiler=None, store=None, owner=None, slot='base'):
+    """Loads and validates financial data into the dataset store.
+
+    Identical inputs (the same file contents, or the same synthetic parameters) map to one
+    stored frame. Synthetic data is regenerated from its parameters after eviction; files
+    are kept on disk as Arrow IPC (the CSV Arrow cache, or a copy written here) and
+    memory-mapped back in.
+
+    Args:
+        filepath (str, optional): Path to, or buffer of, the data file. If None, a synthetic dataset is used.
+        num_days (int, optional): Number of days for synthetic dataset. Default is 5.
+        chunksize (int, optional): Passed to `load_and_validate_data`.
+        float_dtype (str, optional): Passed to `load_and_validate_data`.
+        cache_dir (str, optional): Arrow cache directory. Defaults to `ARROW_CACHE_DIR` for file copies.
+        num_entities (int, optional): Number of entities of a synthetic panel.
+        profiler (StageProfiler, optional): Passed to `load_and_validate_data` when the data is loaded.
+        store (DatasetStore, optional): Store to use. Defaults to `get_dataset_store()`.
+        owner (hashable, optional): Session to bind the dataset to, releasing its previous one.
+        slot (str, optional): Slot of `owner` to bind. Default is 'base'.
+
+    Returns:
+        tuple: (store key, read-only DataFrame).
+    """
+    store = get_dataset_store() if store is None else store
+    key = ('dataset',) + dataset_cache_key(filepath, num_days, float_dtype, num_entities, chunksize)
+
+    if filepath is None:
+        def factory():
+            return _fingerprinted(load_and_validate_data(None, num_days, num_entities=num_entities), key[1:])
+    else:
+        # Same name as the CSV Arrow cache, so CSVs loaded with a `cache_dir` are not written twice
+        spill_path = os.path.join(cache_dir or ARROW_CACHE_DIR, _arrow_cache_name(key[2], float_dtype, chunksize))
+
+        def factory():
+            return _fingerprinted(_read_arrow_cache(spill_path), key[1:])
+
+    def create():
+        df = load_and_validate_data(filepath, num_days, chunksize, float_dtype, cache_dir, num_entities, profiler)
+        if filepath is not None and not os.path.exists(spill_path):
+            _write_arrow_cache(df, spill_path)
+        return _fingerprinted(df, key[1:])
+
+    return key, store.get_or_create(key, create, factory, owner=owner, slot=slot)
+
+def stress_shared_dataset(base_key, stress_type, parameters, store=None, owner=None, slot='stress'):
+    """Applies a stress test to a stored dataset, storing the lean result as a derived frame.
+
+    Args:
+        base_key (tuple): Store key of the base data, as returned by `load_shared_dataset`.
+        stress_type (str): Type of stress test ('Sensitivity', 'Scenario', 'Firm-Wide').
+        parameters (dict): Dictionary of parameters specific to the stress type.
+        store (DatasetStore, optional): Store to use. Defaults to `get_dataset_store()`.
+        owner (hashable, optional): Session to bind the result to, releasing its previous one.
+        slot (str, optional): Slot of `owner` to bind. Default is 'stress'.
+
+    Returns:
+        tuple: (store key, read-only DataFrame of the `Adjusted_*` columns).
+
+    Raises:
+        KeyError: If a required parameter or column is missing for the specified stress type.
+        Exception: If an invalid stress type is provided.
+    """
+    store = get_dataset_store() if store is None else store
+    key = ('stress', base_key, stress_type, _normalize_parameters(parameters))
+    parameters = dict(parameters)
+
+    def factory():
+        return simulate_stress_impact(store.get(base_key), stress_type, parameters, lean=True)
+
+    return key, store.get_or_create(key, factory, factory, derived=True, owner=owner, slot=slot)
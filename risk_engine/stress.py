@@ -0,0 +1,496 @@
+"""Stress application: deterministic, grid, Monte Carlo, correlated-factor and batch runs."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+
+import pandas as pd
+import numpy as np
+
+from risk_engine.metrics import (
+    INITIAL_CAPITAL_VALUE,
+    INITIAL_LIQUIDITY_VALUE,
+    calculate_risk_capacity_metrics,
+    calculate_risk_capacity_metrics_batch,
+    calculate_risk_capacity_metrics_lean,
+)
+from risk_engine.schedules import schedule_multipliers
+
+def _stress_adjustments(data, stress_type, parameters):
+    """Returns the `Adjusted_*` columns of a stress test, in `simulate_stress_impact` column order."""
+    # Always initialize Adjusted columns with base values first
+    adjusted = {}
+    if 'Base_Revenue' in data.columns:
+        adjusted['Adjusted_Revenue'] = data['Base_Revenue']
+    if 'Base_Costs' in data.columns:
+        adjusted['Adjusted_Costs'] = data['Base_Costs']
+
+    if stress_type == 'Sensitivity':
+        parameter_to_shock = parameters.get('parameter_to_shock')
+        shock_magnitude = parameters.get('shock_magnitude')
+        if parameter_to_shock not in data.columns:
+            raise KeyError(f"Parameter '{parameter_to_shock}' not found in data for Sensitivity stress test.")
+        # Apply shock only to the selected parameter
+        adjusted_col_name = f'Adjusted_{parameter_to_shock.replace("Base_", "")}'
+        adjusted[adjusted_col_name] = data[parameter_to_shock] * (1 - shock_magnitude/100)
+    elif stress_type == 'Scenario':
+        scenario_severity_factor = parameters.get('scenario_severity_factor')
+        for col in data.columns:
+            if 'Base' in col:
+                adjusted[col.replace('Base', 'Adjusted')] = data[col] * (1 - scenario_severity_factor)
+    elif stress_type == 'Firm-Wide':
+        systemic_crisis_scale = parameters.get('systemic_crisis_scale')
+        for col in data.columns:
+            if 'Base' in col:
+                adjusted[col.replace('Base', 'Adjusted')] = data[col] * (1 - systemic_crisis_scale)
+    elif stress_type == 'Schedule':
+        schedule = parameters.get('schedule')
+        if schedule is None:
+            raise KeyError("Parameter 'schedule' is required for a Schedule stress test.")
+        # One multiplier per date, shared by every component
+        multipliers = schedule_multipliers(data, schedule)
+        for col in data.columns:
+            if 'Base' in col:
+                adjusted[col.replace('Base', 'Adjusted')] = data[col] * multipliers
+    else:
+        raise Exception("Invalid stress type.")
+    return adjusted
+
+def simulate_stress_impact(data, stress_type, parameters, lean=False):
+    """Applies stress test methodology to data.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        stress_type (str): Type of stress test ('Sensitivity', 'Scenario', 'Firm-Wide', or 'Schedule'
+                           for a time-varying `parameters['schedule']`, see `risk_engine.schedules`).
+        parameters (dict): Dictionary of parameters specific to the stress type.
+        lean (bool, optional): Return only the `Adjusted_*` columns, sharing `data`'s index, instead
+                               of a full copy of `data` with them appended. Unshocked columns share
+                               the base arrays. Default is False.
+
+    Returns:
+        pd.DataFrame: DataFrame with stressed financial data (only the adjusted columns if `lean`).
+
+    Raises:
+        KeyError: If a required parameter or column is missing for the specified stress type.
+        Exception: If an invalid stress type is provided.
+    """
+    adjusted = _stress_adjustments(data, stress_type, parameters)
+    if lean:
+        return pd.DataFrame(adjusted, index=data.index, copy=False)
+
+    stressed_data = data.copy() # Work on a copy to avoid modifying original data
+    for col, values in adjusted.items():
+        stressed_data[col] = values
+    # The copy inherits the base frame's fingerprint, which no longer describes its contents
+    stressed_data.attrs.pop('fingerprint', None)
+    return stressed_data
+
+def stressed_view(data, adjustments):
+    """Joins base data and the lean output of `simulate_stress_impact` into one frame.
+
+    The result has the columns `simulate_stress_impact` would return. Under pandas'
+    copy-on-write the columns of both inputs are shared rather than copied, so the view
+    can be rebuilt on every rerun instead of being stored.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        adjustments (pd.DataFrame): `Adjusted_*` columns sharing `data`'s index.
+
+    Returns:
+        pd.DataFrame: Base columns followed by the adjusted ones.
+    """
+    view = data.assign(**dict(adjustments.items()))
+    # Analytics caches trust this fingerprint, so the base frame's one must not carry over
+    view.attrs.pop('fingerprint', None)
+    return view
+
+def _normalize_parameters(parameters):
+    """Returns a hashable, order-independent form of a parameters dict (10 and 10.0 compare equal)."""
+    return tuple(sorted(
+        (name, float(value) if isinstance(value, (int, float, np.number)) and not isinstance(value, bool) else value)
+        for name, value in parameters.items()
+    ))
+
+def stress_factors(stress_type, values, base_columns, parameter_to_shock=None):
+    """Builds the (scenario x component) multiplier matrix for a stress type.
+
+    Args:
+        stress_type (str): Type of stress test ('Sensitivity', 'Scenario', 'Firm-Wide').
+        values (array-like): Shock magnitudes (percent, Sensitivity) or severity/crisis scales.
+        base_columns (list): Names of the `Base*` columns being stressed.
+        parameter_to_shock (str, optional): Column shocked by a Sensitivity stress.
+
+    Returns:
+        np.ndarray: Multipliers of shape (len(values), len(base_columns)).
+
+    Raises:
+        KeyError: If the Sensitivity parameter is not one of the base columns.
+        Exception: If an invalid stress type is provided.
+    """
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    factors = np.ones((values.size, len(base_columns)))
+    if stress_type == 'Sensitivity':
+        if parameter_to_shock not in base_columns:
+            raise KeyError(f"Parameter '{parameter_to_shock}' not found in data for Sensitivity stress test.")
+        factors[:, base_columns.index(parameter_to_shock)] = 1 - values / 100
+    elif stress_type in ('Scenario', 'Firm-Wide'):
+        factors[:] = (1 - values)[:, None]
+    else:
+        raise Exception("Invalid stress type.")
+    return factors
+
+def simulate_stress_grid(data, stress_type, values, parameter_to_shock=None):
+    """Applies one stress type across a whole vector of severities in a single broadcast.
+
+    Unlike `simulate_stress_impact`, no DataFrame is copied per scenario: the `Base*`
+    columns are read once into a (date x component) array and multiplied by the
+    (scenario x component) factor matrix.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        stress_type (str): Type of stress test ('Sensitivity', 'Scenario', 'Firm-Wide').
+        values (array-like): Shock magnitudes in percent for 'Sensitivity', otherwise
+                             `scenario_severity_factor` / `systemic_crisis_scale` values.
+        parameter_to_shock (str, optional): Base column to shock for 'Sensitivity'.
+
+    Returns:
+        tuple: (np.ndarray of shape (scenario, date, component), list of `Adjusted_*` column names).
+
+    Raises:
+        KeyError: If a required column is missing for the specified stress type.
+        Exception: If an invalid stress type is provided.
+    """
+    base_columns = [col for col in data.columns if 'Base' in col]
+    factors = stress_factors(stress_type, values, base_columns, parameter_to_shock)
+    base = data[base_columns].to_numpy(dtype=float)
+    adjusted = factors[:, None, :] * base[None, :, :]
+    return adjusted, [col.replace('Base', 'Adjusted') for col in base_columns]
+
+def stress_grid_to_frame(data, values, adjusted, adjusted_columns):
+    """Flattens a `simulate_stress_grid` result into a long-format DataFrame.
+
+    Args:
+        data (pd.DataFrame): The base financial data the grid was computed from.
+        values (array-like): The severities passed to `simulate_stress_grid`.
+        adjusted (np.ndarray): Grid of shape (scenario, date, component).
+        adjusted_columns (list): Component names returned by `simulate_stress_grid`.
+
+    Returns:
+        pd.DataFrame: One row per (scenario, date, component) with columns
+                      'Scenario', 'Stress_Value', 'Date', 'Component', 'Value'.
+    """
+    n_scenarios, n_dates, n_components = adjusted.shape
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    per_scenario = n_dates * n_components
+    return pd.DataFrame({
+        'Scenario': np.repeat(np.arange(n_scenarios), per_scenario),
+        'Stress_Value': np.repeat(values, per_scenario),
+        'Date': np.tile(np.repeat(data['Date'].to_numpy(), n_components), n_scenarios),
+        'Component': pd.Categorical.from_codes(
+            np.tile(np.arange(n_components), n_scenarios * n_dates), adjusted_columns),
+        'Value': adjusted.reshape(-1),
+    })
+
+def stress_value(stress_type, parameters):
+    """Returns the scalar shock setting a stress type reads from its parameters dict."""
+    if stress_type == 'Sensitivity':
+        return parameters.get('shock_magnitude')
+    if stress_type == 'Scenario':
+        return parameters.get('scenario_severity_factor')
+    if stress_type == 'Firm-Wide':
+        return parameters.get('systemic_crisis_scale')
+    raise Exception("Invalid stress type.")
+
+def _firm_base_series(data):
+    """Returns base revenue and costs as arrays, summed per date for panels, and the entity count."""
+    if 'Entity' not in data.columns:
+        return data['Base_Revenue'].to_numpy(dtype=float), data['Base_Costs'].to_numpy(dtype=float), 1
+    if 'Date' not in data.columns:
+        raise KeyError("Required column 'Date' is missing.")
+    firm = data.groupby('Date', sort=True)[['Base_Revenue', 'Base_Costs']].sum()
+    return firm['Base_Revenue'].to_numpy(dtype=float), firm['Base_Costs'].to_numpy(dtype=float), data['Entity'].nunique()
+
+def _block_bootstrap_indices(rng, n_obs, n_paths, horizon, block_size):
+    """Draws moving-block bootstrap row indices of shape (n_paths, horizon)."""
+    block_size = max(1, min(block_size, n_obs))
+    n_blocks = -(-horizon // block_size)
+    starts = rng.integers(0, n_obs - block_size + 1, size=(n_paths, n_blocks))
+    indices = starts[:, :, None] + np.arange(block_size)
+    return indices.reshape(n_paths, -1)[:, :horizon]
+
+def simulate_stress_monte_carlo(data, stress_type, parameters, n_paths=1000, horizon=None,
+                                block_size=5, chunk_size=5000, seed=None, progress=None):
+    """Runs a stochastic stress test over block-bootstrapped revenue and cost paths.
+
+    `Base_Revenue` and `Base_Costs` are resampled jointly in contiguous blocks, which
+    preserves their autocorrelation and their co-movement. The selected stress is
+    applied on top of every path and the paths are scored with the batched risk
+    capacity logic, `chunk_size` paths at a time so memory stays bounded.
+
+    Panels are simulated at the firm level: blocks of dates are drawn once and applied to
+    every entity, so no block crosses an entity boundary and the co-movement between
+    entities is kept. The summed paths are scored against the summed buffers, as in
+    `calculate_portfolio_risk_metrics`.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        stress_type (str): Type of stress test ('Sensitivity', 'Scenario', 'Firm-Wide').
+        parameters (dict): Dictionary of parameters specific to the stress type.
+        n_paths (int, optional): Number of simulated paths. Default is 1000.
+        horizon (int, optional): Days per path. Defaults to the number of dates in `data`.
+        block_size (int, optional): Length of the resampled blocks in days. Default is 5.
+        chunk_size (int, optional): Paths simulated per batch. Default is 5000.
+        seed (int, optional): Seed for reproducible results (for a given `chunk_size`).
+        progress (callable, optional): Called as `progress(fraction, message)` after each chunk,
+                                       e.g. a background job's `report`.
+
+    Returns:
+        pd.DataFrame: One row of risk capacity metrics per simulated path.
+
+    Raises:
+        KeyError: If a required parameter or column is missing for the specified stress type.
+        ValueError: If the data is empty or `n_paths`/`horizon`/`chunk_size` is not positive.
+        Exception: If an invalid stress type is provided.
+    """
+    base_columns = ['Base_Revenue', 'Base_Costs']
+    for col in base_columns:
+        if col not in data.columns:
+            raise KeyError(f"Required column '{col}' is missing.")
+    if data.empty:
+        raise ValueError("Input DataFrame cannot be empty.")
+
+    base_revenue, base_costs, n_entities = _firm_base_series(data)
+    horizon = len(base_revenue) if horizon is None else int(horizon)
+    if n_paths <= 0 or horizon <= 0 or chunk_size <= 0:
+        raise ValueError("n_paths, horizon and chunk_size must be positive.")
+
+    factors = stress_factors(stress_type, stress_value(stress_type, parameters), base_columns,
+                              parameters.get('parameter_to_shock'))[0]
+
+    chunk_starts = range(0, n_paths, chunk_size)
+    generators = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(len(chunk_starts))]
+    results = {}
+    for start, rng in zip(chunk_starts, generators):
+        indices = _block_bootstrap_indices(rng, len(base_revenue), min(chunk_size, n_paths - start), horizon,
+                                           block_size)
+        revenue_paths = base_revenue[indices]
+        cost_paths = base_costs[indices]
+        chunk_metrics = calculate_risk_capacity_metrics_batch(
+            revenue_paths, cost_paths, revenue_paths * factors[0], cost_paths * factors[1],
+            INITIAL_CAPITAL_VALUE * n_entities, INITIAL_LIQUIDITY_VALUE * n_entities
+        )
+        for name, values in chunk_metrics.items():
+            results.setdefault(name, []).append(values)
+        if progress is not None:
+            done = min(start + chunk_size, n_paths)
+            progress(done / n_paths, f"{done:,} of {n_paths:,} paths")
+
+    return pd.DataFrame({name: np.concatenate(values) for name, values in results.items()})
+
+def simulate_correlated_shocks(data, correlation, volatilities, mean_shocks=0.0, n_paths=10000,
+                               chunk_size=10000, seed=None,
+                               quantiles=(0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99), progress=None):
+    """Simulates correlated multi-factor shocks and summarises the risk metrics as quantiles.
+
+    Each `Base*` column is its own factor. Per path, a shock vector is drawn from a
+    multivariate normal with the given correlation matrix and volatilities (via its
+    Cholesky factor) and applied like the deterministic stresses:
+    `Adjusted = Base x (1 - shock)`. Panels are scored at the firm level, with the
+    impacts summed per date against the summed buffers.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        correlation (array-like): Factor correlation matrix, shape (n_components, n_components),
+                                  ordered like the `Base*` columns of `data`.
+        volatilities (array-like): Shock standard deviation per factor (scalar or length n_components).
+        mean_shocks (array-like, optional): Expected shock per factor. Default is 0.0.
+        n_paths (int, optional): Number of simulated paths. Default is 10000.
+        chunk_size (int, optional): Paths simulated per batch. Default is 10000.
+        seed (int, optional): Seed for reproducible results (for a given `chunk_size`).
+        quantiles (tuple, optional): Quantiles of the metric distributions to report.
+        progress (callable, optional): Called as `progress(fraction, message)` after each chunk.
+
+    Returns:
+        pd.DataFrame: Risk capacity metrics (columns) at each requested quantile (index).
+
+    Raises:
+        KeyError: If 'Base_Revenue' or 'Base_Costs' is missing.
+        ValueError: If the correlation matrix is malformed or not positive definite.
+    """
+    base_columns = [col for col in data.columns if 'Base' in col]
+    for col in ['Base_Revenue', 'Base_Costs']:
+        if col not in base_columns:
+            raise KeyError(f"Required column '{col}' is missing.")
+    if n_paths <= 0 or chunk_size <= 0:
+        raise ValueError("n_paths and chunk_size must be positive.")
+
+    n_components = len(base_columns)
+    correlation = np.asarray(correlation, dtype=float)
+    if correlation.shape != (n_components, n_components):
+        raise ValueError(f"Correlation matrix must be {n_components}x{n_components} to match {base_columns}.")
+    if not np.allclose(correlation, correlation.T) or not np.allclose(np.diag(correlation), 1):
+        raise ValueError("Correlation matrix must be symmetric with a unit diagonal.")
+    try:
+        cholesky = np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        raise ValueError("Correlation matrix must be positive definite.")
+    scale = np.broadcast_to(np.asarray(volatilities, dtype=float), (n_components,))[:, None] * cholesky
+    mean_shocks = np.broadcast_to(np.asarray(mean_shocks, dtype=float), (n_components,))
+
+    revenue_col, cost_col = base_columns.index('Base_Revenue'), base_columns.index('Base_Costs')
+    base_revenue, base_costs, n_entities = _firm_base_series(data)
+
+    chunk_starts = range(0, n_paths, chunk_size)
+    generators = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(len(chunk_starts))]
+    results = {}
+    for start, rng in zip(chunk_starts, generators):
+        normals = rng.standard_normal((min(chunk_size, n_paths - start), n_components))
+        factors = 1 - (mean_shocks + normals @ scale.T)
+        chunk_metrics = calculate_risk_capacity_metrics_batch(
+            base_revenue, base_costs,
+            base_revenue * factors[:, revenue_col, None], base_costs * factors[:, cost_col, None],
+            INITIAL_CAPITAL_VALUE * n_entities, INITIAL_LIQUIDITY_VALUE * n_entities
+        )
+        for name, values in chunk_metrics.items():
+            results.setdefault(name, []).append(values)
+        if progress is not None:
+            done = min(start + chunk_size, n_paths)
+            progress(done / n_paths, f"{done:,} of {n_paths:,} paths")
+
+    path_metrics = pd.DataFrame({name: np.concatenate(values) for name, values in results.items()})
+    return path_metrics.quantile(list(quantiles))
+
+_batch_worker_shm = None
+_batch_worker_data = None
+
+def _share_frame(data):
+    """Copies the NumPy-backed numeric and datetime columns and 'Entity' of `data` into one shared memory block.
+
+    Timezone-aware dates are stored as UTC and localized back on attach. Columns of any
+    other dtype (strings, nullable extension types) have no fixed-width buffer, so they
+    are pickled into the spec instead and copied once to every worker.
+
+    Returns:
+        tuple: (SharedMemory owned by the caller, picklable spec for `_attach_frame`).
+    """
+    arrays, extras, pickled = {}, {}, []
+    for col in data.columns:
+        dtype = data[col].dtype
+        if isinstance(dtype, pd.DatetimeTZDtype):
+            arrays[col] = np.ascontiguousarray(data[col].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy())
+            extras[col] = ('tz', dtype.tz)
+        elif isinstance(dtype, np.dtype) and dtype.kind in 'biufM':
+            arrays[col] = np.ascontiguousarray(data[col].to_numpy())
+        elif col == 'Entity':
+            # Entity labels travel as integer codes; the (small) label list goes in the spec
+            entity = data[col].astype('category')
+            arrays[col] = np.ascontiguousarray(entity.cat.codes.to_numpy())
+            extras[col] = ('categories', entity.cat.categories.tolist())
+        else:
+            pickled.append(col)
+    shm = SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays.values())))
+    layout, offset = [], 0
+    for col, array in arrays.items():
+        np.ndarray(array.shape, array.dtype, buffer=shm.buf, offset=offset)[:] = array
+        layout.append((col, array.dtype.str, offset, extras.get(col)))
+        offset += array.nbytes
+    pickled_columns = data[pickled].reset_index(drop=True) if pickled else None
+    return shm, (shm.name, len(data), layout, pickled_columns, list(data.columns))
+
+def _attach_frame(spec):
+    """Rebuilds a read-only DataFrame view over a block created by `_share_frame`."""
+    name, n_rows, layout, pickled_columns, column_order = spec
+    shm = SharedMemory(name=name)
+    columns = {}
+    for col, dtype, offset, extra in layout:
+        array = np.ndarray((n_rows,), np.dtype(dtype), buffer=shm.buf, offset=offset)
+        array.flags.writeable = False
+        if extra is None:
+            columns[col] = array
+        elif extra[0] == 'categories':
+            columns[col] = pd.Categorical.from_codes(array, extra[1])
+        else:
+            columns[col] = pd.DatetimeIndex(array).tz_localize('UTC').tz_convert(extra[1])
+    if pickled_columns is not None:
+        columns.update(pickled_columns.items())
+    return shm, pd.DataFrame({col: columns[col] for col in column_order}, copy=False)
+
+def _init_batch_worker(spec):
+    global _batch_worker_shm, _batch_worker_data
+    _batch_worker_shm, _batch_worker_data = _attach_frame(spec)
+
+def _run_batch_scenario(task, data=None, series_dir=None):
+    index, (stress_type, parameters) = task
+    data = _batch_worker_data if data is None else data
+    if series_dir is None:
+        # Metrics alone need neither a copy of the base data nor stored metric columns
+        return calculate_risk_capacity_metrics_lean(data, simulate_stress_impact(data, stress_type, parameters, lean=True))
+    stressed_data = simulate_stress_impact(data, stress_type, parameters)
+    metrics, augmented_data = calculate_risk_capacity_metrics(stressed_data)
+    augmented_data.to_parquet(os.path.join(series_dir, batch_series_filename(index)), index=False)
+    return metrics
+
+def _collect_batch(results, n_scenarios, progress=None):
+    if progress is None:
+        return list(results)
+    collected = []
+    for metrics in results:
+        collected.append(metrics)
+        progress(len(collected) / n_scenarios, f"{len(collected):,} of {n_scenarios:,} scenarios")
+    return collected
+
+def batch_series_filename(index):
+    """Returns the file name `run_scenario_batch` uses for the stressed series of scenario `index`."""
+    return f"scenario_{index:05d}.parquet"
+
+def run_scenario_batch(data, scenarios, max_workers=None, min_parallel_scenarios=64, series_dir=None,
+                       progress=None):
+    """Runs many stress scenarios and returns their risk capacity metrics in order.
+
+    Large batches are spread across a `ProcessPoolExecutor`. The base data is placed
+    in shared memory once and every worker attaches to it on start-up, so each task
+    only pickles its (stress_type, parameters) pair and its metrics dict. Batches
+    smaller than `min_parallel_scenarios`, or runs with a single worker, execute
+    serially because starting the pool would cost more than it saves.
+
+    Args:
+        data (pd.DataFrame): The base financial data.
+        scenarios (list): (stress_type, parameters) pairs as accepted by `simulate_stress_impact`.
+        max_workers (int, optional): Worker processes. Defaults to the CPU count.
+        min_parallel_scenarios (int, optional): Smallest batch run in parallel. Default is 64.
+        series_dir (str, optional): If given, each scenario's stressed and augmented series is
+                                    written there as Parquet, named by `batch_series_filename`.
+        progress (callable, optional): Called as `progress(fraction, message)` as scenarios complete.
+                                       If it raises, scenarios not yet started are cancelled.
+
+    Returns:
+        list: One metrics dict per scenario, as returned by `calculate_risk_capacity_metrics`.
+
+    Raises:
+        KeyError: If a required parameter or column is missing for a scenario.
+        Exception: If a scenario has an invalid stress type.
+    """
+    tasks = [(index, tuple(scenario)) for index, scenario in enumerate(scenarios)]
+    if series_dir is not None:
+        os.makedirs(series_dir, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) < min_parallel_scenarios:
+        results = (_run_batch_scenario(task, data, series_dir) for task in tasks)
+        return _collect_batch(results, len(tasks), progress)
+
+    shm, spec = _share_frame(data)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker,
+                                 initargs=(spec,)) as executor:
+            chunksize = max(1, len(tasks) // (max_workers * 4))
+            results = executor.map(partial(_run_batch_scenario, series_dir=series_dir), tasks,
+                                   chunksize=chunksize)
+            try:
+                return _collect_batch(results, len(tasks), progress)
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+    finally:
+        shm.close()
+        shm.unlink()
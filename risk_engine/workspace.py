@@ -0,0 +1,272 @@
+"""Workspace of completed stress runs, indexed by scenario hash for side-by-side comparison."""
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+import numpy as np
+
+from risk_engine.analytics import downsample_minmax
+from risk_engine.metrics import INITIAL_CAPITAL_VALUE, INITIAL_LIQUIDITY_VALUE, calculate_risk_capacity_metrics_lean
+from risk_engine.stress import _normalize_parameters
+
+WORKSPACE_MAX_SCENARIOS = int(os.environ.get('QULAB_WORKSPACE_SCENARIOS', 200))
+WORKSPACE_SERIES_POINTS = int(os.environ.get('QULAB_WORKSPACE_SERIES_POINTS', 1000))
+WORKSPACE_SERIES_COLUMNS = ['Net_Earnings_Under_Stress', 'Capital_Remaining', 'Liquidity_Position']
+WORKSPACE_METRICS = ['Initial_Capital', 'Minimum_Capital_Remaining', 'Capital_Drawdown',
+                     'Capital_Drawdown_Percentage', 'Minimum_Liquidity_Position', 'Liquidity_Shortfall']
+WORKSPACE_LABEL_LENGTH = 60
+
+def scenario_hash(base_fingerprint, stress_type, parameters):
+    """Returns a short hex digest identifying a stress run by its data, stress type and parameters.
+
+    Parameters are normalized as for the stress cache, so 10 and 10.0 give the same hash.
+
+    Args:
+        base_fingerprint (str): Fingerprint of the base data, as returned by `dataset_fingerprint`.
+        stress_type (str): Type of stress test.
+        parameters (dict): Parameters of the stress test.
+
+    Returns:
+        str: 16-character hex digest.
+    """
+    key = repr((base_fingerprint, stress_type, _normalize_parameters(parameters)))
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+def scenario_label(stress_type, parameters):
+    """Returns a short human readable description of a stress run, e.g. 'Scenario (scenario_severity_factor=0.3)'.
+
+    Numeric settings are shown as name=value and any other setting (a shocked column, a
+    schedule) by its value alone, keeping labels short enough to tell runs apart.
+    """
+    settings = ', '.join(f"{name}={value:g}" if isinstance(value, (int, float)) and not isinstance(value, bool)
+                         else str(value) for name, value in sorted(parameters.items()))
+    label = f"{stress_type} ({settings})" if settings else stress_type
+    if len(label) > WORKSPACE_LABEL_LENGTH:
+        label = label[:WORKSPACE_LABEL_LENGTH - 3] + '...'
+    return label
+
+def summarize_run(base_data, adjustments, initial_capital_value=INITIAL_CAPITAL_VALUE,
+                  initial_liquidity_value=INITIAL_LIQUIDITY_VALUE, max_points=WORKSPACE_SERIES_POINTS):
+    """Reduces a stress run to its risk capacity metrics and a compact form of its firm-level paths.
+
+    The paths are min/max downsampled on a shared set of positions and stored as float32
+    columns, so a run takes a few tens of kilobytes however long its data is. Panels are
+    rolled up to the firm level, with the per-entity buffers summed, as in
+    `calculate_portfolio_risk_metrics`.
+
+    Args:
+        base_data (pd.DataFrame): The base financial data with 'Base_Revenue' and 'Base_Costs'.
+        adjustments (pd.DataFrame): Output of `simulate_stress_impact(..., lean=True)`.
+        initial_capital_value (float, optional): Starting capital (per entity for panels). Default is 1000.
+        initial_liquidity_value (float, optional): Starting liquidity (per entity for panels). Default is 500.
+        max_points (int, optional): Approximate points kept per path. Defaults to env
+                                    `QULAB_WORKSPACE_SERIES_POINTS` (1000).
+
+    Returns:
+        tuple: (metrics dict as returned by `calculate_risk_capacity_metrics_lean`, dict of NumPy arrays
+               with 'Date' and one float32 array per name in `WORKSPACE_SERIES_COLUMNS`).
+
+    Raises:
+        Exception: If the input DataFrame is empty.
+        KeyError: If 'Base_Revenue' or 'Base_Costs' is missing.
+    """
+    metrics = calculate_risk_capacity_metrics_lean(base_data, adjustments, initial_capital_value,
+                                                   initial_liquidity_value)
+    frame = pd.DataFrame({
+        'Base_Revenue': base_data['Base_Revenue'],
+        'Base_Costs': base_data['Base_Costs'],
+        'Adjusted_Revenue': adjustments['Adjusted_Revenue'] if 'Adjusted_Revenue' in adjustments.columns
+                            else base_data['Base_Revenue'],
+        'Adjusted_Costs': adjustments['Adjusted_Costs'] if 'Adjusted_Costs' in adjustments.columns
+                          else base_data['Base_Costs'],
+    }, index=base_data.index, copy=False)
+    n_entities = 1
+    if 'Entity' in base_data.columns:
+        n_entities = base_data['Entity'].nunique()
+        frame = frame.groupby(base_data['Date'], sort=True).sum()
+        dates = frame.index.to_numpy()
+    elif 'Date' in base_data.columns:
+        dates = base_data['Date'].to_numpy()
+    else:
+        dates = np.arange(len(frame))
+
+    revenue_loss = frame['Base_Revenue'].to_numpy(dtype=float) - frame['Adjusted_Revenue'].to_numpy(dtype=float)
+    cost_increase = frame['Adjusted_Costs'].to_numpy(dtype=float) - frame['Base_Costs'].to_numpy(dtype=float)
+    paths = {
+        'Net_Earnings_Under_Stress': (frame['Adjusted_Revenue'] - frame['Adjusted_Costs']).to_numpy(dtype=float),
+        'Capital_Remaining': initial_capital_value * n_entities - np.cumsum(revenue_loss + cost_increase),
+        'Liquidity_Position': initial_liquidity_value * n_entities - np.cumsum(revenue_loss * 0.5),
+    }
+    # One set of positions keeps the columns aligned; each path contributes its own peaks and troughs
+    positions = np.unique(np.concatenate([downsample_minmax(values, max_points) for values in paths.values()]))
+    series = {'Date': dates[positions]}
+    series.update({col: paths[col][positions].astype(np.float32) for col in WORKSPACE_SERIES_COLUMNS})
+    return metrics, series
+
+class ScenarioWorkspace:
+    """Completed stress runs kept side by side, indexed by scenario hash.
+
+    Each run holds its metrics dict and the compact paths from `summarize_run`, never the
+    stressed frames, so dozens of runs fit in a few megabytes. Ranking and filtering read
+    a small index frame with one row per run, which is rebuilt only when runs are added or
+    removed. Re-adding a run with the same hash replaces it; beyond `max_scenarios` runs
+    the oldest are dropped.
+
+    Args:
+        max_scenarios (int, optional): Runs kept. Defaults to env `QULAB_WORKSPACE_SCENARIOS` (200).
+    """
+
+    def __init__(self, max_scenarios=WORKSPACE_MAX_SCENARIOS):
+        self.max_scenarios = max_scenarios
+        self._records = {}
+        self._series = {}
+        self._index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def add(self, base_fingerprint, stress_type, parameters, metrics, series, label=None):
+        """Adds a completed run, replacing any earlier run with the same scenario hash.
+
+        Args:
+            base_fingerprint (str): Fingerprint of the base data the run stressed.
+            stress_type (str): Type of stress test.
+            parameters (dict): Parameters of the stress test.
+            metrics (dict): Risk capacity metrics of the run.
+            series (dict): Compact paths, as returned by `summarize_run`.
+            label (str, optional): Display name. Defaults to `scenario_label(stress_type, parameters)`.
+
+        Returns:
+            str: The run's scenario hash.
+        """
+        key = scenario_hash(base_fingerprint, stress_type, parameters)
+        record = {
+            'Label': scenario_label(stress_type, parameters) if label is None else label,
+            'Stress_Type': stress_type,
+            'Base_Fingerprint': base_fingerprint,
+            'Added_At': pd.Timestamp(time.time(), unit='s'),
+            **{name: float(metrics[name]) for name in WORKSPACE_METRICS if name in metrics},
+        }
+        with self._lock:
+            # Re-insert so dict order stays oldest first
+            self._records.pop(key, None)
+            self._records[key] = {'record': record, 'parameters': dict(parameters)}
+            self._series[key] = series
+            while len(self._records) > self.max_scenarios:
+                oldest = next(iter(self._records))
+                del self._records[oldest], self._series[oldest]
+            self._index = None
+        return key
+
+    def remove(self, keys):
+        """Drops the runs with the given scenario hashes; unknown hashes are ignored."""
+        with self._lock:
+            for key in keys:
+                self._records.pop(key, None)
+                self._series.pop(key, None)
+            self._index = None
+
+    def clear(self):
+        """Drops every run."""
+        with self._lock:
+            self._records.clear()
+            self._series.clear()
+            self._index = None
+
+    def parameters(self, key):
+        """Returns the stress parameters of run `key`.
+
+        Raises:
+            KeyError: If the run is not in the workspace.
+        """
+        with self._lock:
+            if key not in self._records:
+                raise KeyError(f"Scenario '{key}' is not in the workspace.")
+            return dict(self._records[key]['parameters'])
+
+    def index(self, base_fingerprint=None):
+        """Returns one row per run, oldest first, with its labels and metrics.
+
+        Args:
+            base_fingerprint (str, optional): Only return runs on this base data.
+
+        Returns:
+            pd.DataFrame: Indexed by 'Scenario' hash with 'Label', 'Stress_Type', 'Base_Fingerprint',
+                          'Added_At' and one column per name in `WORKSPACE_METRICS`. Treat as read-only.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = pd.DataFrame.from_dict(
+                    {key: entry['record'] for key, entry in self._records.items()}, orient='index',
+                    columns=['Label', 'Stress_Type', 'Base_Fingerprint', 'Added_At'] + WORKSPACE_METRICS,
+                )
+                self._index.index.name = 'Scenario'
+            index = self._index
+        if base_fingerprint is not None:
+            index = index[index['Base_Fingerprint'] == base_fingerprint]
+        return index
+
+    def query(self, filters=None, sort_by=None, ascending=True, limit=None, base_fingerprint=None):
+        """Filters and ranks runs by their metrics without touching any stressed data.
+
+        Args:
+            filters (dict, optional): Metric name -> (low, high) inclusive bounds; either bound may be None.
+            sort_by (str, optional): Index column to rank by.
+            ascending (bool, optional): Sort order. Default is True.
+            limit (int, optional): Keep only the first `limit` runs after sorting.
+            base_fingerprint (str, optional): Only consider runs on this base data.
+
+        Returns:
+            pd.DataFrame: Matching rows of `index`.
+
+        Raises:
+            KeyError: If a filter or sort column is not in the index.
+        """
+        index = self.index(base_fingerprint)
+        mask = np.ones(len(index), dtype=bool)
+        for name, (low, high) in (filters or {}).items():
+            if name not in index.columns:
+                raise KeyError(f"Unknown workspace column '{name}'.")
+            values = index[name].to_numpy()
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        selected = index[mask]
+        if sort_by is not None:
+            if sort_by not in index.columns:
+                raise KeyError(f"Unknown workspace column '{sort_by}'.")
+            selected = selected.sort_values(sort_by, ascending=ascending, kind='stable')
+        return selected if limit is None else selected.head(limit)
+
+    def series(self, keys, column):
+        """Returns one compact path per run for overlaying.
+
+        Args:
+            keys (list): Scenario hashes, e.g. the index of a `query` result.
+            column (str): Name from `WORKSPACE_SERIES_COLUMNS`.
+
+        Returns:
+            dict: Scenario hash -> (dates, float32 values), in the order of `keys`.
+
+        Raises:
+            KeyError: If a run is not in the workspace or `column` is unknown.
+        """
+        if column not in WORKSPACE_SERIES_COLUMNS:
+            raise KeyError(f"Unknown workspace series '{column}'.")
+        with self._lock:
+            missing = [key for key in keys if key not in self._series]
+            if missing:
+                raise KeyError(f"Scenarios not in the workspace: {missing}")
+            return {key: (self._series[key]['Date'], self._series[key][column]) for key in keys}
+
+    def nbytes(self):
+        """Returns the approximate memory held by the compact paths."""
+        with self._lock:
+            return sum(array.nbytes for series in self._series.values() for array in series.values())
@@ -0,0 +1,95 @@
+"""Tests for the plot-ready analytics caches."""
+import numpy as np
+import pytest
+
+from risk_engine import generate_synthetic_data, simulate_stress_impact, stressed_view
+from risk_engine import analytics as analytics_module
+from risk_engine.analytics import (
+    AGGREGATION_FUNCTIONS,
+    AGGREGATION_PERIODS,
+    aggregate_by_period,
+    correlation_from_stats,
+    correlation_stats_for,
+    downsample_minmax,
+    init_correlation_stats,
+    regression_from_stats,
+    update_correlation_stats,
+)
+from risk_engine.caching import LRUCache
+
+
+@pytest.fixture
+def fingerprinted_data():
+    data = generate_synthetic_data(400)
+    data.attrs['fingerprint'] = 'base'
+    return data
+
+
+@pytest.mark.parametrize('lean', [True, False])
+def test_aggregates_follow_the_stress_applied_to_the_same_base(fingerprinted_data, lean):
+    cache = LRUCache(max_bytes=64 * 1024 ** 2)
+    totals = []
+    for severity in [0.1, 0.9]:
+        stressed = simulate_stress_impact(fingerprinted_data, 'Scenario', {'scenario_severity_factor': severity}, lean=lean)
+        view = stressed_view(fingerprinted_data, stressed) if lean else stressed
+        aggregated = aggregate_by_period(view, 'Monthly', cache=cache)
+        assert aggregated[('Adjusted_Revenue', 'sum')].sum() == pytest.approx(view['Adjusted_Revenue'].sum())
+        totals.append(aggregated[('Adjusted_Revenue', 'sum')].sum())
+    assert totals[0] != pytest.approx(totals[1])
+    assert fingerprinted_data.attrs['fingerprint'] == 'base'
+
+
+@pytest.mark.parametrize('n, max_points', [(10, 20), (1000, 50), (1001, 64)])
+def test_downsampling_keeps_bucket_extremes_and_endpoints(n, max_points):
+    values = np.sin(np.arange(n) / 7.0) + np.random.RandomState(0).normal(0, 0.1, n)
+    positions = downsample_minmax(values, max_points)
+    assert positions[0] == 0 and positions[-1] == n - 1 and np.all(np.diff(positions) > 0)
+    if n <= max_points:
+        assert len(positions) == n
+        return
+    assert len(positions) <= max_points + 2
+    bucket_size = -(-n // (max_points // 2))
+    for start in range(0, n, bucket_size):
+        bucket = values[start:start + bucket_size]
+        assert start + bucket.argmin() in positions and start + bucket.argmax() in positions
+
+
+@pytest.mark.parametrize('period', list(AGGREGATION_PERIODS))
+def test_aggregates_match_a_direct_resample(fingerprinted_data, period):
+    aggregated = aggregate_by_period(fingerprinted_data, period, cache=LRUCache())
+    resampled = fingerprinted_data.set_index('Date').resample(AGGREGATION_PERIODS[period][0])
+    for column in ['Base_Revenue', 'Base_Costs']:
+        for function in AGGREGATION_FUNCTIONS:
+            assert aggregated[(column, function)].to_numpy() == pytest.approx(
+                resampled[column].agg(function).to_numpy())
+    assert aggregated[('Base_Revenue', 'sum')].sum() == pytest.approx(fingerprinted_data['Base_Revenue'].sum())
+
+
+def test_streamed_correlations_match_dataframe_corr(fingerprinted_data, monkeypatch):
+    data = simulate_stress_impact(fingerprinted_data, 'Scenario', {'scenario_severity_factor': 0.3})
+    columns = data.select_dtypes(include=['number']).columns.tolist()
+    expected = data[columns].corr()
+
+    stats = init_correlation_stats(columns)
+    for start in range(0, len(data), 37):
+        stats = update_correlation_stats(stats, data.iloc[start:start + 37])
+    assert stats['Count'] == len(data)
+    assert correlation_from_stats(stats).to_numpy() == pytest.approx(expected.to_numpy(), abs=1e-12)
+
+    monkeypatch.setattr(analytics_module, 'CORRELATION_BLOCK_ROWS', 64)
+    cached = correlation_stats_for(data, columns, 'stressed', cache=LRUCache())
+    assert correlation_from_stats(cached).to_numpy() == pytest.approx(expected.to_numpy(), abs=1e-12)
+    assert cached['Minimum'] == pytest.approx(data[columns].min().to_numpy())
+
+
+def test_closed_form_regression_matches_polyfit(fingerprinted_data):
+    columns = ['Base_Revenue', 'Base_Costs']
+    stats = correlation_stats_for(fingerprinted_data, columns, 'base', cache=LRUCache())
+    fit = regression_from_stats(stats, 'Base_Revenue', 'Base_Costs')
+    slope, intercept = np.polyfit(fingerprinted_data['Base_Revenue'], fingerprinted_data['Base_Costs'], 1)
+    assert (fit['Slope'], fit['Intercept']) == pytest.approx((slope, intercept), rel=1e-9)
+    assert fit['Correlation'] == pytest.approx(fingerprinted_data['Base_Revenue'].corr(fingerprinted_data['Base_Costs']))
+
+    constant = init_correlation_stats(columns)
+    constant = update_correlation_stats(constant, fingerprinted_data.assign(Base_Revenue=100.0))
+    assert np.isnan(regression_from_stats(constant, 'Base_Revenue', 'Base_Costs')['Slope'])
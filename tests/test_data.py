@@ -0,0 +1,82 @@
+"""Tests for data loading and the on-disk Arrow cache."""
+import io
+
+import numpy as np
+import pytest
+
+from risk_engine import data as data_module
+from risk_engine import generate_synthetic_data, load_and_validate_data
+from risk_engine.analytics import aggregate_by_period
+from risk_engine.caching import LRUCache
+from risk_engine.data import dataset_cache_key
+from risk_engine.store import DatasetStore, load_shared_dataset
+
+
+def _write_csv(tmp_path, name='data.csv', seed=42):
+    path = tmp_path / name
+    generate_synthetic_data(50, seed=seed).to_csv(path, index=False)
+    return str(path)
+
+
+def test_arrow_cache_keeps_streamed_and_default_dtypes_apart(tmp_path):
+    path, cache_dir = _write_csv(tmp_path), str(tmp_path / 'cache')
+    for _ in range(2):  # The second pass reads every variant back from the Arrow cache
+        streamed = load_and_validate_data(path, chunksize=20, float_dtype='float32', cache_dir=cache_dir)
+        default = load_and_validate_data(path, cache_dir=cache_dir)
+        assert streamed['Base_Revenue'].dtype == np.float32
+        assert default['Base_Revenue'].dtype == np.float64
+
+
+
+@pytest.mark.parametrize('chunksize', [None, 2])
+def test_duplicates_are_found_on_parsed_dates(tmp_path, chunksize):
+    path = tmp_path / 'duplicates.csv'
+    path.write_text("Date,Base_Revenue,Base_Costs\n2024-01-01,100,60\n2024-1-1,110,65\n2024-01-02,105,62\n")
+    with pytest.raises(ValueError, match="Duplicate dates"):
+        load_and_validate_data(str(path), chunksize=chunksize)
+
+class _Upload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile, which carries a per-upload `file_id`."""
+
+    def __init__(self, content, file_id):
+        super().__init__(content)
+        self.file_id, self.size, self.name = file_id, len(content), 'upload.csv'
+
+
+def test_upload_is_hashed_once_across_reruns(tmp_path, monkeypatch):
+    calls = []
+    hash_file = data_module._hash_file
+    monkeypatch.setattr(data_module, '_hash_file', lambda *args: calls.append(1) or hash_file(*args))
+    content = open(_write_csv(tmp_path), 'rb').read()
+    upload = _Upload(content, 'upload-1')
+    keys = {dataset_cache_key(upload) for _ in range(3)}
+    assert len(keys) == 1 and len(calls) == 1
+    assert dataset_cache_key(_Upload(content, 'upload-2')) == keys.pop()
+
+
+def test_path_hash_follows_file_changes(tmp_path):
+    path = _write_csv(tmp_path)
+    before = dataset_cache_key(path)
+    assert dataset_cache_key(path) == before
+    generate_synthetic_data(60).to_csv(path, index=False)
+    assert dataset_cache_key(path) != before
+
+
+def test_cache_key_records_produced_dtype(tmp_path):
+    path = _write_csv(tmp_path)
+    # float_dtype only applies to streamed loads, so an unstreamed float32 request is the float64 dataset
+    assert dataset_cache_key(path, float_dtype='float32') == dataset_cache_key(path)
+    assert dataset_cache_key(path, float_dtype='float32', chunksize=10) != dataset_cache_key(path)
+    assert dataset_cache_key(path, float_dtype='float64', chunksize=10) == dataset_cache_key(path)
+
+def test_caches_separate_datasets(tmp_path):
+    store, analytics_cache, cache_dir = DatasetStore(), LRUCache(), str(tmp_path / 'cache')
+    paths = [_write_csv(tmp_path, 'first.csv', seed=1), _write_csv(tmp_path, 'second.csv', seed=2)]
+    loaded = [load_shared_dataset(path, cache_dir=cache_dir, store=store)[1] for path in paths]
+    assert loaded[0].attrs['fingerprint'] != loaded[1].attrs['fingerprint']
+    totals = []
+    for path, data in zip(paths, loaded):
+        assert data['Base_Revenue'].sum() == load_and_validate_data(path)['Base_Revenue'].sum()
+        totals.append(aggregate_by_period(data, 'Monthly', cache=analytics_cache)[('Base_Revenue', 'sum')].sum())
+    assert totals == pytest.approx([data['Base_Revenue'].sum() for data in loaded])
+    assert load_shared_dataset(paths[0], cache_dir=cache_dir, store=store)[1] is loaded[0]
@@ -0,0 +1,93 @@
+"""Tests for the background job runner."""
+import threading
+import time
+
+import pytest
+
+from risk_engine.jobs import JobCancelled, JobRunner
+
+TIMEOUT = 5.0
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(max_workers=1)
+    yield runner
+    runner.shutdown()
+
+
+def _wait_until(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting for the job."
+        time.sleep(0.005)
+
+
+def test_progress_is_reported_and_result_kept(runner):
+    reached, resume = threading.Event(), threading.Event()
+
+    def work(n, progress):
+        progress(0.5, 'halfway')
+        reached.set()
+        resume.wait(TIMEOUT)
+        return n * 2
+
+    job = runner.submit(work, 21, label='double', owner='s1')
+    reached.wait(TIMEOUT)
+    assert (job.status, job.progress, job.message) == ('running', 0.5, 'halfway')
+    resume.set()
+    _wait_until(lambda: job.done)
+    assert (job.status, job.progress, job.result) == ('done', 1.0, 42)
+    assert runner.get(job.id) is job and runner.jobs_for('s1') == [job] and runner.jobs_for('s2') == []
+
+
+def test_running_job_stops_at_its_next_report(runner):
+    started, steps = threading.Event(), []
+
+    def work(progress):
+        for step in range(1000):
+            progress(step / 1000)
+            steps.append(step)
+            started.set()
+            time.sleep(0.001)
+
+    job = runner.submit(work)
+    started.wait(TIMEOUT)
+    assert runner.cancel(job.id)
+    _wait_until(lambda: job.done)
+    assert job.status == 'cancelled' and len(steps) < 1000 and job.result is None
+
+
+def test_queued_job_never_starts_once_cancelled(runner):
+    release, calls = threading.Event(), []
+    blocker = runner.submit(lambda progress: release.wait(TIMEOUT))
+    queued = runner.submit(lambda progress: calls.append(1))
+    queued.cancel()
+    assert queued.status == 'cancelled'
+    release.set()
+    _wait_until(lambda: blocker.done)
+    runner.shutdown(cancel=False)
+    assert calls == [] and queued.started_at is None and runner.stats()['cancelled'] == 1
+
+
+def test_failures_are_kept_and_finished_jobs_pruned(runner):
+    def work(progress):
+        raise ValueError("bad parameters")
+
+    job = runner.submit(work)
+    _wait_until(lambda: job.done)
+    assert job.status == 'failed' and isinstance(job.error, ValueError)
+    assert not runner.cancel('unknown')
+
+    runner.retention_seconds = 0.0
+    job.finished_at -= 1.0
+    runner.submit(lambda progress: None)
+    assert runner.get(job.id) is None
+
+
+def test_report_raises_once_cancelled(runner):
+    job = runner.submit(lambda progress: None)
+    _wait_until(lambda: job.done)
+    job.cancel()
+    with pytest.raises(JobCancelled):
+        job.report(0.5)
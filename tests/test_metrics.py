@@ -0,0 +1,25 @@
+"""Tests for the risk capacity metrics."""
+import pytest
+
+from risk_engine import (
+    calculate_risk_capacity_metrics,
+    generate_synthetic_data,
+    init_risk_capacity_state,
+    simulate_stress_impact,
+    update_risk_capacity_metrics,
+)
+
+
+def test_incremental_updates_match_full_recompute():
+    stressed = simulate_stress_impact(generate_synthetic_data(1000), 'Scenario', {'scenario_severity_factor': 0.4})
+    state = init_risk_capacity_state()
+    for start in range(0, len(stressed), 137):
+        metrics, _, state = update_risk_capacity_metrics(state, stressed.iloc[start:start + 137])
+    expected, _ = calculate_risk_capacity_metrics(stressed)
+    assert metrics == expected
+
+
+def test_incremental_updates_reject_panels():
+    panel = generate_synthetic_data(10, num_entities=3)
+    with pytest.raises(ValueError):
+        update_risk_capacity_metrics(init_risk_capacity_state(), panel)
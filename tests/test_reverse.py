@@ -0,0 +1,47 @@
+"""Tests for the reverse stress solver."""
+import numpy as np
+import pytest
+
+from risk_engine import (
+    calculate_portfolio_risk_metrics,
+    calculate_risk_capacity_metrics_lean,
+    generate_synthetic_data,
+    simulate_stress_impact,
+    solve_reverse_stress,
+)
+
+TARGETS = [('Capital_Drawdown_Percentage', '>=', 25.0), ('Liquidity_Shortfall', '>', 0.0)]
+
+
+def _firm_metrics(data, severity):
+    adjustments = simulate_stress_impact(data, 'Scenario', {'scenario_severity_factor': severity}, lean=True)
+    return calculate_risk_capacity_metrics_lean(data, adjustments)
+
+
+@pytest.mark.parametrize('num_entities', [None, 3])
+def test_bisection_brackets_the_first_breach(num_entities):
+    data = generate_synthetic_data(40, num_entities=num_entities)
+    tolerance = 1e-6
+    result = solve_reverse_stress(data, 'Scenario', TARGETS, tolerance=tolerance)
+    firm = result[result['Entity'] == 'Firm'].set_index('Metric')
+    assert (result['Status'] == 'Solved').all()
+    for metric, op, threshold in TARGETS:
+        breach = firm.loc[metric, 'Breach_Value']
+        before, at = _firm_metrics(data, breach - tolerance)[metric], _firm_metrics(data, breach)[metric]
+        assert not (before >= threshold if op == '>=' else before > threshold)
+        assert at >= threshold if op == '>=' else at > threshold
+
+
+def test_entity_rows_use_each_entity_buffers():
+    panel = generate_synthetic_data(40, num_entities=3)
+    result = solve_reverse_stress(panel, 'Scenario', TARGETS[:1])
+    for row in result[result['Entity'] != 'Firm'].itertuples():
+        stressed = simulate_stress_impact(panel, 'Scenario', {'scenario_severity_factor': row.Breach_Value})
+        _, entity_metrics, _, _ = calculate_portfolio_risk_metrics(stressed)
+        assert entity_metrics.loc[row.Entity, row.Metric] == pytest.approx(row.Metric_At_Breach)
+        assert row.Metric_At_Breach >= row.Threshold
+
+
+def test_unreachable_targets_are_reported():
+    result = solve_reverse_stress(generate_synthetic_data(20), 'Scenario', [('Capital_Drawdown_Percentage', '>', 1e9)])
+    assert result['Status'].tolist() == ['Not Reached'] and np.isnan(result['Breach_Value']).all()
@@ -0,0 +1,28 @@
+"""Tests for time-varying shock schedules."""
+import pytest
+
+from risk_engine import (
+    calculate_risk_capacity_metrics_lean,
+    decay_schedule,
+    generate_synthetic_data,
+    ramp_schedule,
+    schedule_library_metrics,
+    simulate_stress_impact,
+    step_schedule,
+)
+
+
+def test_library_metrics_match_scoring_each_schedule():
+    data = generate_synthetic_data(90)
+    library = [step_schedule(0.2, start=10), ramp_schedule(0.4, periods=30),
+               decay_schedule(0.5, half_life=15) * step_schedule(0.1)]
+    metrics = schedule_library_metrics(data, library, chunk_size=2)
+    for row, schedule in zip(metrics.itertuples(index=False), library):
+        expected = calculate_risk_capacity_metrics_lean(
+            data, simulate_stress_impact(data, 'Schedule', {'schedule': schedule}, lean=True))
+        assert row._asdict() == pytest.approx(expected)
+
+
+def test_empty_library_is_rejected():
+    with pytest.raises(ValueError, match='schedule library cannot be empty'):
+        schedule_library_metrics(generate_synthetic_data(10), [])
@@ -0,0 +1,78 @@
+"""Tests for the analytic metric sensitivities."""
+import pytest
+
+from risk_engine import (
+    calculate_risk_capacity_metrics_lean,
+    generate_synthetic_data,
+    risk_metric_sensitivities,
+    simulate_stress_impact,
+)
+
+CASES = [
+    ('Sensitivity', {'parameter_to_shock': 'Base_Revenue', 'shock_magnitude': 20.0}, 'shock_magnitude'),
+    ('Scenario', {'scenario_severity_factor': 0.3}, 'scenario_severity_factor'),
+    ('Firm-Wide', {'systemic_crisis_scale': 0.4}, 'systemic_crisis_scale'),
+]
+STEP = 1e-4
+
+
+def _metrics(data, stress_type, parameters, **buffers):
+    adjustments = simulate_stress_impact(data, stress_type, parameters, lean=True)
+    return calculate_risk_capacity_metrics_lean(data, adjustments, **buffers)
+
+
+@pytest.mark.parametrize('num_entities', [None, 3])
+@pytest.mark.parametrize('stress_type, parameters, parameter', CASES)
+def test_gradients_match_finite_differences(num_entities, stress_type, parameters, parameter):
+    data = generate_synthetic_data(60, num_entities=num_entities)
+    adjustments = simulate_stress_impact(data, stress_type, parameters, lean=True)
+    metrics, gradients = risk_metric_sensitivities(data, adjustments, stress_type, parameters)
+    assert metrics == pytest.approx(_metrics(data, stress_type, parameters))
+
+    # One-sided steps towards more stress, matching the documented derivative at kinks
+    bumped = _metrics(data, stress_type, {**parameters, parameter: parameters[parameter] + STEP})
+    for buffer, value in [('initial_capital_value', 1000), ('initial_liquidity_value', 500)]:
+        shifted = _metrics(data, stress_type, parameters, **{buffer: value - STEP})
+        for metric in gradients.index:
+            assert gradients.loc[metric, buffer] == pytest.approx((metrics[metric] - shifted[metric]) / STEP,
+                                                                  rel=1e-4, abs=1e-4)
+    for metric in gradients.index:
+        assert gradients.loc[metric, parameter] == pytest.approx((bumped[metric] - metrics[metric]) / STEP,
+                                                                 rel=1e-4, abs=1e-4)
+
+
+def test_component_shock_gradients_match_finite_differences():
+    data = generate_synthetic_data(60)
+    adjustments = simulate_stress_impact(data, 'Scenario', {'scenario_severity_factor': 0.2}, lean=True)
+    metrics, gradients = risk_metric_sensitivities(data, adjustments)
+    for component in ['Base_Revenue', 'Base_Costs']:
+        # A component shock is an extra uniform reduction: Adjusted -= shock x Base
+        column = component.replace('Base', 'Adjusted')
+        shocked = adjustments.assign(**{column: adjustments[column] - STEP * data[component]})
+        bumped = calculate_risk_capacity_metrics_lean(data, shocked)
+        for metric in gradients.index:
+            assert gradients.loc[metric, f'Shock_{component}'] == pytest.approx(
+                (bumped[metric] - metrics[metric]) / STEP, rel=1e-4, abs=1e-4)
+
+
+@pytest.mark.parametrize('stress_type, parameters, parameter', [
+    ('Scenario', {'scenario_severity_factor': 0.0}, 'scenario_severity_factor'),
+    ('Sensitivity', {'parameter_to_shock': 'Base_Costs', 'shock_magnitude': 20.0}, 'shock_magnitude'),
+])
+def test_gradients_at_tied_peaks(stress_type, parameters, parameter):
+    # Both stresses leave revenue untouched, so every date ties for the liquidity peak
+    data = generate_synthetic_data(60)
+    adjustments = simulate_stress_impact(data, stress_type, parameters, lean=True)
+    metrics, gradients = risk_metric_sensitivities(data, adjustments, stress_type, parameters)
+
+    bumped = _metrics(data, stress_type, {**parameters, parameter: parameters[parameter] + STEP})
+    for metric in gradients.index:
+        assert gradients.loc[metric, parameter] == pytest.approx((bumped[metric] - metrics[metric]) / STEP,
+                                                                 rel=1e-4, abs=1e-4)
+    for component in ['Base_Revenue', 'Base_Costs']:
+        column = component.replace('Base', 'Adjusted')
+        shocked = adjustments.assign(**{column: adjustments[column] - STEP * data[component]})
+        bumped = calculate_risk_capacity_metrics_lean(data, shocked)
+        for metric in gradients.index:
+            assert gradients.loc[metric, f'Shock_{component}'] == pytest.approx(
+                (bumped[metric] - metrics[metric]) / STEP, rel=1e-4, abs=1e-4)
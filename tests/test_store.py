@@ -0,0 +1,105 @@
+"""Tests for the process-wide dataset store."""
+import types
+
+import pandas as pd
+import pytest
+
+from risk_engine import generate_synthetic_data, simulate_stress_impact
+from risk_engine import store as store_module
+from risk_engine.caching import estimate_size
+from risk_engine.store import DatasetStore, load_shared_dataset, stress_shared_dataset
+
+SCENARIO = ('Scenario', {'scenario_severity_factor': 0.3})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the store's monotonic clock with one the test advances by hand."""
+    now = [0.0]
+    monkeypatch.setattr(store_module, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _frame(days=50, seed=42):
+    return generate_synthetic_data(days, seed=seed)
+
+
+def test_sessions_share_one_frame_until_the_last_reference_goes(clock):
+    frame = _frame()
+    store = DatasetStore(max_bytes=estimate_size(frame))
+    built = []
+    create = lambda: built.append(1) or frame
+    first = store.get_or_create('a', create, owner='s1', slot='base')
+    assert store.get_or_create('a', create, owner='s2', slot='base') is first and len(built) == 1
+
+    # Over budget, but both sessions are active, so nothing may be evicted
+    store.get_or_create('b', lambda: _frame(seed=1), owner='s3', slot='base')
+    assert store.stats()['Evictions'] == 0
+    store.unbind('s1', 'base')
+    store.get_or_create('c', lambda: _frame(seed=2))
+    assert store.fetch('s2', 'base') is first
+
+    # Once unreferenced, 'a' is the first frame to go under memory pressure
+    store.unbind('s2', 'base')
+    store.get_or_create('d', lambda: _frame(seed=3))
+    with pytest.raises(KeyError):
+        store.get('a')
+
+
+def test_idle_owners_are_released_after_their_ttl(clock):
+    store = DatasetStore(owner_ttl=60)
+    store.get_or_create('a', _frame, owner='s1', slot='base')
+    clock[0] = 30.0
+    store.get_or_create('b', _frame, owner='s2', slot='base')
+    clock[0] = 61.0
+    store.fetch('s2', 'base')
+    store.get_or_create('c', _frame, owner='s2', slot='other')
+    assert store.key_of('s1', 'base') is None and store.key_of('s2', 'base') == 'b'
+    assert store.stats()['Sessions'] == 1
+
+
+def test_idle_datasets_spill_to_arrow_and_regenerate(clock, tmp_path):
+    path = tmp_path / 'data.csv'
+    _frame(80).to_csv(path, index=False)
+    store = DatasetStore(max_bytes=1, idle_seconds=10)
+    key, data = load_shared_dataset(str(path), cache_dir=str(tmp_path / 'spill'), store=store,
+                                    owner='s1', slot='base')
+    expected = data.copy()
+    assert list((tmp_path / 'spill').iterdir())
+
+    # A derived frame of an idle session goes first, then the dataset itself
+    stress_key, stressed = stress_shared_dataset(key, *SCENARIO, store=store, owner='s1')
+    clock[0] = 11.0
+    store.get_or_create('other', _frame, owner='s2', slot='base')
+    assert store.stats()['Entries'] == 1 and store.stats()['Evictions'] == 2
+
+    regenerated = store.fetch('s1', 'base')
+    pd.testing.assert_frame_equal(regenerated, expected)
+    assert regenerated.attrs['fingerprint'] == data.attrs['fingerprint']
+    restressed = store.fetch('s1', 'stress')
+    pd.testing.assert_frame_equal(restressed, simulate_stress_impact(expected, *SCENARIO, lean=True))
+    assert store.regenerations == 2 and store.key_of('s1', 'stress') == stress_key
+
+
+def test_frames_without_a_factory_stay_while_referenced(clock):
+    store = DatasetStore(max_bytes=1, idle_seconds=0)
+    store.get_or_create('a', _frame, owner='s1', slot='base')
+    clock[0] = 5.0
+    store.get_or_create('b', _frame, owner='s2', slot='base')
+    assert store.get('a') is not None and store.stats()['Evictions'] == 0
+
+
+def test_stress_results_are_keyed_by_dataset_and_normalized_parameters():
+    store = DatasetStore()
+    keys = [load_shared_dataset(num_days=30, store=store)[0], load_shared_dataset(num_days=40, store=store)[0]]
+    for key in keys:
+        for severity in [0.2, 0.6]:
+            parameters = {'scenario_severity_factor': severity}
+            _, stressed = stress_shared_dataset(key, 'Scenario', parameters, store=store)
+            pd.testing.assert_frame_equal(stressed, simulate_stress_impact(store.get(key), 'Scenario', parameters,
+                                                                           lean=True))
+    assert store.misses == 6
+    # 1 and 1.0 normalize to the same key
+    assert stress_shared_dataset(keys[0], 'Scenario', {'scenario_severity_factor': 1}, store=store)[0] == \
+        stress_shared_dataset(keys[0], 'Scenario', {'scenario_severity_factor': 1.0}, store=store)[0]
+    assert store.misses == 7
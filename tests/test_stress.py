@@ -0,0 +1,72 @@
+"""Tests for the stress engines."""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine import (
+    calculate_portfolio_risk_metrics,
+    generate_synthetic_data,
+    run_scenario_batch,
+    simulate_correlated_shocks,
+    simulate_stress_grid,
+    simulate_stress_impact,
+    simulate_stress_monte_carlo,
+)
+from risk_engine import stress as stress_module
+from risk_engine.stress import batch_series_filename
+
+SCENARIO = ('Scenario', {'scenario_severity_factor': 0.3})
+GRID_CASES = [
+    ('Sensitivity', 'shock_magnitude', [0.0, 12.5, 60.0], 'Base_Costs'),
+    ('Scenario', 'scenario_severity_factor', [0.0, 0.35, 1.0], None),
+    ('Firm-Wide', 'systemic_crisis_scale', [0.1, 0.5, 0.9], None),
+]
+
+
+@pytest.mark.parametrize('stress_type, parameter, values, parameter_to_shock', GRID_CASES)
+def test_stress_grid_matches_looped_scenarios(stress_type, parameter, values, parameter_to_shock):
+    data = generate_synthetic_data(50)
+    adjusted, adjusted_columns = simulate_stress_grid(data, stress_type, values, parameter_to_shock)
+    for i, value in enumerate(values):
+        parameters = {parameter: value, 'parameter_to_shock': parameter_to_shock}
+        expected = simulate_stress_impact(data, stress_type, parameters)
+        np.testing.assert_allclose(adjusted[i], expected[adjusted_columns].to_numpy(), rtol=1e-12)
+
+
+def test_monte_carlo_on_panels_resamples_whole_dates_at_firm_level():
+    panel = generate_synthetic_data(40, num_entities=3)
+    # One block spanning every date reproduces the historical firm path on each draw
+    paths = simulate_stress_monte_carlo(panel, *SCENARIO, n_paths=4, block_size=40, seed=0)
+    firm_metrics, _, _, _ = calculate_portfolio_risk_metrics(simulate_stress_impact(panel, *SCENARIO))
+    for name, value in firm_metrics.items():
+        assert paths[name].to_numpy() == pytest.approx([value] * 4)
+
+
+def test_correlated_shocks_on_panels_score_the_firm():
+    panel = generate_synthetic_data(40, num_entities=3)
+    # Zero volatility makes every path the deterministic scenario
+    quantiles = simulate_correlated_shocks(panel, np.eye(2), 0.0, mean_shocks=0.3, n_paths=5, seed=0)
+    firm_metrics, _, _, _ = calculate_portfolio_risk_metrics(simulate_stress_impact(panel, *SCENARIO))
+    for name, value in firm_metrics.items():
+        assert quantiles[name].to_numpy() == pytest.approx([value] * len(quantiles))
+
+
+def test_parallel_batch_matches_serial_on_timezone_aware_dates(tmp_path, monkeypatch):
+    # Spawned workers cannot reuse the parent's objects, so only the shared buffer reaches them
+    monkeypatch.setattr(stress_module, 'ProcessPoolExecutor',
+                        partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn')))
+    data = generate_synthetic_data(60)
+    data['Date'] = data['Date'].dt.tz_localize('America/New_York')
+    scenarios = [('Scenario', {'scenario_severity_factor': severity}) for severity in np.linspace(0, 1, 8)]
+    parallel = run_scenario_batch(data, scenarios, max_workers=2, min_parallel_scenarios=1,
+                                  series_dir=str(tmp_path / 'parallel'))
+    serial = run_scenario_batch(data, scenarios, max_workers=1, series_dir=str(tmp_path / 'serial'))
+    assert parallel == serial
+    for index in range(len(scenarios)):
+        name = batch_series_filename(index)
+        pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / 'parallel' / name),
+                                      pd.read_parquet(tmp_path / 'serial' / name))
@@ -0,0 +1,86 @@
+"""Tests for the scenario workspace."""
+import numpy as np
+import pytest
+
+from risk_engine import (
+    ScenarioWorkspace,
+    calculate_risk_capacity_metrics_lean,
+    generate_synthetic_data,
+    scenario_hash,
+    simulate_stress_impact,
+    summarize_run,
+)
+from risk_engine.data import dataset_fingerprint
+
+SEVERITIES = [0.1, 0.3, 0.5]
+
+
+@pytest.fixture
+def workspace():
+    data = generate_synthetic_data(400)
+    fingerprint = dataset_fingerprint(data)
+    workspace = ScenarioWorkspace()
+    for severity in SEVERITIES:
+        parameters = {'scenario_severity_factor': severity}
+        adjustments = simulate_stress_impact(data, 'Scenario', parameters, lean=True)
+        workspace.add(fingerprint, 'Scenario', parameters, *summarize_run(data, adjustments, max_points=50))
+    return data, fingerprint, workspace
+
+
+def test_index_holds_each_runs_metrics(workspace):
+    data, fingerprint, workspace = workspace
+    index = workspace.index()
+    assert list(index['Label']) == [f'Scenario (scenario_severity_factor={s:g})' for s in SEVERITIES]
+    for key, severity in zip(index.index, SEVERITIES):
+        parameters = {'scenario_severity_factor': severity}
+        assert key == scenario_hash(fingerprint, 'Scenario', parameters)
+        assert workspace.parameters(key) == parameters
+        expected = calculate_risk_capacity_metrics_lean(
+            data, simulate_stress_impact(data, 'Scenario', parameters, lean=True))
+        assert index.loc[key, 'Capital_Drawdown'] == pytest.approx(expected['Capital_Drawdown'])
+    assert workspace.index('other-data').empty
+
+
+def test_readding_a_run_replaces_it(workspace):
+    data, fingerprint, workspace = workspace
+    key = workspace.index().index[0]
+    assert workspace.add(fingerprint, 'Scenario', {'scenario_severity_factor': 0.1}, {}, {}, label='again') == key
+    assert len(workspace) == len(SEVERITIES) and workspace.index().loc[key, 'Label'] == 'again'
+    assert list(workspace.index().index)[-1] == key
+
+
+def test_query_filters_and_ranks(workspace):
+    _, _, workspace = workspace
+    index = workspace.index()
+    middle = index['Capital_Drawdown'].iloc[1]
+    selected = workspace.query({'Capital_Drawdown': (middle, None)}, sort_by='Capital_Drawdown', ascending=False)
+    assert list(selected.index) == list(index.index[[2, 1]])
+    assert list(workspace.query(sort_by='Capital_Drawdown', limit=1).index) == [index.index[0]]
+    with pytest.raises(KeyError):
+        workspace.query({'Unknown': (0, 1)})
+
+
+def test_series_round_trip_keeps_extremes(workspace):
+    data, _, workspace = workspace
+    keys = list(workspace.index().index)
+    series = workspace.series(keys[::-1], 'Capital_Remaining')
+    assert list(series) == keys[::-1]
+    dates, values = series[keys[-1]]
+    assert values.dtype == np.float32 and len(values) < len(data) and len(dates) == len(values)
+
+    adjustments = simulate_stress_impact(data, 'Scenario', {'scenario_severity_factor': SEVERITIES[-1]}, lean=True)
+    metrics = calculate_risk_capacity_metrics_lean(data, adjustments)
+    assert values.min() == pytest.approx(metrics['Minimum_Capital_Remaining'], rel=1e-6)
+    assert dates[0] == data['Date'].iloc[0] and dates[-1] == data['Date'].iloc[-1]
+
+    workspace.remove([keys[0]])
+    with pytest.raises(KeyError):
+        workspace.series(keys, 'Capital_Remaining')
+    with pytest.raises(KeyError):
+        workspace.series(keys[1:], 'Unknown')
+
+
+def test_oldest_runs_are_dropped_beyond_the_limit():
+    workspace = ScenarioWorkspace(max_scenarios=2)
+    keys = [workspace.add('data', 'Scenario', {'scenario_severity_factor': s}, {}, {}) for s in SEVERITIES]
+    assert list(workspace.index().index) == keys[1:] and keys[0] not in workspace